@@ -3,7 +3,6 @@
 # SPDX-License-Identifier: Apache-2.0
 #
 import elasticsearch
-import json
 import logging
 
 from flask import Blueprint, jsonify, request, Response
@@ -14,6 +13,7 @@ from aquarius.ddo_checker.ddo_checker import (
     list_errors_dict_remote,
 )
 
+from aquarius.app import json_util
 from aquarius.app.es_instance import ElasticsearchInstance
 from aquarius.app.util import (
     list_errors,
@@ -270,7 +270,7 @@ def get_assets_names():
         except Exception:
             names[did] = ""
 
-    return json.dumps(names), 200
+    return json_util.dumps(names), 200
 
 
 @assets.route("/query", methods=["POST"])
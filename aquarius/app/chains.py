@@ -3,10 +3,10 @@
 # SPDX-License-Identifier: Apache-2.0
 #
 import elasticsearch
-import json
 import logging
 
 from flask import Blueprint, jsonify
+from aquarius.app import json_util
 from aquarius.app.es_instance import ElasticsearchInstance
 from aquarius.log import setup_logging
 from aquarius.myapp import app
@@ -33,7 +33,7 @@ def get_chains_list():
         chains = es_instance.es.get(
             index=f"{es_instance.db_index}_plus", id="chains", doc_type="_doc"
         )["_source"]
-        return json.dumps(chains)
+        return json_util.dumps(chains)
     except (elasticsearch.exceptions.NotFoundError, KeyError):
         logger.error("Cannot get chains list.")
         return jsonify(error="No chains found."), 404
@@ -66,7 +66,7 @@ def get_index_status(chain_id):
             id="events_last_block_" + str(chain_id),
             doc_type="_doc",
         )["_source"]
-        return json.dumps(last_block_record)
+        return json_util.dumps(last_block_record)
     except (elasticsearch.exceptions.NotFoundError, KeyError):
         logger.error(f"Cannot get index status for chain {chain_id}. Chain not found.")
         return jsonify(error=f"Chain {chain_id} is not indexed."), 404
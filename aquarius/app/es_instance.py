@@ -6,12 +6,15 @@ import os
 import logging
 import time
 from elasticsearch import Elasticsearch
-from elasticsearch.exceptions import NotFoundError
+from elasticsearch.exceptions import ConflictError, NotFoundError, TransportError
+from elasticsearch.helpers import scan
 
 from aquarius.app.es_mapping import es_mapping
 
 _DB_INSTANCE = None
 
+REFRESH_POLICIES = ("immediate", "deferred", "async")
+
 logger = logging.getLogger(__name__)
 
 
@@ -25,6 +28,31 @@ def get_value(value, env_var, default, config=None):
     return default
 
 
+def get_refresh_policy():
+    """Reads `ES_REFRESH_POLICY`, when DDO writes become visible to searches:
+    - `immediate` (default): single document writes (`write`, `update`) wait
+      for a refresh, and the index is refreshed once per block chunk
+    - `deferred`: single document writes do not wait for a refresh, and the
+      index is refreshed once per block chunk
+    - `async`: never refreshed explicitly, the writes are visible after the
+      `refresh_interval` of the index
+
+    The events monitor writes its DDOs with a `BulkWriter`, so `immediate` and
+    `deferred` only differ for single document writes.
+
+    :return: one of `REFRESH_POLICIES`
+    """
+    policy = os.getenv("ES_REFRESH_POLICY", "immediate")
+    if policy not in REFRESH_POLICIES:
+        logger.warning(
+            f"Unknown ES_REFRESH_POLICY {policy}, using immediate instead. "
+            f"Valid policies: {', '.join(REFRESH_POLICIES)}."
+        )
+        return "immediate"
+
+    return policy
+
+
 class ElasticsearchInstance(object):
     def __init__(self, config=None):
         host = get_value("db.hostname", "DB_HOSTNAME", "localhost", config)
@@ -40,6 +68,7 @@ class ElasticsearchInstance(object):
         client_key = get_value("db.client_key", "DB_CLIENT_KEY", None, config)
         client_cert = get_value("db.client_cert_path", "DB_CLIENT_CERT", None, config)
         self._index = index
+        self.refresh_policy = get_refresh_policy()
         try:
             self._es = Elasticsearch(
                 [host],
@@ -69,6 +98,17 @@ class ElasticsearchInstance(object):
     def db_index(self):
         return self._index
 
+    @property
+    def write_refresh(self):
+        """:return: `refresh` parameter of the writes, following the refresh policy"""
+        return "wait_for" if self.refresh_policy == "immediate" else "false"
+
+    def refresh(self):
+        """Refresh the index once, after writes that did not wait for it,
+        unless the refresh policy is `async`."""
+        if self.refresh_policy != "async":
+            self.es.indices.refresh(index=self.db_index)
+
     @staticmethod
     def str_to_bool(s):
         if s == "true":
@@ -78,28 +118,33 @@ class ElasticsearchInstance(object):
         else:
             raise ValueError
 
-    def write(self, obj, resource_id=None):
+    def write(self, obj, resource_id=None, version=None):
         """Write obj in elasticsearch.
         :param obj: value to be written in elasticsearch.
         :param resource_id: id for the resource.
+        :param version: external version of the value, it is rejected if the
+            stored one is not lower. Without it, the resource must not exist.
         :return: id of the transaction.
         """
         logger.debug("elasticsearch::write::{}".format(resource_id))
-        if resource_id is not None:
-            if self.es.exists(index=self.db_index, id=resource_id, doc_type="_doc"):
-                raise ValueError(
-                    'Resource "{}" already exists, use update instead'.format(
-                        resource_id
-                    )
-                )
-
-        return self.es.index(
-            index=self.db_index,
-            id=resource_id,
-            body=obj,
-            doc_type="_doc",
-            refresh="wait_for",
-        )["_id"]
+        kwargs = (
+            {"version": version, "version_type": "external"}
+            if version
+            else {"op_type": "create"}
+        )
+        try:
+            return self.es.index(
+                index=self.db_index,
+                id=resource_id,
+                body=obj,
+                doc_type="_doc",
+                refresh=self.write_refresh,
+                **kwargs,
+            )["_id"]
+        except ConflictError:
+            raise ValueError(
+                'Resource "{}" already exists, use update instead'.format(resource_id)
+            )
 
     def read(self, resource_id):
         """Read object in elasticsearch using the resource_id.
@@ -107,25 +152,78 @@ class ElasticsearchInstance(object):
         :return: object value from elasticsearch.
         """
         logger.debug("elasticsearch::read::{}".format(resource_id))
-        return self.es.get(index=self.db_index, id=resource_id, doc_type="_doc")[
-            "_source"
-        ]
+        # realtime, so that writes are seen before the index is refreshed
+        return self.es.get(
+            index=self.db_index, id=resource_id, doc_type="_doc", realtime=True
+        )["_source"]
 
-    def update(self, obj, resource_id):
+    def update(self, obj, resource_id, version=None):
         """Update object in elasticsearch using the resource_id.
         :param obj: new value
         :param resource_id: id of the object to be updated.
+        :param version: external version of the new value, it is rejected with
+            a `ConflictError` if the stored one is not lower.
         :return: id of the object.
         """
         logger.debug("elasticsearch::update::{}".format(resource_id))
+        kwargs = {"version": version, "version_type": "external"} if version else {}
         return self.es.index(
             index=self.db_index,
             id=resource_id,
             body=obj,
             doc_type="_doc",
-            refresh="wait_for",
+            refresh=self.write_refresh,
+            **kwargs,
         )["_id"]
 
+    def scan(self, query, source=None, size=1000, keep_alive="1m"):
+        """Iterate over the documents matching `query`, a page at a time, so
+        the memory does not depend on the number of hits, nor is it limited
+        by the result window.
+
+        Pages are read from a point in time with `search_after` (ES 7.12+),
+        or with a scroll on older versions.
+        :param query: `query` of the search body
+        :param source: `_source` filtering, e.g. list of the fields to read
+        :param size: number of documents per page
+        :param keep_alive: how long the point in time or scroll lasts between pages
+        :return: generator of the `_source` of the documents
+        """
+        body = {"query": query}
+        if source is not None:
+            body["_source"] = source
+
+        try:
+            pit_id = self.es.open_point_in_time(
+                index=self.db_index, keep_alive=keep_alive
+            )["id"]
+        except TransportError as e:
+            logger.debug(f"Point in time is not available, scrolling instead: {e}")
+            for hit in scan(
+                self.es, query=body, index=self.db_index, size=size, scroll=keep_alive
+            ):
+                yield hit["_source"]
+            return
+
+        body.update({"size": size, "sort": ["_shard_doc"]})
+        try:
+            while True:
+                body["pit"] = {"id": pit_id, "keep_alive": keep_alive}
+                page = self.es.search(body=body)
+                pit_id = page.get("pit_id", pit_id)
+                hits = page["hits"]["hits"]
+                for hit in hits:
+                    yield hit["_source"]
+
+                if len(hits) < size:
+                    return
+                body["search_after"] = hits[-1]["sort"]
+        finally:
+            try:
+                self.es.close_point_in_time(body={"id": pit_id})
+            except TransportError as e:
+                logger.debug(f"Closing point in time failed: {e}")
+
     def delete_all(self):
         q = """{
             "query" : {
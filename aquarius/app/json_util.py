@@ -0,0 +1,75 @@
+#
+# Copyright 2021 Ocean Protocol Foundation
+# SPDX-License-Identifier: Apache-2.0
+#
+"""JSON serialization of the DDOs and API responses.
+
+orjson is used when it is installed (`pip install ocean-aquarius[orjson]`),
+unless `JSON_BACKEND` is set to `json`. Values it can not serialize or
+parse exactly, like integers larger than 64 bits or `NaN`, fall back to the
+stdlib `json` module, so both backends parse the same documents. When
+serializing, orjson writes `NaN` and infinite floats as `null`, where the
+stdlib writes the non-standard `NaN` and `Infinity` tokens.
+"""
+import json
+import logging
+import os
+import re
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# digits of the integers that orjson may parse as floats (larger than 64 bits)
+_LARGE_INT = re.compile(r"\d{20,}")
+_LARGE_INT_BYTES = re.compile(rb"\d{20,}")
+
+
+def get_backend():
+    """:return: name of the backend to use, `orjson` or `json`"""
+    backend = os.getenv("JSON_BACKEND", "orjson" if orjson else "json")
+    if backend == "orjson" and not orjson:
+        logger.warning("JSON_BACKEND is set to orjson, but it is not installed.")
+        return "json"
+
+    return backend if backend in ("orjson", "json") else "json"
+
+
+BACKEND = get_backend()
+
+
+def dumps(obj, default=None):
+    """Serialize `obj` to a JSON string.
+
+    :param default: function returning a serializable version of the objects
+        the backend does not support. With orjson, it also receives datetimes.
+    """
+    if BACKEND == "orjson":
+        try:
+            return orjson.dumps(
+                obj,
+                default=default,
+                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+            ).decode("utf-8")
+        except TypeError:
+            pass
+
+    return json.dumps(obj, default=default)
+
+
+def loads(data):
+    """Deserialize a JSON str, bytes, bytearray or memoryview."""
+    if BACKEND == "orjson":
+        pattern = _LARGE_INT if isinstance(data, str) else _LARGE_INT_BYTES
+        if not pattern.search(data):
+            try:
+                return orjson.loads(data)
+            except orjson.JSONDecodeError:
+                pass
+
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
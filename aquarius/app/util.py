@@ -5,7 +5,6 @@
 import copy
 import ecies
 import eth_keys
-import json
 import logging
 import os
 
@@ -14,6 +13,8 @@ from datetime import datetime
 import dateutil.parser as parser
 from eth_account import Account
 
+from aquarius.app import json_util
+
 DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
 DATETIME_FORMAT_NO_Z = "%Y-%m-%dT%H:%M:%S"
 
@@ -24,7 +25,7 @@ def sanitize_record(data_record):
     if "_id" in data_record:
         data_record.pop("_id")
 
-    return json.dumps(data_record, default=datetime_converter)
+    return json_util.dumps(data_record, default=datetime_converter)
 
 
 def get_bool_env_value(envvar_name, default_value=0):
@@ -35,6 +36,13 @@ def get_bool_env_value(envvar_name, default_value=0):
         return bool(default_value)
 
 
+def get_int_env_value(envvar_name, default_value):
+    try:
+        return int(os.getenv(envvar_name, default_value))
+    except (TypeError, ValueError):
+        return default_value
+
+
 def datetime_converter(o):
     if isinstance(o, datetime):
         return o.strftime(DATETIME_FORMAT)
@@ -2,17 +2,127 @@
 # Copyright 2021 Ocean Protocol Foundation
 # SPDX-License-Identifier: Apache-2.0
 #
+import logging
 import os
+import threading
 from abc import ABC
 
-from aquarius.app.util import get_bool_env_value
+from aquarius.app.util import get_bool_env_value, get_int_env_value
+
+logger = logging.getLogger(__name__)
+
+# Provider messages for queries that matched too many logs
+RESULT_LIMIT_ERRORS = (
+    "query returned more than",
+    "too many",
+    "response size exceeded",
+    "response size should not",
+    "query timeout exceeded",
+)
+
+# Provider messages for queries spanning too many blocks
+RANGE_LIMIT_ERRORS = (
+    "block range is too",
+    "block range too",
+    "exceed maximum block range",
+    "range is too large",
+)
+
+
+class ChunkSizeReduced(ValueError):
+    """Raised when a block range was rejected and the chunk size was reduced,
+    meaning the range should be retried with the new, smaller window."""
+
+
+class ChunkSizeController:
+    """Adapts the number of blocks requested per logs query.
+
+    The window doubles while calls are fast and mostly empty, up to
+    `max_size` (the initial size by default, so growth is opt-in), and is
+    halved on latency spikes or when the provider rejects a query for
+    returning too many results. Rejections for block ranges that are too wide
+    also lower the maximum window, so the controller learns the provider
+    limit. Other errors, whose wording is unknown, halve the window once they
+    happen `max_errors` times in a row.
+    """
+
+    def __init__(
+        self,
+        size,
+        min_size=10,
+        max_size=None,
+        target_time=2.0,
+        sparse_results=100,
+        max_errors=2,
+    ):
+        self.min_size = max(1, min(min_size, size))
+        self.max_size = max(max_size or size, size)
+        self.target_time = target_time
+        self.sparse_results = sparse_results
+        self.max_errors = max_errors
+        self._size = size
+        self._errors = 0
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        return self._size
+
+    def _resize(self, size):
+        size = max(self.min_size, min(self.max_size, size))
+        if size == self._size:
+            return False
+
+        logger.info(f"Blocks chunk size changed from {self._size} to {size}.")
+        self._size = size
+        return True
+
+    def on_success(self, elapsed, results):
+        """
+        :param elapsed: duration of the logs query, in seconds
+        :param results: number of logs returned by the query
+        :return: the chunk size to use for the next query
+        """
+        with self._lock:
+            self._errors = 0
+            if elapsed > 2 * self.target_time:
+                self._resize(self._size // 2)
+            elif elapsed < self.target_time / 2 and results < self.sparse_results:
+                self._resize(self._size * 2)
+
+            return self._size
+
+    def on_error(self, error):
+        """
+        :return: True if `error` is a result or range limit error, or the
+            `max_errors`-th error in a row, and the chunk size was reduced,
+            False otherwise.
+        """
+        message = str(error).lower()
+        with self._lock:
+            if any(limit in message for limit in RANGE_LIMIT_ERRORS):
+                self.max_size = max(self.min_size, self._size // 2)
+            elif not any(limit in message for limit in RESULT_LIMIT_ERRORS):
+                self._errors += 1
+                if self._errors < self.max_errors:
+                    return False
+
+            self._errors = 0
+            return self._resize(self._size // 2)
 
 
 class BlockProcessingClass(ABC):
+    # initial chunk size, BLOCKS_CHUNK_SIZE if not set
+    initial_chunk_size = None
+
     @property
     def block_envvar(self):
         return ""
 
+    @property
+    def blockchain_chunk_size(self):
+        return self.chunk_size_controller.size
+
     def get_or_set_last_block(self):
         """
         :return: block number
@@ -20,9 +130,18 @@ class BlockProcessingClass(ABC):
         ignore_last_block = get_bool_env_value("IGNORE_LAST_BLOCK", 0)
         _block = int(os.getenv(self.block_envvar, 0))
         try:
-            self.blockchain_chunk_size = int(os.getenv("BLOCKS_CHUNK_SIZE", 1000))
+            target_time = float(os.getenv("BLOCKS_CHUNK_TARGET_TIME", 2))
         except ValueError:
-            self.blockchain_chunk_size = 1000
+            target_time = 2.0
+        chunk_size = self.initial_chunk_size or get_int_env_value(
+            "BLOCKS_CHUNK_SIZE", 1000
+        )
+        self.chunk_size_controller = ChunkSizeController(
+            chunk_size,
+            min_size=get_int_env_value("BLOCKS_CHUNK_SIZE_MIN", 10),
+            max_size=get_int_env_value("BLOCKS_CHUNK_SIZE_MAX", chunk_size),
+            target_time=target_time,
+        )
         try:
             if ignore_last_block:
                 self.store_last_processed_block(_block)
@@ -0,0 +1,377 @@
+#
+# Copyright 2021 Ocean Protocol Foundation
+# SPDX-License-Identifier: Apache-2.0
+#
+import asyncio
+import itertools
+import logging
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread
+
+import aiohttp
+from web3._utils.method_formatters import log_entry_formatter
+
+from aquarius.app.util import get_int_env_value
+from aquarius.events.backfill import BackfillEngine
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncJsonRpcClient:
+    """Minimal asyncio JSON-RPC client, over aiohttp."""
+
+    def __init__(self, endpoint_uri, timeout=10):
+        self.endpoint_uri = endpoint_uri
+        self.batch_max_size = max(1, get_int_env_value("RPC_BATCH_MAX_SIZE", 100))
+        self._timeout = aiohttp.ClientTimeout(total=timeout)
+        self._session = None
+        self._ids = itertools.count()
+
+    async def _post(self, payload):
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=self._timeout)
+
+        async with self._session.post(self.endpoint_uri, json=payload) as response:
+            response.raise_for_status()
+            return await response.json(content_type=None)
+
+    async def request(self, method, params):
+        """:return: result of the JSON-RPC request, raises ValueError on errors"""
+        response = await self._post(
+            {
+                "jsonrpc": "2.0",
+                "method": method,
+                "params": params,
+                "id": next(self._ids),
+            }
+        )
+        if "error" in response:
+            raise ValueError(response["error"])
+
+        return response["result"]
+
+    async def batch(self, calls):
+        """
+        :param calls: list of (method, params) tuples
+        :return: list of JSON-RPC responses, in the same order as `calls`
+        """
+        batches = [
+            calls[i : i + self.batch_max_size]
+            for i in range(0, len(calls), self.batch_max_size)
+        ]
+        results = await asyncio.gather(*(self._batch(batch) for batch in batches))
+        return [response for result in results for response in result]
+
+    async def _batch(self, calls):
+        request_data = [
+            {
+                "jsonrpc": "2.0",
+                "method": method,
+                "params": params,
+                "id": next(self._ids),
+            }
+            for method, params in calls
+        ]
+        responses = await self._post(request_data)
+        if not isinstance(responses, list):
+            raise ValueError(f"Batch request failed: {responses.get('error')}")
+
+        responses_by_id = {response.get("id"): response for response in responses}
+        return [
+            responses_by_id.get(
+                request["id"], {"error": f"No response for request {request['id']}"}
+            )
+            for request in request_data
+        ]
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class AsyncJsonRpcBatch:
+    """Same interface as `JsonRpcBatch`, sent with an `AsyncJsonRpcClient`."""
+
+    def __init__(self, client):
+        self._client = client
+        self._calls = []
+        self._callbacks = []
+
+    def __len__(self):
+        return len(self._calls)
+
+    def add(self, method, params, callback):
+        self._calls.append((method, params))
+        self._callbacks.append(callback)
+
+    async def execute(self):
+        calls, callbacks = self._calls, self._callbacks
+        self._calls, self._callbacks = [], []
+        if not calls:
+            return
+
+        responses = await self._client.batch(calls)
+        for callback, response in zip(callbacks, responses):
+            callback(response)
+
+
+class AsyncEventsMonitor:
+    """Asyncio engine for an `EventsMonitor`.
+
+    The `EventsMonitor` provides the configuration, contract, caches and event
+    processors, while this engine drives them from an event loop, with an
+    async JSON-RPC client. Independent work runs concurrently, within these
+    limits:
+
+    - `EVENTS_ASYNC_LOG_FETCHES`: concurrent `eth_getLogs` calls (default 4)
+    - `EVENTS_ASYNC_BLOCK_LOOKUPS`: concurrent block batches (default 4)
+    - `EVENTS_ASYNC_TOKEN_LOOKUPS`: concurrent datatoken batches (default 4)
+    - `EVENTS_ASYNC_ES_WRITES`: DIDs processed concurrently (default 8)
+
+    Chunks are fetched ahead, but applied and checkpointed in block order,
+    with the checkpoint of the `EventsMonitor`. Events of the same DID are
+    always applied in order. The DDOs of a chunk are read with a single
+    `mget`, and written with `_bulk` requests and a single refresh once all
+    its DIDs were processed. With `EVENTS_CONFIRMATIONS`, the blocks above
+    the confirmation depth are processed by the `ReorgJournal` of the
+    monitor.
+
+    Only the JSON-RPC calls are asynchronous. The event processors are
+    synchronous, and shared with the threaded engine, so they, the `mget`
+    and the `_bulk` flush of each chunk run in a thread pool, with the
+    synchronous Elasticsearch client. The purgatory lists are not fetched
+    from the event loop either: they are refreshed by their own thread, which
+    downloads both lists concurrently, see `Purgatory.start`.
+    """
+
+    def __init__(self, monitor, rpc_url=None):
+        self._monitor = monitor
+        self._rpc = AsyncJsonRpcClient(
+            rpc_url or str(getattr(monitor._web3.provider, "endpoint_uri", ""))
+        )
+        self.limits = {
+            "log_fetches": get_int_env_value("EVENTS_ASYNC_LOG_FETCHES", 4),
+            "block_lookups": get_int_env_value("EVENTS_ASYNC_BLOCK_LOOKUPS", 4),
+            "token_lookups": get_int_env_value("EVENTS_ASYNC_TOKEN_LOOKUPS", 4),
+            "es_writes": get_int_env_value("EVENTS_ASYNC_ES_WRITES", 8),
+        }
+        self._executor = None
+        self._semaphores = None
+        self._apply_lock = None
+
+    def start(self):
+        """Run the engine in its own event loop, in a daemon thread."""
+        if self._monitor._monitor_is_on:
+            return
+
+        if self._monitor._contract is None:
+            logger.error("Cannot start events monitor without a valid contract object")
+            return
+
+        if not self._rpc.endpoint_uri.startswith(("http://", "https://")):
+            logger.error(
+                f"The asyncio events monitor requires an http(s) RPC, got "
+                f"{self._rpc.endpoint_uri}. Falling back to the threaded monitor."
+            )
+            self._monitor.start_events_monitor()
+            return
+
+        logger.info(
+            f"Starting the asyncio events monitor on contract "
+            f"{self._monitor._contract_address}."
+        )
+        self._monitor._monitor_is_on = True
+        Thread(target=lambda: asyncio.run(self.run_monitor()), daemon=True).start()
+
+    def _setup(self):
+        # asyncio primitives are bound to the running loop on python < 3.10
+        self._semaphores = {
+            name: asyncio.Semaphore(max(1, limit))
+            for name, limit in self.limits.items()
+        }
+        self._apply_lock = asyncio.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, self.limits["es_writes"])
+        )
+
+    async def _teardown(self):
+        await self._rpc.close()
+        self._executor.shutdown(wait=False)
+
+    async def run_monitor(self):
+        self._setup()
+        if self._monitor.purgatory:
+            self._monitor.purgatory.start(self._monitor._monitor_sleep_time)
+        try:
+            while self._monitor._monitor_is_on:
+                try:
+                    await self.process_current_blocks()
+                except (KeyError, Exception) as e:
+                    logger.error(f"Error processing event: {str(e)}.")
+
+                await asyncio.sleep(self._monitor._monitor_sleep_time)
+        finally:
+            await self._teardown()
+
+    async def run_in_executor(self, func, *args):
+        return await asyncio.get_event_loop().run_in_executor(
+            self._executor, func, *args
+        )
+
+    async def process_current_blocks(self):
+        """Process all blocks from the last processed block to the current block."""
+        current_block = int(await self._rpc.request("eth_blockNumber", []), 16)
+        reorg_journal = self._monitor._reorg_journal
+        if not reorg_journal:
+            await self.process_blocks(
+                await self.get_last_processed_block(), current_block
+            )
+            return
+
+        safe_block = await self.run_in_executor(
+            reorg_journal.confirm_blocks, current_block
+        )
+        await self.process_blocks(await self.get_last_processed_block(), safe_block)
+        await self.run_in_executor(
+            reorg_journal.process_provisional_blocks, safe_block, current_block
+        )
+
+    async def process_blocks(self, last_block, current_block):
+        """Process the blocks after the checkpoint, up to `current_block`."""
+        if current_block <= last_block:
+            return
+
+        chunks = iter(
+            BackfillEngine.get_shards(
+                last_block, current_block, self._monitor.blockchain_chunk_size
+            )
+        )
+        in_flight = deque()
+
+        def fetch_next():
+            chunk = next(chunks, None)
+            if chunk:
+                in_flight.append(
+                    (chunk, asyncio.ensure_future(self.fetch_chunk(*chunk)))
+                )
+
+        for _ in range(2 * self.limits["log_fetches"]):
+            fetch_next()
+
+        try:
+            while in_flight:
+                (_, to_block), task = in_flight.popleft()
+                events = await task
+                fetch_next()
+                async with self._apply_lock:
+                    await self.process_events(events)
+                await self.store_last_processed_block(to_block)
+        finally:
+            for _, task in in_flight:
+                task.cancel()
+
+    async def fetch_chunk(self, from_block, to_block):
+        """:return: decoded events of the range, with their chain data prefetched"""
+        monitor = self._monitor
+        async with self._semaphores["log_fetches"]:
+            start_time = time.time()
+            try:
+                logs = await self._rpc.request(
+                    "eth_getLogs",
+                    [
+                        {
+                            "address": monitor._contract_address,
+                            "fromBlock": hex(from_block),
+                            "toBlock": hex(to_block),
+                            "topics": [list(monitor._event_topics)],
+                        }
+                    ],
+                )
+                monitor.chunk_size_controller.on_success(
+                    time.time() - start_time, len(logs)
+                )
+            except ValueError as e:
+                if (
+                    from_block == to_block
+                    or not monitor.chunk_size_controller.on_error(e)
+                ):
+                    raise
+                logs = None
+
+        if logs is None:
+            # the range was rejected for being too large, fetch it in halves
+            middle = (from_block + to_block) // 2
+            first, second = await asyncio.gather(
+                self.fetch_chunk(from_block, middle),
+                self.fetch_chunk(middle + 1, to_block),
+            )
+            return first + second
+
+        events = monitor.decode_event_logs([log_entry_formatter(log) for log in logs])
+        await self.prefetch_event_data(events)
+        return events
+
+    async def _execute(self, batch, limit):
+        async with self._semaphores[limit]:
+            await batch.execute()
+
+    async def prefetch_event_data(self, events):
+        """Resolve block timestamps and datatokens of `events` concurrently."""
+        blocks_batch = AsyncJsonRpcBatch(self._rpc)
+        self._monitor._block_timestamps.prefetch(
+            (event.blockNumber for event in events), blocks_batch
+        )
+        tokens_batch = AsyncJsonRpcBatch(self._rpc)
+        self._monitor._datatoken_cache.prefetch(
+            (event.args.dataToken for event in events), tokens_batch
+        )
+        results = await asyncio.gather(
+            self._execute(blocks_batch, "block_lookups"),
+            self._execute(tokens_batch, "token_lookups"),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                # processors fetch whatever is missing on their own
+                logger.warning(f"Prefetching chain data failed: {result}")
+
+    async def process_events(self, events):
+        """Process the events of different DIDs concurrently, and the events of
+        each DID in order. The DDOs of the chunk are read with a single `mget`
+        and written by a single `BulkWriter`, flushed once."""
+        monitor = self._monitor
+        bulk_writer = monitor.get_bulk_writer()
+        await self.run_in_executor(
+            bulk_writer.prefetch, sorted(monitor.get_event_dids(events))
+        )
+        decoded = await self.run_in_executor(monitor.decode_events, events)
+
+        events_by_did = OrderedDict()
+        for event, event_decoded in zip(events, decoded):
+            did_events, did_decoded = events_by_did.setdefault(
+                event.args.dataToken, ([], [])
+            )
+            did_events.append(event)
+            did_decoded.append(event_decoded)
+
+        async def process_did_events(did_events, did_decoded):
+            async with self._semaphores["es_writes"]:
+                await self.run_in_executor(
+                    monitor.apply_events, did_events, bulk_writer, did_decoded
+                )
+
+        await asyncio.gather(
+            *(process_did_events(*did) for did in events_by_did.values())
+        )
+        await self.run_in_executor(bulk_writer.flush)
+        monitor.events_processed += len(events)
+
+    async def get_last_processed_block(self):
+        return await self.run_in_executor(self._monitor.get_last_processed_block)
+
+    async def store_last_processed_block(self, block):
+        # in memory, except when the checkpoint is flushed
+        await self.run_in_executor(self._monitor.store_last_processed_block, block)
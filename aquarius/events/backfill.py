@@ -0,0 +1,91 @@
+#
+# Copyright 2021 Ocean Protocol Foundation
+# SPDX-License-Identifier: Apache-2.0
+#
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class BackfillEngine:
+    """Index a large block gap with a pool of workers.
+
+    The gap is split into shards of `shard_size` blocks. Workers fetch and
+    decode the logs of the shards in parallel, while the shards are applied
+    strictly in block order on the calling thread, so the final state matches
+    a serial run. At most two shards per worker are in flight, which bounds
+    the memory used by fetched but not yet applied events.
+
+    Each applied shard advances the monitor checkpoint to the end of the
+    shard, so an interrupted backfill resumes after the last applied shard.
+    """
+
+    def __init__(self, monitor, workers, shard_size):
+        self._monitor = monitor
+        self.workers = workers
+        self.shard_size = shard_size
+
+    @staticmethod
+    def get_shards(from_block, to_block, shard_size):
+        """
+        :return: list of (from_block, to_block) tuples covering the range, both
+            ends included.
+        """
+        return [
+            (start, min(start + shard_size - 1, to_block))
+            for start in range(from_block, to_block + 1, shard_size)
+        ]
+
+    def fetch_shard(self, shard):
+        """:return: decoded events of the shard, in chain order"""
+        events = []
+        for _, _, chunk_events in self._monitor.iter_event_chunks(*shard):
+            events.extend(chunk_events)
+
+        return events
+
+    def apply_shard(self, shard, events):
+        self._monitor.process_events(events)
+        self._monitor.store_last_processed_block(shard[1])
+
+    def run(self, from_block, to_block):
+        """Backfill the range, both ends included."""
+        shards = self.get_shards(from_block, to_block, self.shard_size)
+        logger.info(
+            f"Backfill: processing blocks {from_block}-{to_block} in {len(shards)} "
+            f"shards with {self.workers} workers."
+        )
+        start_time = time.time()
+        events_count = 0
+        shards_iter = iter(shards)
+        in_flight = deque()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+
+            def submit_next():
+                shard = next(shards_iter, None)
+                if shard:
+                    in_flight.append((shard, executor.submit(self.fetch_shard, shard)))
+
+            for _ in range(2 * self.workers):
+                submit_next()
+
+            try:
+                while in_flight:
+                    shard, future = in_flight.popleft()
+                    events = future.result()
+                    submit_next()
+                    self.apply_shard(shard, events)
+                    events_count += len(events)
+            finally:
+                for _, future in in_flight:
+                    future.cancel()
+
+        elapsed = time.time() - start_time
+        logger.info(
+            f"Backfill: processed {to_block - from_block + 1} blocks and "
+            f"{events_count} events in {elapsed:.1f}s."
+        )
@@ -0,0 +1,70 @@
+#
+# Copyright 2021 Ocean Protocol Foundation
+# SPDX-License-Identifier: Apache-2.0
+#
+import logging
+from functools import partial
+
+import lru
+
+from aquarius.events.http_provider import JsonRpcBatch
+
+logger = logging.getLogger(__name__)
+
+
+class BlockTimestampService:
+    """Block timestamps for the event processors.
+
+    Timestamps are kept in a bounded LRU, so events of the same block and
+    replayed blocks do not fetch the block again. `prefetch` resolves all the
+    missing blocks of a chunk with a single JSON-RPC batch.
+    """
+
+    def __init__(self, web3, size=10000):
+        self._web3 = web3
+        self._timestamps = lru.LRU(size)
+
+    def prefetch(self, block_numbers, batch=None):
+        """Fetch the timestamps of the `block_numbers` missing from the cache.
+
+        :param batch: `JsonRpcBatch` to add the requests to, the caller is then
+            responsible for executing it. By default the requests are sent
+            right away.
+        """
+        missing = sorted(
+            {
+                block_number
+                for block_number in block_numbers
+                if block_number not in self._timestamps
+            }
+        )
+        _batch = batch if batch is not None else JsonRpcBatch(self._web3)
+        for block_number in missing:
+            _batch.add(
+                "eth_getBlockByNumber",
+                [hex(block_number), False],
+                partial(self._set_from_response, block_number),
+            )
+
+        if batch is None:
+            try:
+                _batch.execute()
+            except Exception as e:
+                logger.warning(f"Fetching blocks {missing} failed: {e}")
+
+    def _set_from_response(self, block_number, response):
+        block = response.get("result")
+        if block:
+            self._timestamps[block_number] = int(block["timestamp"], 16)
+        else:
+            logger.warning(
+                f"Fetching block {block_number} failed: {response.get('error')}"
+            )
+
+    def get_timestamp(self, block_number):
+        """:return: timestamp of the block, fetched from the chain on cache misses"""
+        if block_number not in self._timestamps:
+            block = self._web3.eth.get_block(block_number)
+            self._timestamps[block_number] = block["timestamp"]
+
+        return self._timestamps[block_number]
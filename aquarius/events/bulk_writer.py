@@ -0,0 +1,228 @@
+#
+# Copyright 2021 Ocean Protocol Foundation
+# SPDX-License-Identifier: Apache-2.0
+#
+import logging
+import time
+from collections import OrderedDict
+
+import elasticsearch
+from elasticsearch.helpers import streaming_bulk
+
+from aquarius.app import json_util
+
+logger = logging.getLogger(__name__)
+
+
+class BulkWriter:
+    """Buffers the DDO writes of a block chunk, and sends them in `_bulk`
+    requests with a single refresh (see `ES_REFRESH_POLICY`), on `flush`.
+
+    It has the same `read`, `write` and `update` methods as the
+    `ElasticsearchInstance` it wraps, so it can be handed to the event
+    processors instead. Buffered records are keyed by DID and served by
+    `read`, so later events of the chunk see the earlier ones. Other
+    attributes are those of the wrapped instance.
+
+    DDOs read from the index are cached for the chunk, missing ones
+    included, and can be fetched at once with `prefetch`, so the events of a
+    DID cost a single read however many they are. Different DIDs can be
+    processed concurrently on the same writer, each only touches its own keys.
+
+    Bulk requests hold at most `max_docs` records and `max_bytes` bytes.
+    Records rejected by a bulk request (after the bulk retries of 429 errors)
+    are retried individually, except conflicts: writes with an external
+    version that is not newer than the stored one, and unversioned creations
+    of DDOs that exist already, are stale and dropped. Each DDO that is
+    actually saved is logged.
+
+    :param unversioned: DIDs to update without external version, e.g. after
+        a reorg rolled them back
+    """
+
+    def __init__(
+        self,
+        es_instance,
+        max_docs=500,
+        max_bytes=10 * 1024 * 1024,
+        unversioned=(),
+    ):
+        self._es_instance = es_instance
+        self.max_docs = max_docs
+        self.max_bytes = max_bytes
+        self.unversioned = unversioned
+        # (op_type, obj, version) by DID
+        self._records = OrderedDict()
+        # stored DDOs by DID, None if there is none
+        self._stored = {}
+
+    def __getattr__(self, name):
+        return getattr(self._es_instance, name)
+
+    def __len__(self):
+        return len(self._records)
+
+    def write(self, obj, resource_id, version=None):
+        """Buffer the creation of a DDO.
+
+        :param version: external version of the DDO, see `get_event_version`.
+            Without it, the DDO must not exist yet.
+        """
+        if resource_id in self._records:
+            raise ValueError(
+                'Resource "{}" already exists, use update instead'.format(resource_id)
+            )
+
+        if resource_id in self.unversioned:
+            version = None
+
+        self._records[resource_id] = ("index" if version else "create", obj, version)
+        return resource_id
+
+    def update(self, obj, resource_id, version=None):
+        """Buffer the new version of a DDO.
+
+        :param version: external version of the DDO, see `get_event_version`
+        """
+        if resource_id in self.unversioned:
+            version = None
+
+        op_type, _, _ = self._records.pop(resource_id, ("index", None, None))
+        if op_type == "create":
+            # created without version in this chunk, and stored once with its
+            # final state
+            version = None
+        self._records[resource_id] = (op_type, obj, version)
+        return resource_id
+
+    def read(self, resource_id):
+        if resource_id in self._records:
+            _, obj, _ = self._records[resource_id]
+            return json_util.loads(obj) if isinstance(obj, str) else obj
+
+        if resource_id not in self._stored:
+            try:
+                self._stored[resource_id] = self._es_instance.read(resource_id)
+            except elasticsearch.exceptions.NotFoundError:
+                self._stored[resource_id] = None
+
+        if self._stored[resource_id] is None:
+            raise elasticsearch.exceptions.NotFoundError(
+                404, f"{resource_id} not found"
+            )
+
+        return self._stored[resource_id]
+
+    def prefetch(self, resource_ids):
+        """Read the stored DDOs of `resource_ids` with a single `mget`."""
+        resource_ids = [
+            resource_id
+            for resource_id in resource_ids
+            if resource_id not in self._records and resource_id not in self._stored
+        ]
+        if not resource_ids:
+            return
+
+        try:
+            docs = self._es_instance.es.mget(
+                index=self._es_instance.db_index,
+                body={"ids": resource_ids},
+                realtime=True,
+            )["docs"]
+        except elasticsearch.exceptions.TransportError as e:
+            logger.warning(f"Prefetching {len(resource_ids)} DDOs failed: {e}")
+            return
+
+        for doc in docs:
+            if "error" not in doc:
+                self._stored[doc["_id"]] = doc["_source"] if doc["found"] else None
+
+    def get_actions(self):
+        for resource_id, (op_type, obj, version) in self._records.items():
+            action = {
+                "_op_type": op_type,
+                "_index": self._es_instance.db_index,
+                "_id": resource_id,
+                "_source": obj,
+            }
+            if version:
+                action.update({"version": version, "version_type": "external"})
+            yield action
+
+    def flush(self):
+        """Send the buffered records, then refresh the index once, unless the
+        refresh policy is `async`.
+
+        :return: list of the DIDs that could not be written, stale records
+            excluded
+        """
+        if not self._records:
+            return []
+
+        start_time = time.time()
+        failed = []
+        for ok, item in streaming_bulk(
+            self._es_instance.es,
+            self.get_actions(),
+            chunk_size=self.max_docs,
+            max_chunk_bytes=self.max_bytes,
+            max_retries=2,
+            raise_on_error=False,
+            raise_on_exception=False,
+        ):
+            _, result = item.popitem()
+            if ok:
+                logger.info(f"DDO saved: did={result['_id']}")
+            else:
+                failed.append(
+                    (result["_id"], result.get("status"), result.get("error"))
+                )
+
+        not_written = []
+        stale = 0
+        for resource_id, status, error in failed:
+            if status == 409:
+                logger.info(f"Dropped stale write of {resource_id}: {error}")
+                stale += 1
+            elif not self.retry(resource_id):
+                logger.error(
+                    f"encountered an error while saving {resource_id} to ES: "
+                    f"status={status}, error={error}"
+                )
+                not_written.append(resource_id)
+
+        try:
+            self._es_instance.refresh()
+        except elasticsearch.exceptions.TransportError as e:
+            logger.error(f"Refreshing {self._es_instance.db_index} failed: {e}")
+
+        logger.info(
+            f"Bulk indexed {len(self._records) - len(not_written) - stale} DDOs in "
+            f"{time.time() - start_time:.2f}s, {len(failed) - stale} retried, "
+            f"{stale} stale, {len(not_written)} failed."
+        )
+        self._records.clear()
+        return not_written
+
+    def retry(self, resource_id):
+        """:return: True if the buffered record was written on its own, or
+        turned out to be stale"""
+        op_type, obj, version = self._records[resource_id]
+        kwargs = {"version": version, "version_type": "external"} if version else {}
+        try:
+            self._es_instance.es.index(
+                index=self._es_instance.db_index,
+                id=resource_id,
+                body=obj,
+                doc_type="_doc",
+                op_type=op_type,
+                **kwargs,
+            )
+            logger.info(f"DDO saved: did={resource_id}")
+            return True
+        except elasticsearch.exceptions.ConflictError as e:
+            logger.info(f"Dropped stale write of {resource_id}: {e}")
+            return True
+        except elasticsearch.exceptions.TransportError as e:
+            logger.warning(f"Retrying {resource_id} failed: {e}")
+            return False
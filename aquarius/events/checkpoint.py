@@ -0,0 +1,147 @@
+#
+# Copyright 2021 Ocean Protocol Foundation
+# SPDX-License-Identifier: Apache-2.0
+#
+import logging
+import time
+from threading import RLock
+
+import elasticsearch
+
+logger = logging.getLogger(__name__)
+
+
+class CheckpointCursor:
+    """Last processed block, kept in memory and flushed to ES in batches.
+
+    The in-memory block is authoritative while the process runs: it is read
+    from ES only once, and written back every `flush_every` advances or
+    `flush_interval` seconds, whichever comes first, and on `flush`. Writes use
+    optimistic concurrency (`if_seq_no`/`if_primary_term`) instead of reading
+    the stored block first, so a checkpoint moved by another process is
+    detected and never moved backwards.
+    """
+
+    def __init__(self, es, index, doc_id, flush_every=10, flush_interval=30):
+        self._es = es
+        self._index = index
+        self._doc_id = doc_id
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.block = None
+        self._flushed_block = None
+        self._seq_no = None
+        self._primary_term = None
+        self._pending = 0
+        self._last_flush = time.time()
+        self._lock = RLock()
+
+    def _read(self):
+        """:return: stored block, None if there is no checkpoint yet"""
+        try:
+            record = self._es.get(index=self._index, id=self._doc_id, doc_type="_doc")
+        except elasticsearch.exceptions.NotFoundError:
+            self._seq_no = self._primary_term = None
+            return None
+
+        self._seq_no = record["_seq_no"]
+        self._primary_term = record["_primary_term"]
+        return record["_source"]["last_block"]
+
+    def _write(self, block):
+        if self._seq_no is None:
+            concurrency = {"op_type": "create"}
+        else:
+            concurrency = {
+                "if_seq_no": self._seq_no,
+                "if_primary_term": self._primary_term,
+            }
+        result = self._es.index(
+            index=self._index,
+            id=self._doc_id,
+            body={"last_block": block},
+            doc_type="_doc",
+            **concurrency,
+        )
+        self._seq_no = result["_seq_no"]
+        self._primary_term = result["_primary_term"]
+        self._flushed_block = block
+
+    def get(self):
+        """:return: last processed block, read from ES on first use"""
+        with self._lock:
+            if self.block is None:
+                stored_block = self._read()
+                self.block = stored_block if stored_block is not None else 0
+                self._flushed_block = stored_block
+
+            return self.block
+
+    def advance(self, block):
+        """Move the cursor forward, flushing it if due. Blocks that are not
+        ahead of the cursor are ignored."""
+        with self._lock:
+            if self.block is not None and block <= self.block:
+                return
+
+            self.block = block
+            self._pending += 1
+            if (
+                self._flushed_block is None
+                or self._pending >= self.flush_every
+                or time.time() - self._last_flush >= self.flush_interval
+            ):
+                self.flush()
+
+    def rewind(self, block):
+        """Move the cursor back to `block`, so the blocks after it are processed
+        again, and write it to ES right away. Blocks that are not behind the
+        cursor are ignored."""
+        with self._lock:
+            if self.get() <= block:
+                return
+
+            self.block = block
+            try:
+                try:
+                    self._write(block)
+                except elasticsearch.exceptions.ConflictError:
+                    self._read()
+                    self._write(block)
+            except elasticsearch.exceptions.TransportError as e:
+                logger.error(
+                    f"Cannot rewind checkpoint {self._doc_id} to block {block}: {e}"
+                )
+                return
+
+            self._pending = 0
+            self._last_flush = time.time()
+
+    def flush(self):
+        """Write the cursor to ES, if it moved since the last write."""
+        with self._lock:
+            block = self.block
+            if block is None or block == self._flushed_block:
+                return
+
+            try:
+                try:
+                    self._write(block)
+                except elasticsearch.exceptions.ConflictError:
+                    stored_block = self._read()
+                    if stored_block is not None and stored_block >= block:
+                        logger.warning(
+                            f"Checkpoint {self._doc_id} was moved to block {stored_block} "
+                            f"by another process, not overwriting it with block {block}."
+                        )
+                        self._flushed_block = block
+                    else:
+                        self._write(block)
+            except elasticsearch.exceptions.TransportError as e:
+                logger.error(
+                    f"Cannot store checkpoint {self._doc_id} at block {block}: {e}"
+                )
+                return
+
+            self._pending = 0
+            self._last_flush = time.time()
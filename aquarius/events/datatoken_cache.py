@@ -0,0 +1,115 @@
+#
+# Copyright 2021 Ocean Protocol Foundation
+# SPDX-License-Identifier: Apache-2.0
+#
+import logging
+import time
+from functools import partial
+
+import lru
+from hexbytes import HexBytes
+from web3 import Web3
+
+from aquarius.events.http_provider import JsonRpcBatch
+from aquarius.events.util import (
+    get_datatoken_abi,
+    get_datatoken_info,
+    make_datatoken_info,
+)
+
+logger = logging.getLogger(__name__)
+
+DATATOKEN_INFO_FUNCTIONS = ("name", "symbol", "decimals", "cap")
+
+
+class DatatokenInfoCache:
+    """Datatoken info (see `get_datatoken_info`), cached by token address.
+
+    Entries expire after `ttl` seconds, and the least recently used ones are
+    evicted once the cache holds `size` tokens. `prefetch` resolves all the
+    missing tokens of a chunk with a single JSON-RPC batch of `eth_call`s.
+    """
+
+    def __init__(self, web3, size=1000, ttl=3600):
+        self._web3 = web3
+        self.ttl = ttl
+        self._infos = lru.LRU(size)
+
+    def _get_cached(self, token_address):
+        cached = self._infos.get(token_address)
+        if not cached:
+            return None
+
+        expires_at, info = cached
+        if expires_at < time.time():
+            del self._infos[token_address]
+            return None
+
+        return info
+
+    def _set_cached(self, token_address, info):
+        self._infos[token_address] = (time.time() + self.ttl, info)
+
+    def prefetch(self, token_addresses, batch=None):
+        """Fetch the info of the `token_addresses` missing from the cache.
+
+        :param batch: `JsonRpcBatch` to add the requests to, the caller is then
+            responsible for executing it. By default the requests are sent
+            right away.
+        """
+        missing = sorted(
+            {Web3.toChecksumAddress(token_address) for token_address in token_addresses}
+        )
+        missing = [address for address in missing if not self._get_cached(address)]
+
+        dt_abi = get_datatoken_abi()
+        _batch = batch if batch is not None else JsonRpcBatch(self._web3)
+        for token_address in missing:
+            dt = self._web3.eth.contract(address=token_address, abi=dt_abi)
+            responses = {}
+            for fn in DATATOKEN_INFO_FUNCTIONS:
+                _batch.add(
+                    "eth_call",
+                    [{"to": token_address, "data": dt.encodeABI(fn_name=fn)}, "latest"],
+                    partial(self._set_from_response, dt, fn, responses),
+                )
+
+        if batch is None:
+            try:
+                _batch.execute()
+            except Exception as e:
+                logger.warning(f"Fetching datatokens {missing} failed: {e}")
+
+    def _set_from_response(self, dt, fn, responses, response):
+        """Collects the responses of a token, caching its info once complete."""
+        responses[fn] = response
+        if len(responses) < len(DATATOKEN_INFO_FUNCTIONS):
+            return
+
+        try:
+            values = []
+            for name in DATATOKEN_INFO_FUNCTIONS:
+                output_types = [
+                    output["type"]
+                    for output in dt.get_function_by_name(name).abi["outputs"]
+                ]
+                values.append(
+                    self._web3.codec.decode_abi(
+                        output_types, HexBytes(responses[name]["result"])
+                    )[0]
+                )
+        except Exception as e:
+            logger.warning(f"Fetching datatoken {dt.address} failed: {e}")
+            return
+
+        self._set_cached(dt.address, make_datatoken_info(dt.address, *values))
+
+    def get(self, token_address):
+        """:return: datatoken info, fetched from the chain on cache misses"""
+        token_address = Web3.toChecksumAddress(token_address)
+        info = self._get_cached(token_address)
+        if not info:
+            info = get_datatoken_info(self._web3, token_address)
+            self._set_cached(token_address, info)
+
+        return dict(info)
@@ -0,0 +1,108 @@
+#
+# Copyright 2021 Ocean Protocol Foundation
+# SPDX-License-Identifier: Apache-2.0
+#
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from eth_account import Account
+
+from aquarius.app.util import (
+    get_int_env_value,
+    get_metadata_from_services,
+    init_new_ddo,
+    list_errors,
+)
+from aquarius.ddo_checker.ddo_checker import (
+    is_valid_dict_remote,
+    list_errors_dict_remote,
+)
+from aquarius.events.decryptor import Decryptor
+
+logger = logging.getLogger(__name__)
+
+# Decryptor of the worker process, set by `init_worker`
+_decryptor = None
+
+
+def init_worker(ecies_private_key):
+    global _decryptor
+    _decryptor = Decryptor(
+        Account.from_key(ecies_private_key) if ecies_private_key else None
+    )
+
+
+def get_record_and_errors(data):
+    """:return: (normalized record of `data`, list of its schema validation errors)"""
+    _record = init_new_ddo(data, 0)
+    metadata = get_metadata_from_services(_record["service"])
+    if is_valid_dict_remote(metadata):
+        return _record, []
+
+    return _record, list_errors(list_errors_dict_remote, metadata)
+
+
+def decode_payload(payload):
+    """Decode, normalize and validate a DDO event payload, in a worker process.
+
+    :param payload: (rawddo, flags) tuple of the event
+    :return: dict with the decoded `data` (None if it could not be decoded),
+        and the normalized `record` and its schema validation `errors`, both
+        None if they could not be computed. None on unexpected errors, which
+        are left to the processor.
+    """
+    rawddo, flags = payload
+    try:
+        data = _decryptor.decode_ddo(rawddo, flags)
+    except Exception:
+        return None
+
+    result = {"data": data, "record": None, "errors": None}
+    if data is None:
+        return result
+
+    try:
+        result["record"], result["errors"] = get_record_and_errors(data)
+    except Exception:
+        pass
+
+    return result
+
+
+def get_decode_pool(ecies_private_key=None):
+    """:return: `DecodePool` of `EVENTS_DECODE_PROCESSES` processes, None if
+    it is not set"""
+    processes = get_int_env_value("EVENTS_DECODE_PROCESSES", 0)
+    return DecodePool(processes, ecies_private_key) if processes > 0 else None
+
+
+class DecodePool:
+    """Pool of processes decoding (ECIES decryption, lzma decompression, json
+    parsing), normalizing and validating the DDOs of a chunk in parallel,
+    before they are enriched and written by the event processors.
+
+    Workers are spawned rather than forked: the pool is started lazily, once
+    the monitor threads (and the locks they hold) exist, which a forked child
+    would inherit in an arbitrary state."""
+
+    def __init__(self, processes, ecies_private_key=None):
+        self.processes = processes
+        self._executor = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(ecies_private_key,),
+        )
+
+    def decode(self, events):
+        """:return: list of `decode_payload` results, in the order of `events`"""
+        payloads = [
+            (event.args.get("data", None), event.args.get("flags", None))
+            for event in events
+        ]
+        chunksize = max(1, len(payloads) // (4 * self.processes))
+        return list(self._executor.map(decode_payload, payloads, chunksize=chunksize))
+
+    def shutdown(self):
+        self._executor.shutdown()
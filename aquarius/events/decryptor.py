@@ -4,36 +4,76 @@
 #
 import ecies
 import eth_keys
-import json
 import logging
 import lzma as Lzma
 
-from aquarius.app.util import get_bool_env_value
+from aquarius.app import json_util
+from aquarius.app.util import get_bool_env_value, get_int_env_value
 
 logger = logging.getLogger(__name__)
 
 
 class Decryptor:
-    def __init__(self, ecies_account):
-        """Initialises Decryptor object based on ecies account."""
+    def __init__(self, ecies_account, max_ddo_size=None):
+        """Initialises Decryptor object based on ecies account.
+
+        It is meant to be reused: the ecies key and the settings are prepared
+        once, instead of on every DDO.
+
+        :param max_ddo_size: maximum size of a decompressed DDO, in bytes,
+            `EVENTS_MAX_DDO_SIZE` by default (10485760)
+        """
         self._ecies_account = ecies_account
+        self._ecies_key = None
+        self._only_encrypted_ddo = get_bool_env_value("ONLY_ENCRYPTED_DDO", 0)
+        self.max_ddo_size = max_ddo_size or get_int_env_value(
+            "EVENTS_MAX_DDO_SIZE", 10 * 1024 * 1024
+        )
+
+    def get_ecies_key(self):
+        """:return: raw bytes of the ecies private key, derived on first use"""
+        if self._ecies_key is None:
+            self._ecies_key = eth_keys.KeyAPI.PrivateKey(
+                self._ecies_account.key
+            ).to_bytes()
+        return self._ecies_key
 
     def ecies_decrypt(self, rawddo):
         if self._ecies_account is not None:
-            key = eth_keys.KeyAPI.PrivateKey(self._ecies_account.key)
-            rawddo = ecies.decrypt(key.to_hex(), rawddo)
+            # coincurve only parses bytes, a memoryview payload has to be copied
+            rawddo = ecies.decrypt(self.get_ecies_key(), bytes(rawddo))
         return rawddo
 
+    def decompress(self, rawddo):
+        """Decompress a lzma DDO, stopping as soon as it exceeds `max_ddo_size`,
+        so that a compression bomb can not exhaust the memory."""
+        decompressor = Lzma.LZMADecompressor()
+        ddo = decompressor.decompress(rawddo, max_length=self.max_ddo_size + 1)
+        if len(ddo) > self.max_ddo_size:
+            raise ValueError(
+                f"decompressed ddo is larger than {self.max_ddo_size} bytes"
+            )
+        if not decompressor.eof:
+            raise Lzma.LZMAError(
+                "Compressed data ended before the end-of-stream marker was reached"
+            )
+        return ddo
+
     def decode_ddo(self, rawddo, flags):
+        """Decrypt, decompress and parse a DDO.
 
+        :param rawddo: bytes or memoryview, as emitted by the Metadata contract
+        :param flags: bit 2 is set if the ddo is ecies encrypted, bit 1 if it is
+            lzma compressed
+        :return: DDO dict, None if it could not be decoded
+        """
         if len(flags) < 1:
             logger.debug("Set check_flags to 0!")
             check_flags = 0
         else:
             check_flags = flags[0]
 
-        _only_encrypted_ddo = get_bool_env_value("ONLY_ENCRYPTED_DDO", 0)
-        if _only_encrypted_ddo and (not check_flags & 2):
+        if self._only_encrypted_ddo and (not check_flags & 2):
             logger.error("This aquarius can cache only encrypted ddos")
             return None
 
@@ -53,12 +93,12 @@ class Decryptor:
         # bit 1:  check if ddo is lzma compressed
         if check_flags & 1:
             try:
-                rawddo = Lzma.decompress(rawddo)
+                rawddo = self.decompress(rawddo)
             except (KeyError, Exception) as err:
                 logger.error(f"Failed to decompress: {str(err)}")
 
         try:
-            ddo = json.loads(rawddo)
+            ddo = json_util.loads(rawddo)
             return ddo
         except (KeyError, Exception) as err:
             logger.error(
@@ -2,32 +2,56 @@
 # Copyright 2021 Ocean Protocol Foundation
 # SPDX-License-Identifier: Apache-2.0
 #
+import atexit
 import json
 import logging
 import os
 import time
 from json import JSONDecodeError
-from threading import Thread
+from threading import Lock, Thread
 
 import elasticsearch
 from eth_account import Account
-from eth_utils import is_address
+from eth_utils import (
+    encode_hex,
+    event_abi_to_log_topic,
+    is_address,
+    remove_0x_prefix,
+)
+from hexbytes import HexBytes
 
 from aquarius.app.auth_util import sanitize_addresses
-from aquarius.app.util import get_bool_env_value
-from aquarius.block_utils import BlockProcessingClass
+from aquarius.app.util import get_bool_env_value, get_int_env_value
+from aquarius.block_utils import BlockProcessingClass, ChunkSizeReduced
+from aquarius.events.backfill import BackfillEngine
+from aquarius.events.block_timestamps import BlockTimestampService
+from aquarius.events.bulk_writer import BulkWriter
+from aquarius.events.checkpoint import CheckpointCursor
 from aquarius.events.constants import EVENT_METADATA_CREATED, EVENT_METADATA_UPDATED
+from aquarius.events.datatoken_cache import DatatokenInfoCache
+from aquarius.events.decode_pool import get_decode_pool
+from aquarius.events.decryptor import Decryptor
+from aquarius.events.http_provider import JsonRpcBatch
+from aquarius.events.live_tail import LiveTail, get_live_tail_url
+from aquarius.events.pipeline import EventsPipeline
 from aquarius.events.processors import (
     MetadataCreatedProcessor,
     MetadataUpdatedProcessor,
 )
-from aquarius.events.purgatory import Purgatory
+from aquarius.events.purgatory import get_purgatory
+from aquarius.events.rbac import get_event_type, get_rbac_client
+from aquarius.events.reorg import ReorgJournal
 from aquarius.events.util import get_metadata_contract, get_metadata_start_block
 from aquarius.app.es_instance import ElasticsearchInstance
 
 
 logger = logging.getLogger(__name__)
 
+EVENT_PROCESSORS = {
+    EVENT_METADATA_CREATED: MetadataCreatedProcessor,
+    EVENT_METADATA_UPDATED: MetadataUpdatedProcessor,
+}
+
 
 class EventsMonitor(BlockProcessingClass):
     """Detect on-chain published Metadata and cache it in the database for
@@ -48,28 +72,82 @@ class EventsMonitor(BlockProcessingClass):
     The cached Metadata can be restricted to only those published by specific ethereum accounts.
     To do this set the `ALLOWED_PUBLISHERS` envvar to the list of ethereum addresses of known publishers.
 
+    Log fetching for the next chunks can overlap with processing of the current one, by setting
+    `EVENTS_PIPELINE_DEPTH` to the number of chunks fetched ahead. See `EventsPipeline`.
+
+    Large block gaps (e.g. on a fresh node) can be indexed by a pool of workers, by setting
+    `EVENTS_BACKFILL_WORKERS` to more than 1. See `BackfillEngine`.
+
+    With `EVENTS_LIVE_TAIL` set, events are processed as soon as they are mined, through a
+    websocket logs subscription (`EVENTS_WS_RPC`, or `EVENTS_RPC` if it is a websocket).
+    Polling only resumes while the subscription is down. See `LiveTail`.
+
+    With `EVENTS_CONFIRMATIONS` set, the checkpoint stays that many blocks below the head, and
+    the blocks above it are indexed provisionally and rolled back on reorgs. See `ReorgJournal`.
+
 
 
     """
 
     _instance = None
 
-    def __init__(self, web3, config_file, metadata_contract=None):
-        self._es_instance = ElasticsearchInstance(config_file)
+    def __init__(
+        self,
+        web3,
+        config_file,
+        metadata_contract=None,
+        es_instance=None,
+        start_block=None,
+        chunk_size=None,
+        purgatory=None,
+        decode_pool=None,
+    ):
+        """
+        :param es_instance: `ElasticsearchInstance` shared with other monitors,
+            a new one is created by default
+        :param start_block: first block to process, `METADATA_CONTRACT_BLOCK` or
+            the contract start block by default
+        :param chunk_size: initial chunk size, `BLOCKS_CHUNK_SIZE` by default
+        :param purgatory: `Purgatory` shared with other monitors, created from
+            the envvars by default
+        :param decode_pool: `DecodePool` shared with other monitors, created
+            from the envvars by default
+        """
+        self._es_instance = es_instance or ElasticsearchInstance(config_file)
 
         self._other_db_index = f"{self._es_instance.db_index}_plus"
         self._es_instance.es.indices.create(index=self._other_db_index, ignore=400)
 
         self._web3 = web3
+        self._block_timestamps = BlockTimestampService(
+            self._web3, get_int_env_value("EVENTS_BLOCK_CACHE_SIZE", 10000)
+        )
+        self._datatoken_cache = DatatokenInfoCache(
+            self._web3,
+            get_int_env_value("EVENTS_DATATOKEN_CACHE_SIZE", 1000),
+            get_int_env_value("EVENTS_DATATOKEN_CACHE_TTL", 3600),
+        )
 
         if not metadata_contract:
             metadata_contract = get_metadata_contract(self._web3)
         self._chain_id = self._web3.eth.chain_id
         self.add_chain_id_to_chains_list()
         self._index_name = "events_last_block_" + str(self._chain_id)
+        self._checkpoint = CheckpointCursor(
+            self._es_instance.es,
+            self._other_db_index,
+            self._index_name,
+            flush_every=get_int_env_value("EVENTS_CHECKPOINT_FLUSH_CHUNKS", 10),
+            flush_interval=get_int_env_value("EVENTS_CHECKPOINT_FLUSH_INTERVAL", 30),
+        )
+        atexit.register(self._checkpoint.flush)
         self._contract = metadata_contract
         self._contract_address = self._contract.address if self._contract else None
-        self._start_block = get_metadata_start_block()
+        self._start_block = (
+            start_block if start_block is not None else get_metadata_start_block()
+        )
+        self.initial_chunk_size = chunk_size
+        self.events_processed = 0
 
         if get_bool_env_value("EVENTS_CLEAN_START", 0):
             self.reset_chain()
@@ -79,8 +157,23 @@ class EventsMonitor(BlockProcessingClass):
         if self._ecies_private_key:
             self._ecies_account = Account.from_key(self._ecies_private_key)
         self._only_encrypted_ddo = get_bool_env_value("ONLY_ENCRYPTED_DDO", 0)
+        self._decryptor = Decryptor(self._ecies_account)
 
         self.get_or_set_last_block()
+        self._pipeline_depth = get_int_env_value("EVENTS_PIPELINE_DEPTH", 0)
+        self._backfill_workers = get_int_env_value("EVENTS_BACKFILL_WORKERS", 0)
+        self._backfill_shard_size = max(
+            1, get_int_env_value("EVENTS_BACKFILL_SHARD_SIZE", 10000)
+        )
+        self._confirmations = max(0, get_int_env_value("EVENTS_CONFIRMATIONS", 0))
+        self._reorg_journal = (
+            ReorgJournal(self, self._confirmations) if self._confirmations else None
+        )
+        self._bulk_max_docs = max(1, get_int_env_value("ES_BULK_MAX_DOCS", 500))
+        self._bulk_max_bytes = max(
+            1, get_int_env_value("ES_BULK_MAX_BYTES", 10 * 1024 * 1024)
+        )
+        self._decode_pool = decode_pool or get_decode_pool(self._ecies_private_key)
         allowed_publishers = set()
         try:
             publishers_str = os.getenv("ALLOWED_PUBLISHERS", "")
@@ -115,12 +208,29 @@ class EventsMonitor(BlockProcessingClass):
             )
             self._contract = None
 
-        self.purgatory = (
-            Purgatory(self._es_instance)
-            if (os.getenv("ASSET_PURGATORY_URL") or os.getenv("ACCOUNT_PURGATORY_URL"))
-            else None
+        self._event_topics = (
+            {
+                self.get_event_topic(event_name): event_name
+                for event_name in EVENT_PROCESSORS
+            }
+            if self._contract
+            else {}
         )
 
+        self.processing_lock = Lock()
+        self._live_tail = None
+        if get_bool_env_value("EVENTS_LIVE_TAIL", 0):
+            ws_url = get_live_tail_url(self._web3)
+            if ws_url:
+                self._live_tail = LiveTail(self, ws_url)
+            else:
+                logger.error(
+                    "EVENTS_LIVE_TAIL requires a websocket RPC in EVENTS_WS_RPC or EVENTS_RPC. "
+                    "Falling back to polling."
+                )
+
+        self.purgatory = purgatory or get_purgatory(self._es_instance)
+
         purgatory_message = (
             "Enabling purgatory" if self.purgatory else "Purgatory is disabled"
         )
@@ -148,9 +258,18 @@ class EventsMonitor(BlockProcessingClass):
         t = Thread(target=self.run_monitor, daemon=True)
         self._monitor_is_on = True
         t.start()
+        if self.purgatory:
+            self.purgatory.start(self._monitor_sleep_time)
+        if self._live_tail:
+            self._live_tail.start()
 
     def stop_monitor(self):
         self._monitor_is_on = False
+        if self.purgatory:
+            self.purgatory.stop()
+        self._checkpoint.flush()
+        if self._decode_pool:
+            self._decode_pool.shutdown()
 
     def run_monitor(self):
         while True:
@@ -162,38 +281,75 @@ class EventsMonitor(BlockProcessingClass):
             return
 
         try:
-            self.process_current_blocks()
+            # the live tail processes the new blocks while it is connected
+            if not (self._live_tail and self._live_tail.is_connected):
+                with self.processing_lock:
+                    self.process_current_blocks()
         except (KeyError, Exception) as e:
             logger.error(f"Error processing event: {str(e)}.")
 
-        if self.purgatory:
-            try:
-                self.purgatory.update_lists()
-            except (KeyError, Exception) as e:
-                logger.error(f"Error updating purgatory list: {str(e)}.")
-
     def process_current_blocks(self):
-        """Process all blocks from the last processed block to the current block."""
-        last_block = self.get_last_processed_block()
+        """Process all blocks from the last processed block to the current block.
+
+        With `EVENTS_CONFIRMATIONS`, the blocks above the confirmation depth are
+        processed provisionally, see `ReorgJournal`.
+        """
         current_block = self._web3.eth.block_number
+        if not current_block or not isinstance(current_block, int):
+            return
+
+        if not self._reorg_journal:
+            self.process_blocks(self.get_last_processed_block(), current_block)
+            return
+
+        safe_block = self._reorg_journal.confirm_blocks(current_block)
+        self.process_blocks(self.get_last_processed_block(), safe_block)
+        self._reorg_journal.process_provisional_blocks(safe_block, current_block)
+
+    def process_blocks(self, last_block, current_block):
+        """Process the blocks after the checkpoint, up to `current_block`."""
+        if current_block <= last_block:
+            return
+
         if (
-            not current_block
-            or not isinstance(current_block, int)
-            or current_block <= last_block
+            self._backfill_workers > 1
+            and current_block - last_block > self._backfill_shard_size
         ):
+            BackfillEngine(self, self._backfill_workers, self._backfill_shard_size).run(
+                last_block, current_block
+            )
             return
 
-        from_block = last_block
+        if self._pipeline_depth > 0:
+            EventsPipeline(self, self._pipeline_depth).run(last_block, current_block)
+            return
 
-        start_block_chunk = from_block
-        for end_block_chunk in range(
-            from_block, current_block, self.blockchain_chunk_size
-        ):
-            self.process_block_range(start_block_chunk, end_block_chunk)
-            start_block_chunk = end_block_chunk
+        for _, end_block, events in self.iter_event_chunks(last_block, current_block):
+            self.process_events(events)
+            self.store_last_processed_block(end_block)
+
+    def iter_event_chunks(self, from_block, to_block):
+        """Walk the range, both ends included, in chunks of the current
+        `blockchain_chunk_size`.
+
+        :return: generator of (chunk_from_block, chunk_to_block, events) tuples
+        """
+        start_block = from_block
+        while start_block <= to_block:
+            end_block = min(start_block + self.blockchain_chunk_size - 1, to_block)
+            logger.debug(
+                f"Metadata monitor (chain: {self._chain_id})>>>> from_block:{start_block}, current_block:{end_block} <<<<"
+            )
+            try:
+                events = self.get_event_logs(
+                    list(EVENT_PROCESSORS), start_block, end_block
+                )
+            except ChunkSizeReduced:
+                continue
 
-        # Process last few blocks because range(start, end) doesn't include end
-        self.process_block_range(end_block_chunk, current_block)
+            self.prefetch_event_data(events)
+            yield start_block, end_block, events
+            start_block = end_block + 1
 
     def process_block_range(self, from_block, to_block):
         """Process a range of blocks."""
@@ -204,42 +360,122 @@ class EventsMonitor(BlockProcessingClass):
         if from_block > to_block:
             return
 
-        processor_args = [
+        events = self.get_event_logs(list(EVENT_PROCESSORS), from_block, to_block)
+        self.prefetch_event_data(events)
+        self.process_events(events)
+
+        self.store_last_processed_block(to_block)
+
+    def prefetch_event_data(self, events):
+        """Resolve the chain data needed by the processors of `events` in bulk,
+        with a single JSON-RPC batch, and the RBAC permissions of their
+        publishers concurrently."""
+        batch = JsonRpcBatch(self._web3)
+        self._block_timestamps.prefetch((event.blockNumber for event in events), batch)
+        self._datatoken_cache.prefetch(
+            (event.args.dataToken for event in events), batch
+        )
+        try:
+            batch.execute()
+        except Exception as e:
+            # processors fetch whatever is missing on their own
+            logger.warning(f"Prefetching chain data failed: {e}")
+
+        rbac_client = get_rbac_client()
+        if rbac_client:
+            rbac_client.prefetch(
+                (
+                    get_event_type(event.event),
+                    event.args.get("createdBy", event.args.get("updatedBy")),
+                )
+                for event in events
+                if event.args.get("createdBy", event.args.get("updatedBy"))
+            )
+
+    def process_events(self, events):
+        """Apply decoded Metadata events, in the order they are given.
+
+        The events of a DID are applied on top of each other in memory: its
+        stored DDO is read once, with the others, and only its final state is
+        written, with `_bulk` requests once all the events were processed, see
+        `BulkWriter`.
+        """
+        bulk_writer = self.get_bulk_writer()
+        dids = self.get_event_dids(events)
+        bulk_writer.prefetch(sorted(dids))
+        self.apply_events(events, bulk_writer, self.decode_events(events))
+
+        if len(events) > len(dids):
+            logger.info(
+                f"Coalesced {len(events)} events of {len(dids)} DIDs into "
+                f"{len(bulk_writer)} DDO writes."
+            )
+        bulk_writer.flush()
+        self.events_processed += len(events)
+
+    def get_bulk_writer(self):
+        """:return: `BulkWriter` buffering the DDO writes of a chunk"""
+        return BulkWriter(
             self._es_instance,
+            self._bulk_max_docs,
+            self._bulk_max_bytes,
+            unversioned=(
+                self._reorg_journal.unversioned_dids if self._reorg_journal else ()
+            ),
+        )
+
+    @staticmethod
+    def get_event_dids(events):
+        """:return: set of the DIDs of `events`"""
+        return {
+            f"did:op:{remove_0x_prefix(event.args.dataToken)}"
+            for event in events
+            if event.args.get("dataToken")
+        }
+
+    def decode_events(self, events):
+        """:return: list of the `DecodePool` results of `events`, in order. None
+        for the events left to their processor, all of them without a pool."""
+        if self._decode_pool and len(events) > 1:
+            try:
+                return self._decode_pool.decode(events)
+            except Exception as e:
+                logger.error(f"Cannot decode the events in the decode pool: {e}")
+
+        return [None] * len(events)
+
+    def apply_events(self, events, bulk_writer, decoded):
+        """Run the processors of `events`, in order, on top of `bulk_writer`.
+
+        :param decoded: `decode_events` results of `events`
+        """
+        processor_args = [
+            bulk_writer,
             self._web3,
             self._ecies_account,
             self._allowed_publishers,
             self.purgatory,
             self._chain_id,
         ]
-
-        for event in self.get_event_logs(EVENT_METADATA_CREATED, from_block, to_block):
+        for event, event_decoded in zip(events, decoded):
             try:
-                event_processor = MetadataCreatedProcessor(*([event] + processor_args))
-                event_processor.process()
-            except Exception as e:
-                logger.error(
-                    f"Error processing create metadata event: {e}\n" f"event={event}"
+                event_processor = EVENT_PROCESSORS[event.event](
+                    *([event] + processor_args),
+                    block_timestamps=self._block_timestamps,
+                    datatoken_cache=self._datatoken_cache,
+                    decoded=event_decoded,
+                    decryptor=self._decryptor,
                 )
-
-        for event in self.get_event_logs(EVENT_METADATA_UPDATED, from_block, to_block):
-            try:
-                event_processor = MetadataUpdatedProcessor(*([event] + processor_args))
                 event_processor.process()
             except Exception as e:
                 logger.error(
-                    f"Error processing update metadata event: {e}\n" f"event={event}"
+                    f"Error processing {event.event} event: {e}\nevent={event}"
                 )
 
-        self.store_last_processed_block(to_block)
-
     def get_last_processed_block(self):
         block = 0
         try:
-            last_block_record = self._es_instance.es.get(
-                index=self._other_db_index, id=self._index_name, doc_type="_doc"
-            )["_source"]
-            block = last_block_record["last_block"]
+            block = self._checkpoint.get()
         except Exception as e:
             logger.error(f"Cannot get last_block error={e}")
         # no need to start from 0 if we have a deployment block
@@ -248,24 +484,19 @@ class EventsMonitor(BlockProcessingClass):
         return block
 
     def store_last_processed_block(self, block):
+        """Advance the checkpoint in memory. It is written to ES every
+        `EVENTS_CHECKPOINT_FLUSH_CHUNKS` chunks (default 10) or
+        `EVENTS_CHECKPOINT_FLUSH_INTERVAL` seconds (default 30), and on shutdown."""
         # make sure that we don't write a block < then needed
-        stored_block = self.get_last_processed_block()
-        if block <= stored_block:
+        if block <= self.get_last_processed_block():
             return
-        record = {"last_block": block}
-        try:
-            self._es_instance.es.index(
-                index=self._other_db_index,
-                id=self._index_name,
-                body=record,
-                doc_type="_doc",
-                refresh="wait_for",
-            )["_id"]
 
-        except elasticsearch.exceptions.RequestError:
-            logger.error(
-                f"store_last_processed_block: block={block} type={type(block)}, ES RequestError"
-            )
+        self._checkpoint.advance(block)
+
+    def rewind_last_processed_block(self, block):
+        """Move the checkpoint back to `block`, so the blocks after it are
+        processed again, e.g. after a reorg."""
+        self._checkpoint.rewind(max(block, self._start_block))
 
     def add_chain_id_to_chains_list(self):
         try:
@@ -282,7 +513,7 @@ class EventsMonitor(BlockProcessingClass):
                 id="chains",
                 body=json.dumps(chains),
                 doc_type="_doc",
-                refresh="wait_for",
+                refresh=self._es_instance.write_refresh,
             )["_id"]
             logger.info(f"Added {self._chain_id} to chains list")
         except elasticsearch.exceptions.RequestError:
@@ -290,52 +521,203 @@ class EventsMonitor(BlockProcessingClass):
                 f"Cannot add chain_id {self._chain_id} to chains list: ES RequestError"
             )
 
-    def reset_chain(self):
-        assets = self.get_assets_in_chain()
-        for asset in assets:
+    def reset_chain(self, poll_interval=5, max_restarts=3):
+        """Delete the assets of the chain with a `delete_by_query` task, split
+        in `EVENTS_CLEAN_START_SLICES` slices (default auto) and throttled to
+        `EVENTS_CLEAN_START_RATE` requests per second (default unthrottled).
+
+        The task runs in Elasticsearch, its progress is logged every
+        `poll_interval` seconds. Its id is saved in the `<index>_plus` index
+        until it completes, so that a restart resumes waiting for it instead
+        of starting another one. A task that is lost (e.g. the node restarted)
+        is started again, at most `max_restarts` times.
+        """
+        task_id = self.get_reset_task()
+        if task_id:
+            logger.info(
+                f"Resuming the reset of chain {self._chain_id}, task {task_id}."
+            )
+        else:
+            task_id = self.start_reset_task()
+
+        restarts = 0
+        while True:
             try:
-                self._es_instance.delete(asset["id"])
-            except Exception as e:
-                logging.error(f"Delete asset failed: {str(e)}")
+                task = self._es_instance.es.tasks.get(task_id=task_id)
+            except elasticsearch.exceptions.NotFoundError:
+                if restarts >= max_restarts:
+                    logger.error(
+                        f"Reset task {task_id} of chain {self._chain_id} was lost "
+                        f"{restarts + 1} times, the chain is not reset."
+                    )
+                    return
+
+                logger.warning(
+                    f"Reset task {task_id} of chain {self._chain_id} was lost, "
+                    f"restarting it."
+                )
+                restarts += 1
+                task_id = self.start_reset_task()
+                continue
+            except elasticsearch.exceptions.TransportError as e:
+                logger.warning(f"Cannot get reset task {task_id}: {e}")
+                time.sleep(poll_interval)
+                continue
+
+            status = task["task"]["status"]
+            if task.get("completed"):
+                break
+
+            logger.info(
+                f"Resetting chain {self._chain_id}: deleted {status['deleted']} of "
+                f"{status['total']} assets."
+            )
+            time.sleep(poll_interval)
 
+        response = task.get("response", status)
+        if task.get("error") or response.get("failures"):
+            logger.error(
+                f"Reset of chain {self._chain_id} failed for some assets: "
+                f"{task.get('error') or response['failures']}"
+            )
+        logger.info(
+            f"Reset chain {self._chain_id}: deleted {response['deleted']} assets."
+        )
+        self._es_instance.es.delete(
+            index=self._other_db_index,
+            id=self.reset_task_doc_id,
+            doc_type="_doc",
+            ignore=404,
+        )
         self.store_last_processed_block(self._start_block)
 
-    def get_assets_in_chain(self):
-        body = {
-            "query": {
-                "query_string": {
-                    "query": self._chain_id,
-                    "default_field": "chainId",
-                }
+    def start_reset_task(self):
+        """Start the `delete_by_query` task of `reset_chain`, and save its id.
+
+        :return: task id
+        """
+        slices = os.getenv("EVENTS_CLEAN_START_SLICES", "auto")
+        task_id = self._es_instance.es.delete_by_query(
+            index=self._es_instance.db_index,
+            body={"query": self.get_chain_query()},
+            conflicts="proceed",
+            refresh=True,
+            requests_per_second=get_int_env_value("EVENTS_CLEAN_START_RATE", -1),
+            slices=int(slices) if slices.isdigit() else "auto",
+            wait_for_completion=False,
+        )["task"]
+        self._es_instance.es.index(
+            index=self._other_db_index,
+            id=self.reset_task_doc_id,
+            body={"task": task_id},
+            doc_type="_doc",
+        )
+        logger.info(f"Resetting chain {self._chain_id}, task {task_id}.")
+        return task_id
+
+    @property
+    def reset_task_doc_id(self):
+        return f"reset_chain_task_{self._chain_id}"
+
+    def get_reset_task(self):
+        """:return: id of the unfinished `reset_chain` task, None if there is
+        none or it can not be read"""
+        try:
+            task_id = self._es_instance.es.get(
+                index=self._other_db_index, id=self.reset_task_doc_id, doc_type="_doc"
+            )["_source"]["task"]
+            # a completed task is not resumed, its deletions are done again
+            if not self._es_instance.es.tasks.get(task_id=task_id).get("completed"):
+                return task_id
+        except elasticsearch.exceptions.NotFoundError:
+            pass
+        except elasticsearch.exceptions.TransportError as e:
+            logger.warning(
+                f"Cannot resume the reset of chain {self._chain_id}, "
+                f"starting it again: {e}"
+            )
+
+        return None
+
+    def get_chain_query(self):
+        return {
+            "query_string": {
+                "query": self._chain_id,
+                "default_field": "chainId",
             }
         }
-        page = self._es_instance.es.search(index=self._es_instance.db_index, body=body)
-        total = page["hits"]["total"]
-        body["size"] = total
-        page = self._es_instance.es.search(index=self._es_instance.db_index, body=body)
-
-        object_list = []
-        for x in page["hits"]["hits"]:
-            object_list.append(x["_source"])
 
-        return object_list
+    def get_assets_in_chain(self, source=None):
+        """
+        :param source: `_source` filtering, e.g. list of the fields to read
+        :return: generator of the assets of the chain
+        """
+        return self._es_instance.scan(self.get_chain_query(), source=source)
+
+    def get_event_topic(self, event_name):
+        """:return: hex encoded topic (signature hash) of the contract event"""
+        event_abi = getattr(self._contract.events, event_name)().abi
+        return encode_hex(event_abi_to_log_topic(event_abi))
+
+    def get_event_logs(
+        self, event_names, from_block, to_block, _get_logs_callback=None
+    ):
+        """Retrieve the logs of all `event_names` in a single `eth_getLogs` call,
+        by OR-ing the event signatures in the first topic.
+
+        :return: list of decoded events, sorted by (blockNumber, logIndex)
+        """
+        topics = [
+            topic
+            for topic, event_name in self._event_topics.items()
+            if event_name in event_names
+        ]
 
-    def get_event_logs(self, event_name, from_block, to_block, _get_logs_callback=None):
-        def _get_logs_orig(event, _from_block, _to_block):
-            logger.debug(f"get_event_logs ({event_name}, {from_block}, {to_block})..")
-            _filter = event().createFilter(fromBlock=_from_block, toBlock=_to_block)
-            return _filter.get_all_entries()
+        def _get_logs_orig(_topics, _from_block, _to_block):
+            logger.debug(f"get_event_logs ({event_names}, {from_block}, {to_block})..")
+            return self._web3.eth.get_logs(
+                {
+                    "address": self._contract_address,
+                    "fromBlock": _from_block,
+                    "toBlock": _to_block,
+                    "topics": [_topics],
+                }
+            )
 
         _get_logs = _get_logs_callback if _get_logs_callback else _get_logs_orig
 
         for x in [0, 1]:
+            start_time = time.time()
             try:
-                return _get_logs(
-                    getattr(self._contract.events, event_name), from_block, to_block
+                logs = _get_logs(topics, from_block, to_block)
+                self.chunk_size_controller.on_success(
+                    time.time() - start_time, len(logs)
                 )
+                break
             except ValueError as e:
+                if self.chunk_size_controller.on_error(e):
+                    raise ChunkSizeReduced(
+                        f"Blocks {from_block}-{to_block} rejected, retrying with "
+                        f"a chunk size of {self.blockchain_chunk_size}: {e}"
+                    )
                 suffix = "" if x == 1 else "\n Retrying once more."
                 logger.error(
-                    f"get_event_logs ({event_name}, {from_block}, {to_block}) failed: {e}."
+                    f"get_event_logs ({event_names}, {from_block}, {to_block}) failed: {e}."
                     + suffix
                 )
+                if x == 1:
+                    raise
+
+        return self.decode_event_logs(logs)
+
+    def decode_event_logs(self, logs):
+        """Decode raw Metadata logs and sort them in chain order."""
+        events = []
+        for log in logs:
+            event_name = self._event_topics.get(HexBytes(log["topics"][0]).hex())
+            if not event_name:
+                continue
+
+            events.append(getattr(self._contract.events, event_name)().processLog(log))
+
+        return sorted(events, key=lambda event: (event.blockNumber, event.logIndex))
@@ -2,12 +2,22 @@
 # Copyright 2021 Ocean Protocol Foundation
 # SPDX-License-Identifier: Apache-2.0
 #
+import logging
 import os
+import time
+from threading import Lock
+
+import requests
+from eth_utils import to_bytes
 from web3 import HTTPProvider
 from web3 import WebsocketProvider
+from web3._utils.encoding import FriendlyJsonSerde
 
+from aquarius.app.util import get_int_env_value
 from aquarius.events.request import make_post_request
 
+logger = logging.getLogger(__name__)
+
 GANACHE_URL = "http://127.0.0.1:8545"
 POLYGON_URL = "https://rpc.polygon.oceanprotocol.com"
 
@@ -21,11 +31,83 @@ SUPPORTED_NETWORK_NAMES = {
 }
 
 
+class BatchStats:
+    """Counts the JSON-RPC batches sent and logs their rate every `interval`
+    seconds."""
+
+    def __init__(self, interval=60):
+        self.interval = interval
+        self._lock = Lock()
+        self._reset()
+
+    def _reset(self):
+        self.batches = 0
+        self.calls = 0
+        self._start_time = time.time()
+
+    def record(self, size):
+        with self._lock:
+            self.batches += 1
+            self.calls += size
+            elapsed = time.time() - self._start_time
+            if elapsed < self.interval:
+                return
+
+            logger.info(
+                f"JSON-RPC batches: {self.batches / elapsed:.2f} batches/s, "
+                f"{self.calls / self.batches:.1f} requests per batch."
+            )
+            self._reset()
+
+
+class JsonRpcBatch:
+    """JSON-RPC requests collected to be sent in a single round trip.
+
+    Providers without `make_batch_request` (e.g. websockets) get the requests
+    one by one.
+    """
+
+    def __init__(self, web3):
+        self._provider = web3.provider
+        self._calls = []
+        self._callbacks = []
+
+    def __len__(self):
+        return len(self._calls)
+
+    def add(self, method, params, callback):
+        """`callback` is called with the JSON-RPC response of the request."""
+        self._calls.append((method, params))
+        self._callbacks.append(callback)
+
+    def execute(self):
+        calls, callbacks = self._calls, self._callbacks
+        self._calls, self._callbacks = [], []
+        if not calls:
+            return
+
+        make_batch_request = getattr(self._provider, "make_batch_request", None)
+        if make_batch_request and len(calls) > 1:
+            responses = make_batch_request(calls)
+        else:
+            responses = [
+                self._provider.make_request(method, params) for method, params in calls
+            ]
+
+        for callback, response in zip(callbacks, responses):
+            callback(response)
+
+
 class CustomHTTPProvider(HTTPProvider):
     """
     Override requests to control the connection pool to make it blocking.
     """
 
+    def __init__(self, endpoint_uri=None, request_kwargs=None, session=None):
+        super().__init__(endpoint_uri, request_kwargs, session)
+        self.batch_max_size = max(1, get_int_env_value("RPC_BATCH_MAX_SIZE", 100))
+        self.batch_stats = BatchStats()
+
     def make_request(self, method, params):
         self.logger.debug(
             "Making request HTTP. URI: %s, Method: %s", self.endpoint_uri, method
@@ -43,6 +125,70 @@ class CustomHTTPProvider(HTTPProvider):
         )
         return response
 
+    def make_batch_request(self, calls):
+        """Send several JSON-RPC requests in as few HTTP POSTs as possible.
+        Batches larger than `RPC_BATCH_MAX_SIZE` are split.
+
+        :param calls: list of (method, params) tuples
+        :return: list of JSON-RPC responses, in the same order as `calls`
+        """
+        responses = []
+        for i in range(0, len(calls), self.batch_max_size):
+            responses.extend(
+                self._make_batch_request(calls[i : i + self.batch_max_size])
+            )
+
+        return responses
+
+    def _make_batch_request(self, calls):
+        request_data = [
+            {
+                "jsonrpc": "2.0",
+                "method": method,
+                "params": params or [],
+                "id": next(self.request_counter),
+            }
+            for method, params in calls
+        ]
+        self.logger.debug(
+            "Making batch request HTTP. URI: %s, Requests: %s",
+            self.endpoint_uri,
+            len(request_data),
+        )
+        try:
+            raw_response = make_post_request(
+                self.endpoint_uri,
+                to_bytes(text=FriendlyJsonSerde().json_encode(request_data)),
+                **self.get_request_kwargs(),
+            )
+            responses = self.decode_rpc_response(raw_response)
+        except requests.HTTPError as e:
+            if e.response is None or e.response.status_code != 413:
+                raise
+            responses = {"error": str(e)}
+
+        if not isinstance(responses, list):
+            if len(calls) == 1:
+                return [responses]
+
+            # the batch was rejected as a whole, e.g. for being too large
+            logger.warning(
+                f"Batch of {len(calls)} requests rejected, splitting it: {responses.get('error')}"
+            )
+            half = len(calls) // 2
+            return self._make_batch_request(calls[:half]) + self._make_batch_request(
+                calls[half:]
+            )
+
+        self.batch_stats.record(len(calls))
+        responses_by_id = {response.get("id"): response for response in responses}
+        return [
+            responses_by_id.get(
+                request["id"], {"error": f"No response for request {request['id']}"}
+            )
+            for request in request_data
+        ]
+
 
 def get_web3_connection_provider(network_url):
     if network_url.startswith("http"):
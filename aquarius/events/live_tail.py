@@ -0,0 +1,181 @@
+#
+# Copyright 2021 Ocean Protocol Foundation
+# SPDX-License-Identifier: Apache-2.0
+#
+import asyncio
+import json
+import logging
+import os
+from threading import Thread
+
+import websockets
+from web3._utils.method_formatters import log_entry_formatter
+
+logger = logging.getLogger(__name__)
+
+
+def get_live_tail_url(web3):
+    """:return: websocket URL to subscribe to, from `EVENTS_WS_RPC` or the
+    websocket provider of `web3`. None if there is neither."""
+    ws_url = os.getenv("EVENTS_WS_RPC")
+    if ws_url:
+        return ws_url
+
+    endpoint_uri = str(getattr(web3.provider, "endpoint_uri", ""))
+    return endpoint_uri if endpoint_uri.startswith("ws") else None
+
+
+class LiveTail:
+    """Process Metadata events as they are mined, over a websocket `logs`
+    subscription, instead of waiting for the next poll of the monitor.
+
+    On every (re)connection, the subscription is opened first, then the gap
+    between the last processed block and the current head is filled with
+    `process_blocks`. Notifications of blocks covered by the gap fill are
+    dropped, the others are processed in order. A log removed by a reorg moves
+    the checkpoint back below its block, and the gap is filled again from
+    there. While disconnected, the polling loop of the monitor takes over.
+    """
+
+    def __init__(self, monitor, ws_url, reconnect_delay=1, max_reconnect_delay=60):
+        self._monitor = monitor
+        self.ws_url = ws_url
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.is_connected = False
+        self._checkpoint = None
+
+    def start(self):
+        Thread(target=lambda: asyncio.run(self.run()), daemon=True).start()
+
+    async def run(self):
+        delay = self.reconnect_delay
+        while self._monitor._monitor_is_on:
+            try:
+                await self.tail()
+            except (KeyError, Exception) as e:
+                logger.warning(
+                    f"Live tail: disconnected from {self.ws_url} ({e}), "
+                    f"reconnecting in {delay}s."
+                )
+            else:
+                delay = self.reconnect_delay
+            finally:
+                self.is_connected = False
+
+            await asyncio.sleep(delay)
+            delay = min(2 * delay, self.max_reconnect_delay)
+
+    def get_subscription_request(self):
+        return {
+            "jsonrpc": "2.0",
+            "id": 1,
+            "method": "eth_subscribe",
+            "params": [
+                "logs",
+                {
+                    "address": self._monitor._contract_address,
+                    "topics": [list(self._monitor._event_topics)],
+                },
+            ],
+        }
+
+    async def tail(self):
+        loop = asyncio.get_event_loop()
+        async with websockets.connect(self.ws_url) as ws:
+            await ws.send(json.dumps(self.get_subscription_request()))
+            response = json.loads(await ws.recv())
+            if "error" in response:
+                raise ValueError(f"eth_subscribe failed: {response['error']}")
+            logger.info(
+                f"Live tail: subscribed to {self._monitor._contract_address} logs "
+                f"on {self.ws_url}."
+            )
+
+            # read notifications while the gap is being filled
+            notifications = asyncio.Queue()
+            reader = asyncio.ensure_future(self.read(ws, notifications))
+            try:
+                filled_to = await loop.run_in_executor(None, self.fill_gap)
+                self.is_connected = True
+                while True:
+                    message = await notifications.get()
+                    if isinstance(message, Exception):
+                        raise message
+                    await loop.run_in_executor(
+                        None, self.handle_notification, message, filled_to
+                    )
+            finally:
+                reader.cancel()
+
+    @staticmethod
+    async def read(ws, notifications):
+        try:
+            async for message in ws:
+                notifications.put_nowait(json.loads(message))
+            notifications.put_nowait(ConnectionError("connection closed"))
+        except Exception as e:
+            notifications.put_nowait(e)
+
+    def fill_gap(self):
+        """Process the blocks mined since the last processed block.
+
+        :return: last block processed
+        """
+        monitor = self._monitor
+        with monitor.processing_lock:
+            from_block = monitor.get_last_processed_block()
+            to_block = monitor._web3.eth.block_number
+            if monitor._reorg_journal:
+                monitor.process_current_blocks()
+                return to_block
+
+            monitor.process_blocks(from_block, to_block)
+
+        logger.info(f"Live tail: filled the gap of blocks {from_block}-{to_block}.")
+        self._checkpoint = to_block
+        return to_block
+
+    def handle_notification(self, message, filled_to):
+        """Process the log of a subscription notification.
+
+        :return: True if the log was processed, False if it was skipped
+        """
+        log = message.get("params", {}).get("result")
+        if not log:
+            return False
+
+        block = int(log["blockNumber"], 16)
+        monitor = self._monitor
+        if monitor._reorg_journal:
+            # confirmations and reorgs are handled by the journal, the log only
+            # tells that there are new events to process
+            with monitor.processing_lock:
+                monitor.process_current_blocks()
+            return True
+
+        if log.get("removed"):
+            logger.warning(
+                f"Live tail: log {log.get('transactionHash')} of block {block} "
+                f"was removed by a reorg, processing again from block {block - 1}."
+            )
+            with monitor.processing_lock:
+                monitor.rewind_last_processed_block(block - 1)
+                self._checkpoint = None
+            self.fill_gap()
+            return False
+
+        if block <= filled_to:
+            return False
+
+        with monitor.processing_lock:
+            events = monitor.decode_event_logs([log_entry_formatter(log)])
+            monitor.prefetch_event_data(events)
+            monitor.process_events(events)
+            # blocks are reprocessed from the checkpoint included, so it is
+            # enough to store it once per block
+            if self._checkpoint is None or block > self._checkpoint:
+                monitor.store_last_processed_block(block)
+                self._checkpoint = block
+
+        return True
@@ -0,0 +1,182 @@
+#
+# Copyright 2021 Ocean Protocol Foundation
+# SPDX-License-Identifier: Apache-2.0
+#
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread
+
+from web3 import Web3
+
+from aquarius.app.es_instance import ElasticsearchInstance
+from aquarius.app.util import get_bool_env_value, get_int_env_value
+from aquarius.events.decode_pool import get_decode_pool
+from aquarius.events.events_monitor import EventsMonitor
+from aquarius.events.http_provider import get_web3_connection_provider
+from aquarius.events.purgatory import get_purgatory
+from aquarius.events.util import get_metadata_contract
+
+logger = logging.getLogger(__name__)
+
+
+def get_chains_config():
+    """Reads the `EVENTS_CHAINS` envvar, a json list of chain configurations:
+    `{"rpc": <url>, "contract": <Metadata address>, "start_block": <int>,
+    "chunk_size": <int>, "poa": <bool>}`. `rpc`, `contract` and `start_block` are
+    required: `METADATA_CONTRACT_BLOCK` and `NETWORK_NAME` describe a single chain.
+
+    :return: list of chain configurations, empty if `EVENTS_CHAINS` is not set
+    """
+    chains_str = os.getenv("EVENTS_CHAINS")
+    if not chains_str:
+        return []
+
+    try:
+        chains = json.loads(chains_str)
+    except json.JSONDecodeError as e:
+        raise AssertionError(f"EVENTS_CHAINS is not a valid json list: {e}")
+
+    for chain in chains:
+        if (
+            not chain.get("rpc")
+            or not chain.get("contract")
+            or not isinstance(chain.get("start_block"), int)
+        ):
+            raise AssertionError(
+                f"Invalid chain configuration {chain} in EVENTS_CHAINS, "
+                f"rpc, contract and start_block are required."
+            )
+
+    return chains
+
+
+class ChainStats:
+    """Lag and throughput of a chain, since the last report."""
+
+    def __init__(self, chain_id):
+        self.chain_id = chain_id
+        self.blocks = 0
+        self.events = 0
+        self.lag = None
+        self._start_time = time.time()
+
+    def record(self, blocks, events, lag):
+        self.blocks += blocks
+        self.events += events
+        self.lag = lag
+
+    def report(self):
+        """:return: report message, the counters are then reset"""
+        elapsed = max(time.time() - self._start_time, 1e-6)
+        message = (
+            f"Chain {self.chain_id}: lag {self.lag} blocks, "
+            f"{self.blocks / elapsed:.1f} blocks/s, {self.events / elapsed:.1f} events/s."
+        )
+        self.blocks = self.events = 0
+        self._start_time = time.time()
+        return message
+
+
+class MultiChainMonitor:
+    """Runs one `EventsMonitor` per chain in a single process.
+
+    The monitors share the Elasticsearch client, the purgatory and the decode
+    pool, and their cycles are scheduled on a shared pool of `EVENTS_CHAINS_WORKERS` threads
+    (one per chain by default), each chain waiting its sleep time between
+    cycles. The lag and throughput of every chain are logged every
+    `EVENTS_CHAINS_REPORT_INTERVAL` seconds (default 60).
+    """
+
+    def __init__(self, chains, config_file):
+        self._es_instance = ElasticsearchInstance(config_file)
+        self.purgatory = get_purgatory(self._es_instance)
+        self._decode_pool = get_decode_pool(os.getenv("EVENTS_ECIES_PRIVATE_KEY", ""))
+        self.monitors = []
+        for chain in chains:
+            web3 = Web3(get_web3_connection_provider(chain["rpc"]))
+            if chain.get("poa", get_bool_env_value("USE_POA_MIDDLEWARE", 0)):
+                from web3.middleware import geth_poa_middleware
+
+                web3.middleware_onion.inject(geth_poa_middleware, layer=0)
+
+            self.monitors.append(
+                EventsMonitor(
+                    web3,
+                    config_file,
+                    metadata_contract=get_metadata_contract(
+                        web3, Web3.toChecksumAddress(chain["contract"])
+                    ),
+                    es_instance=self._es_instance,
+                    start_block=chain["start_block"],
+                    chunk_size=chain.get("chunk_size"),
+                    purgatory=self.purgatory,
+                    decode_pool=self._decode_pool,
+                )
+            )
+
+        self.workers = max(1, get_int_env_value("EVENTS_CHAINS_WORKERS", len(chains)))
+        self.report_interval = get_int_env_value("EVENTS_CHAINS_REPORT_INTERVAL", 60)
+        self.stats = {
+            monitor: ChainStats(monitor._chain_id) for monitor in self.monitors
+        }
+        self._next_run = {monitor: 0 for monitor in self.monitors}
+
+    def start(self):
+        for monitor in self.monitors:
+            if monitor._contract is None:
+                logger.error(
+                    f"Cannot start events monitor of chain {monitor._chain_id} "
+                    f"without a valid contract object"
+                )
+                continue
+
+            logger.info(
+                f"Starting the events monitor of chain {monitor._chain_id} on "
+                f"contract {monitor._contract_address}."
+            )
+            monitor._monitor_is_on = True
+
+        if self.purgatory and self.monitors:
+            self.purgatory.start(self.monitors[0]._monitor_sleep_time)
+        Thread(target=self.run, daemon=True).start()
+
+    def run_cycle(self, monitor):
+        """Process the new blocks of a chain, and record its stats."""
+        try:
+            from_block = monitor.get_last_processed_block()
+            events_processed = monitor.events_processed
+            monitor.do_run_monitor()
+            to_block = monitor.get_last_processed_block()
+            self.stats[monitor].record(
+                to_block - from_block,
+                monitor.events_processed - events_processed,
+                monitor._web3.eth.block_number - to_block,
+            )
+        except Exception as e:
+            logger.error(f"Error monitoring chain {monitor._chain_id}: {e}")
+        finally:
+            self._next_run[monitor] = time.time() + monitor._monitor_sleep_time
+
+    def run(self):
+        running = {}
+        last_report = time.time()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while True:
+                now = time.time()
+                for monitor in self.monitors:
+                    if not monitor._monitor_is_on:
+                        continue
+                    if monitor in running and not running[monitor].done():
+                        continue
+                    if now >= self._next_run[monitor]:
+                        running[monitor] = executor.submit(self.run_cycle, monitor)
+
+                if now - last_report >= self.report_interval:
+                    for stats in self.stats.values():
+                        logger.info(stats.report())
+                    last_report = now
+
+                time.sleep(1)
@@ -0,0 +1,107 @@
+#
+# Copyright 2021 Ocean Protocol Foundation
+# SPDX-License-Identifier: Apache-2.0
+#
+import logging
+import queue
+import time
+from contextlib import contextmanager
+from threading import Event, Thread
+
+logger = logging.getLogger(__name__)
+
+
+class StageStats:
+    """Busy time accounting of a pipeline stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy_time = 0.0
+        self._start_time = time.time()
+
+    @contextmanager
+    def busy(self):
+        start_time = time.time()
+        try:
+            yield
+        finally:
+            self.busy_time += time.time() - start_time
+            self.items += 1
+
+    @property
+    def utilization(self):
+        """:return: fraction of the wall time spent working, between 0 and 1"""
+        elapsed = time.time() - self._start_time
+        return min(1.0, self.busy_time / elapsed) if elapsed > 0 else 0.0
+
+    def __str__(self):
+        return f"{self.name}: {self.items} chunks, {self.utilization:.0%} busy"
+
+
+class EventsPipeline:
+    """Bounded producer/consumer pipeline over a block range.
+
+    A fetch thread retrieves and decodes the logs of the next chunks while the
+    calling thread processes the current one (enrichment and ES writes). The
+    queue holds at most `depth` fetched chunks, which bounds memory. A chunk is
+    checkpointed with `store_last_processed_block` only once all of its events
+    were processed, exactly like the serial loop.
+    """
+
+    _DONE = object()
+
+    def __init__(self, monitor, depth):
+        self._monitor = monitor
+        self.depth = depth
+        self.fetch_stats = StageStats("fetch")
+        self.process_stats = StageStats("process")
+
+    def run(self, from_block, to_block):
+        """Process the range, both ends included."""
+        chunks = queue.Queue(maxsize=self.depth)
+        stop = Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    chunks.put(item, timeout=0.5)
+                    return
+                except queue.Full:
+                    continue
+
+        def produce():
+            try:
+                chunks_iter = self._monitor.iter_event_chunks(from_block, to_block)
+                while not stop.is_set():
+                    with self.fetch_stats.busy():
+                        chunk = next(chunks_iter, None)
+                    if chunk is None:
+                        break
+                    put(chunk)
+            except Exception as e:
+                put(e)
+            finally:
+                put(self._DONE)
+
+        producer = Thread(target=produce, daemon=True)
+        producer.start()
+        try:
+            while True:
+                item = chunks.get()
+                if item is self._DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+
+                _, end_block, events = item
+                with self.process_stats.busy():
+                    self._monitor.process_events(events)
+                    self._monitor.store_last_processed_block(end_block)
+        finally:
+            stop.set()
+            producer.join()
+            logger.info(
+                f"Events pipeline for blocks {from_block}-{to_block}: "
+                f"{self.fetch_stats}, {self.process_stats}."
+            )
@@ -5,26 +5,16 @@
 from abc import ABC
 from datetime import datetime
 from eth_utils import add_0x_prefix, remove_0x_prefix
-import json
+import elasticsearch
 import logging
-import os
-import requests
 
-from aquarius.ddo_checker.ddo_checker import (
-    is_valid_dict_remote,
-    list_errors_dict_remote,
-)
+from aquarius.app import json_util
 from aquarius.app.auth_util import compare_eth_addresses
-from aquarius.app.util import (
-    DATETIME_FORMAT,
-    format_timestamp,
-    get_metadata_from_services,
-    init_new_ddo,
-    list_errors,
-    validate_data,
-)
+from aquarius.app.util import DATETIME_FORMAT, format_timestamp, validate_data
 from aquarius.events.constants import EVENT_METADATA_CREATED
-from aquarius.events.util import get_datatoken_info
+from aquarius.events.decode_pool import get_record_and_errors
+from aquarius.events.rbac import get_rbac_client
+from aquarius.events.util import get_datatoken_info, get_event_version
 from aquarius.events.decryptor import Decryptor
 
 logger = logging.getLogger(__name__)
@@ -40,11 +30,22 @@ class EventProcessor(ABC):
         allowed_publishers,
         purgatory,
         chain_id,
+        block_timestamps=None,
+        datatoken_cache=None,
+        decoded=None,
+        decryptor=None,
     ):
-        """Initialises common Event processing properties."""
+        """Initialises common Event processing properties.
+
+        :param decoded: result of `decode_payload` for the event, if it was
+            decoded by a `DecodePool`
+        :param decryptor: `Decryptor` shared by the events, a new one is made
+            for the event otherwise
+        """
         self.event = event
         self.did = f"did:op:{remove_0x_prefix(self.event.args.dataToken)}"
         self.block = event.blockNumber
+        self.version = get_event_version(self.block, event.get("logIndex", 0))
         self.txid = self.event.transactionHash.hex()
         self.contract_address = self.event.address
         self.sender_address = self.event.args.get(
@@ -56,13 +57,58 @@ class EventProcessor(ABC):
         self._es_instance = es_instance
         self._web3 = web3
         self._ecies_account = ecies_account
-        self.decryptor = Decryptor(ecies_account)
+        self.decryptor = decryptor or Decryptor(ecies_account)
         self.allowed_publishers = allowed_publishers
         self.purgatory = purgatory
         self._chain_id = chain_id
+        self.block_timestamps = block_timestamps
+        self.datatoken_cache = datatoken_cache
+        self.decoded = decoded
+
+    def get_block_timestamp(self):
+        """:return: timestamp of the event block"""
+        if self.block_timestamps:
+            return self.block_timestamps.get_timestamp(self.block)
+
+        return self._web3.eth.get_block(self.block)["timestamp"]
+
+    def get_datatoken_info(self, dt_address):
+        if self.datatoken_cache:
+            return self.datatoken_cache.get(dt_address)
+
+        return get_datatoken_info(self._web3, dt_address)
+
+    def decode_ddo(self):
+        if self.decoded is not None:
+            return self.decoded["data"]
+
+        return self.decryptor.decode_ddo(self.rawddo, self.flags)
+
+    def init_record(self, data):
+        """:return: (normalized record of `data`, list of its schema validation errors)"""
+        if (
+            self.decoded is not None
+            and self.decoded["record"] is not None
+            and data is self.decoded["data"]
+        ):
+            return self.decoded["record"], self.decoded["errors"]
+
+        return get_record_and_errors(data)
+
+    def is_in_purgatory(self):
+        """:return: "true" if the DID or the sender is in the purgatory lists,
+        "false" otherwise"""
+        if self.purgatory.is_asset_banned(self.did):
+            return "true"
+
+        if self.purgatory.is_account_banned(self.sender_address):
+            return "true"
+
+        return "false"
 
     def check_permission(self, publisher_address):
-        if not os.getenv("RBAC_SERVER_URL") or not publisher_address:
+        rbac_client = get_rbac_client()
+        if not rbac_client or not publisher_address:
             return True
 
         event_type = (
@@ -70,17 +116,7 @@ class EventProcessor(ABC):
             if self.__class__.__name__ == "MetadataCreatedProcessor"
             else "update"
         )
-        address = publisher_address
-        payload = {
-            "eventType": event_type,
-            "component": "metadatacache",
-            "credentials": {"type": "address", "value": address},
-        }
-
-        try:
-            return requests.post(os.getenv("RBAC_SERVER_URL"), json=payload).json()
-        except Exception:
-            return False
+        return rbac_client.check_permission(event_type, publisher_address)
 
 
 class MetadataCreatedProcessor(EventProcessor):
@@ -94,7 +130,7 @@ class MetadataCreatedProcessor(EventProcessor):
 
     def make_record(self, data):
         # to avoid unnecesary get_block calls, always init with timestamp 0 and get it from chain if the asset is valid
-        _record = init_new_ddo(data, 0)
+        _record, errors = self.init_record(data)
 
         # the event record will be used when updating the ddo
         _record["event"] = {
@@ -105,25 +141,18 @@ class MetadataCreatedProcessor(EventProcessor):
             "update": False,
         }
 
-        if not is_valid_dict_remote(get_metadata_from_services(_record["service"])):
-            errors = list_errors(
-                list_errors_dict_remote, get_metadata_from_services(_record["service"])
-            )
+        if errors:
             logger.error(
                 f"New ddo has validation errors: {errors} \nfor record:\n {_record}"
             )
             return False
 
         # check purgatory only if is a valid asset
-        if self.purgatory and self.purgatory.is_account_banned(self.sender_address):
-            _record["isInPurgatory"] = "true"
-        else:
-            _record["isInPurgatory"] = "false"
+        _record["isInPurgatory"] = self.is_in_purgatory() if self.purgatory else "false"
 
         # add info related to blockchain
-        blockInfo = self._web3.eth.get_block(self.event.blockNumber)
         _record["created"] = format_timestamp(
-            datetime.fromtimestamp(blockInfo["timestamp"]).strftime(DATETIME_FORMAT)
+            datetime.fromtimestamp(self.get_block_timestamp()).strftime(DATETIME_FORMAT)
         )
         _record["updated"] = _record["created"]
         _record["chainId"] = self._chain_id
@@ -131,7 +160,7 @@ class MetadataCreatedProcessor(EventProcessor):
         dt_address = _record.get("dataToken")
         assert dt_address == add_0x_prefix(self.did[len("did:op:") :])
         if dt_address:
-            _record["dataTokenInfo"] = get_datatoken_info(self._web3, dt_address)
+            _record["dataTokenInfo"] = self.get_datatoken_info(dt_address)
 
         return _record
 
@@ -145,15 +174,23 @@ class MetadataCreatedProcessor(EventProcessor):
             logger.warning(f"Sender {sender_address} is not in ALLOWED_PUBLISHERS.")
             return
 
+        # the event version only orders the creations of new DIDs, a DID
+        # registered on any chain is never replaced by a creation
+        version = self.version
         try:
             ddo = self._es_instance.read(did)
-            if ddo["chainId"] == self._chain_id:
-                logger.warning(f"{did} is already registered on this chainId")
-                return
-        except Exception:
+            logger.warning(
+                f"{did} is already registered on chainId {ddo.get('chainId')}"
+            )
+            return
+        except elasticsearch.exceptions.NotFoundError:
             pass
+        except Exception as e:
+            # unknown state, the creation is rejected if the DID exists
+            logger.warning(f"Cannot check whether {did} is registered: {e}")
+            version = None
 
-        data = self.decryptor.decode_ddo(self.rawddo, self.flags)
+        data = self.decode_ddo()
         if data is None:
             logger.warning(f"Could not decode ddo using flags {self.flags}")
             return
@@ -170,13 +207,11 @@ class MetadataCreatedProcessor(EventProcessor):
         _record = self.make_record(data)
         if _record:
             try:
-                record_str = json.dumps(_record)
-                self._es_instance.write(record_str, did)
-                _record = json.loads(record_str)
+                self._es_instance.write(json_util.dumps(_record), did, version=version)
                 name = _record["service"][0]["attributes"]["main"]["name"]
                 created = _record["created"]
                 logger.info(
-                    f"DDO saved: did={did}, name={name}, publisher={sender_address}, created={created}, chainId={self._chain_id}"
+                    f"DDO queued: did={did}, name={name}, publisher={sender_address}, created={created}, chainId={self._chain_id}"
                 )
                 return True
             except (KeyError, Exception) as err:
@@ -189,7 +224,7 @@ class MetadataCreatedProcessor(EventProcessor):
 class MetadataUpdatedProcessor(EventProcessor):
     def make_record(self, data, asset):
         # to avoid unnecesary get_block calls, always init with timestamp 0 and get it from chain if the asset is valid
-        _record = init_new_ddo(data, 0)
+        _record, errors = self.init_record(data)
         # make sure that we do not alter created flag
         _record["created"] = asset["created"]
 
@@ -201,28 +236,25 @@ class MetadataUpdatedProcessor(EventProcessor):
             "update": True,
         }
 
-        if not is_valid_dict_remote(get_metadata_from_services(_record["service"])):
-            errors = list_errors(
-                list_errors_dict_remote, get_metadata_from_services(_record["service"])
-            )
+        if errors:
             logger.error(f"ddo update has validation errors: {errors}")
             return False
-        # check purgatory only if asset is valid
-        if self.purgatory and self.purgatory.is_account_banned(self.sender_address):
-            _record["isInPurgatory"] = "true"
+        # check purgatory only if asset is valid. The status is not copied from
+        # `asset`, the purgatory may have changed it since it was read.
+        if self.purgatory:
+            _record["isInPurgatory"] = self.is_in_purgatory()
         else:
             _record["isInPurgatory"] = asset.get("isInPurgatory", "false")
 
         # add info related to blockchain
-        blockInfo = self._web3.eth.get_block(self.event.blockNumber)
         _record["updated"] = format_timestamp(
-            datetime.fromtimestamp(blockInfo["timestamp"]).strftime(DATETIME_FORMAT)
+            datetime.fromtimestamp(self.get_block_timestamp()).strftime(DATETIME_FORMAT)
         )
         _record["chainId"] = self._chain_id
         dt_address = _record.get("dataToken")
         assert dt_address == add_0x_prefix(self.did[len("did:op:") :])
         if dt_address:
-            _record["dataTokenInfo"] = get_datatoken_info(self._web3, dt_address)
+            _record["dataTokenInfo"] = self.get_datatoken_info(dt_address)
 
         return _record
 
@@ -249,6 +281,10 @@ class MetadataUpdatedProcessor(EventProcessor):
                 self.allowed_publishers,
                 self.purgatory,
                 self._chain_id,
+                block_timestamps=self.block_timestamps,
+                datatoken_cache=self.datatoken_cache,
+                decoded=self.decoded,
+                decryptor=self.decryptor,
             )
             event_processor.process()
             return False
@@ -260,9 +296,11 @@ class MetadataUpdatedProcessor(EventProcessor):
         _record = self.make_record(decoded, asset)
         if _record:
             try:
-                self._es_instance.update(json.dumps(_record), did)
+                self._es_instance.update(
+                    json_util.dumps(_record), did, version=self.version
+                )
                 updated = _record["updated"]
-                logger.info(f"updated DDO did={did}, updated: {updated}")
+                logger.info(f"DDO update queued: did={did}, updated: {updated}")
                 return True
             except (KeyError, Exception) as err:
                 logger.error(
@@ -295,7 +333,7 @@ class MetadataUpdatedProcessor(EventProcessor):
             logger.warning("Transaction sender must mach ddo owner")
             return False
 
-        data = self.decryptor.decode_ddo(self.rawddo, self.flags)
+        data = self.decode_ddo()
         if data is None:
             logger.warning("Cound not decode ddo")
             return False
@@ -3,77 +3,225 @@
 # SPDX-License-Identifier: Apache-2.0
 #
 import elasticsearch
+import hashlib
 import os
-import json
 import logging
 import requests
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from threading import Thread
+
+from elasticsearch.helpers import streaming_bulk
+
+from aquarius.app import json_util
+from aquarius.app.util import get_int_env_value
 
 logger = logging.getLogger(__name__)
 
 
+def get_index(entries, normalize=False):
+    """:param entries: set of (id, reason) tuples, as returned by
+        `retrieve_new_list`
+    :param normalize: lowercase the ids, e.g. account addresses
+    :return: dict of reasons by id. Reasons are interned, most entries share
+        a handful of them.
+    """
+    return {
+        (_id.lower() if normalize else _id): sys.intern(str(reason or ""))
+        for _id, reason in entries
+    }
+
+
+def get_purgatory(es_instance):
+    """:return: `Purgatory` if `ASSET_PURGATORY_URL` or `ACCOUNT_PURGATORY_URL`
+    is set, None otherwise"""
+    if not (os.getenv("ASSET_PURGATORY_URL") or os.getenv("ACCOUNT_PURGATORY_URL")):
+        return None
+
+    return Purgatory(es_instance)
+
+
 class Purgatory:
+    """Purgatory lists of assets and accounts, indexed by DID and by
+    lowercased address, so that lookups do not depend on the size of the lists.
+
+    The lists are refreshed by `update_lists`, in the thread started by
+    `start` so that event processing does not wait for it. Event processing
+    reads the last applied lists.
+    """
+
     def __init__(self, es_instance):
         self.update_time = None
         self._es_instance = es_instance
-        self.reference_asset_list = set()
-        self.reference_account_list = set()
+        # reasons by DID, and by lowercased account address. Both are replaced,
+        # never modified, so readers always see a complete snapshot.
+        self._assets = {}
+        self._accounts = {}
+        self.timeout = get_int_env_value("PURGATORY_TIMEOUT", 30)
+        self._session = requests.Session()
+        # ETag, Last-Modified and content hash of the applied lists by env var
+        self._list_states = {}
+        self._new_list_states = {}
+        self._refresher = None
+
+    @property
+    def reference_asset_list(self):
+        """:return: set of (did, reason) tuples"""
+        return set(self._assets.items())
+
+    @reference_asset_list.setter
+    def reference_asset_list(self, entries):
+        self._assets = get_index(entries)
+
+    @property
+    def reference_account_list(self):
+        """:return: set of (lowercased address, reason) tuples"""
+        return set(self._accounts.items())
+
+    @reference_account_list.setter
+    def reference_account_list(self, entries):
+        self._accounts = get_index(entries, normalize=True)
 
     def retrieve_new_list(self, env_var):
-        """
+        """Download a purgatory list, unless it did not change since the last
+        update: the request is conditional on the `ETag` and `Last-Modified`
+        of the previous response, and a response with the same content hash
+        is skipped too.
+
         :param env_var: Url of the file containing purgatory list.
-        :return: Object as follows: {...('<did>', '<reason>'),...}
+        :return: Object as follows: {...('<did>', '<reason>'),...}, None if the
+            list did not change or could not be retrieved
         """
-        response = requests.get(os.getenv(env_var))
+        url = os.getenv(env_var)
+        if not url:
+            return None
 
-        if response.status_code == requests.codes.ok:
+        state = self._list_states.get(env_var, {})
+        headers = {}
+        if state.get("etag"):
+            headers["If-None-Match"] = state["etag"]
+        if state.get("last_modified"):
+            headers["If-Modified-Since"] = state["last_modified"]
+
+        try:
+            response = self._session.get(url, headers=headers, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            logger.warning(
+                f"PURGATORY: Failed to retrieve purgatory list from {env_var} env var: {e}"
+            )
+            return None
+
+        if response.status_code == requests.codes.not_modified:
+            logger.debug(f"PURGATORY: purgatory list from {env_var} is not modified.")
+            return None
+
+        if response.status_code != requests.codes.ok:
             logger.info(
-                f"PURGATORY: Successfully retrieved new purgatory list from {env_var} env var."
+                f"PURGATORY: Failed to retrieve purgatory list from {env_var} env var."
             )
-            return {
-                (a["did"], a["reason"]) for a in response.json() if a and "did" in a
-            }
+            return None
+
+        digest = hashlib.sha256(response.content).hexdigest()
+        # saved once the list is applied, see `update_lists`
+        self._new_list_states[env_var] = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "digest": digest,
+        }
+        if digest == state.get("digest"):
+            logger.debug(f"PURGATORY: purgatory list from {env_var} is unchanged.")
+            return None
 
         logger.info(
-            f"PURGATORY: Failed to retrieve purgatory list from {env_var} env var."
+            f"PURGATORY: Successfully retrieved new purgatory list from {env_var} env var."
         )
-        return set()
+        return {
+            (a["did"], a["reason"])
+            for a in json_util.loads(response.content)
+            if a and "did" in a
+        }
 
-    def update_asset_purgatory_status(self, asset, purgatory="true"):
-        """
-        Updates the field `isInPurgatory` of `asset` object.
+    def update_purgatory_status(self, updates):
+        """Set the field `isInPurgatory` of assets with `_bulk` partial
+        updates, then refresh the index once.
+
+        :param updates: iterable of (did, "true" or "false") tuples, applied in
+            order
+        :return: (number of updated assets, set of the DIDs that were not found)
         """
-        did = asset["id"]
-        asset["isInPurgatory"] = purgatory
-        logger.info(f"PURGATORY: updating asset {did} with value {purgatory}.")
+        total = 0
+
+        def get_actions():
+            nonlocal total
+            for did, purgatory in updates:
+                total += 1
+                yield {
+                    "_op_type": "update",
+                    "_index": self._es_instance.db_index,
+                    "_id": did,
+                    "doc": {"isInPurgatory": purgatory},
+                }
+
+        not_found = set()
+        missing = failed = 0
+        for ok, item in streaming_bulk(
+            self._es_instance.es,
+            get_actions(),
+            max_retries=2,
+            raise_on_error=False,
+            raise_on_exception=False,
+            yield_ok=False,
+        ):
+            _, result = item.popitem()
+            if result.get("status") == 404:
+                not_found.add(result["_id"])
+                missing += 1
+            else:
+                logger.warning(
+                    f"updating ddo {result['_id']} purgatory attribute failed: "
+                    f"status={result.get('status')}, error={result.get('error')}"
+                )
+                failed += 1
+
+        if not total:
+            return 0, not_found
+
         try:
-            self._es_instance.update(json.dumps(asset), did)
-        except Exception as e:
-            logger.warning(f"updating ddo {did} purgatory attribute failed: {e}")
+            self._es_instance.refresh()
+        except elasticsearch.exceptions.TransportError as e:
+            logger.error(f"Refreshing {self._es_instance.db_index} failed: {e}")
+
+        return total - missing - failed, not_found
+
+    def get_status_updates(self, accounts, forgiven_accounts, dids, forgiven_dids):
+        """:return: generator of the (did, "true" or "false") status updates of
+        the assets of the banned and forgiven accounts, then of the DIDs"""
+        for acc_ids, purgatory in ((accounts, "true"), (forgiven_accounts, "false")):
+            for acc_id in acc_ids:
+                for asset in self.get_assets_authored_by(acc_id, source=["id"]):
+                    yield asset["id"], purgatory
+
+        for did in dids:
+            yield did, "true"
 
-    def get_assets_authored_by(self, account_address):
+        for did in forgiven_dids:
+            yield did, "false"
+
+    def get_assets_authored_by(self, account_address, source=None):
         """
-        :return: List of assets authored by `account_address`
+        :param source: `_source` filtering, e.g. list of the fields to read
+        :return: generator of the assets authored by `account_address`
         """
         logger.info(f"PURGATORY: getting assets authored by {account_address}.")
-        body = {
-            "query": {
-                "query_string": {
-                    "query": account_address,
-                    "default_field": "event.from",
-                }
+        query = {
+            "query_string": {
+                "query": account_address,
+                "default_field": "event.from",
             }
         }
-        page = self._es_instance.es.search(index=self._es_instance.db_index, body=body)
-        total = page["hits"]["total"]
-        body["size"] = total
-        page = self._es_instance.es.search(index=self._es_instance.db_index, body=body)
-
-        object_list = []
-        for x in page["hits"]["hits"]:
-            object_list.append(x["_source"])
-
-        return object_list
+        return self._es_instance.scan(query, source=source)
 
     def update_lists(self):
         """
@@ -89,58 +237,117 @@ class Purgatory:
         )
         self.update_time = now
 
-        new_asset_list = self.retrieve_new_list("ASSET_PURGATORY_URL")
-        new_ids_for_purgatory = new_asset_list.difference(self.reference_asset_list)
-        new_ids_forgiven = self.reference_asset_list.difference(new_asset_list)
+        self._new_list_states = {}
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            asset_list, account_list = executor.map(
+                self.retrieve_new_list, ["ASSET_PURGATORY_URL", "ACCOUNT_PURGATORY_URL"]
+            )
+
+        if asset_list is None and account_list is None:
+            self._list_states.update(self._new_list_states)
+            logger.info("PURGATORY: purgatory lists are unchanged.")
+            return
 
-        new_account_list = self.retrieve_new_list("ACCOUNT_PURGATORY_URL")
-        new_accounts_for_purgatory = new_account_list.difference(
-            self.reference_account_list
+        new_assets = self._assets if asset_list is None else get_index(asset_list)
+        new_ids_for_purgatory, new_ids_forgiven = self.get_diff(
+            self._assets, new_assets
         )
-        new_accounts_forgiven = self.reference_account_list.difference(new_account_list)
 
-        for acc_id, reason in new_accounts_for_purgatory:
-            assets = self.get_assets_authored_by(acc_id)
-            for asset in assets:
-                self.update_asset_purgatory_status(asset)
-            self.reference_account_list.add((acc_id, reason))
+        new_accounts = (
+            self._accounts
+            if account_list is None
+            else get_index(account_list, normalize=True)
+        )
+        new_accounts_for_purgatory, new_accounts_forgiven = self.get_diff(
+            self._accounts, new_accounts
+        )
+        # new events see the new lists before the stored assets are updated,
+        # so that their writes can not overwrite the status updates
+        accounts, self._accounts = self._accounts, new_accounts
+        assets, self._assets = self._assets, new_assets
 
-        for acc_id, reason in new_accounts_forgiven:
-            assets = self.get_assets_authored_by(acc_id)
-            for asset in assets:
-                self.update_asset_purgatory_status(asset, "false")
-            self.reference_account_list.remove((acc_id, reason))
+        start_time = time.time()
+        try:
+            updated, not_found = self.update_purgatory_status(
+                self.get_status_updates(
+                    new_accounts_for_purgatory,
+                    new_accounts_forgiven,
+                    new_ids_for_purgatory,
+                    new_ids_forgiven,
+                )
+            )
+        except Exception:
+            # applied again on the next update
+            self._accounts, self._assets = accounts, assets
+            raise
 
-        for did, reason in new_ids_for_purgatory:
-            try:
-                asset = self._es_instance.read(did)
-                self.update_asset_purgatory_status(asset)
-                self.reference_asset_list.add((did, reason))
-            except elasticsearch.exceptions.NotFoundError:
-                continue
+        # DIDs that are not indexed yet are flagged on a later update
+        if not_found:
+            new_assets = dict(new_assets)
+            for did in new_ids_for_purgatory:
+                if did in not_found:
+                    del new_assets[did]
 
-        for did, reason in new_ids_forgiven:
-            try:
-                asset = self._es_instance.read(did)
-                self.update_asset_purgatory_status(asset, "false")
-                self.reference_asset_list.remove((did, reason))
-            except elasticsearch.exceptions.NotFoundError:
-                continue
+            for did in new_ids_forgiven:
+                if did in not_found:
+                    new_assets[did] = assets[did]
+            self._assets = new_assets
+            # downloaded again on the next update, until they are all flagged
+            self._new_list_states.pop("ASSET_PURGATORY_URL", None)
+        self._list_states.update(self._new_list_states)
 
         logger.info(
-            f"PURGATORY: reference asset list contains {len(self.reference_asset_list)} elements."
+            f"PURGATORY: updated {updated} assets in {time.time() - start_time:.2f}s, "
+            f"{len(not_found)} not found."
+        )
+        logger.info(
+            f"PURGATORY: reference asset list contains {len(self._assets)} elements."
         )
 
         logger.info(
-            f"PURGATORY: reference account list contains {len(self.reference_account_list)} elements."
+            f"PURGATORY: reference account list contains {len(self._accounts)} elements."
         )
 
+    @staticmethod
+    def get_diff(index, new_index):
+        """:return: (list of the ids added by `new_index`, list of the ids it
+        removes). Ids whose reason changed are in neither."""
+        added = [_id for _id in new_index if _id not in index]
+        removed = [_id for _id in index if _id not in new_index]
+
+        return added, removed
+
+    def start(self, sleep_time=60):
+        """Update the lists every `sleep_time` seconds (within the limit of
+        `PURGATORY_UPDATE_INTERVAL`) in a daemon thread."""
+        if self._refresher:
+            return
+
+        logger.info("PURGATORY: starting the purgatory refresher.")
+        self._refresher = Thread(target=self.run, args=(sleep_time,), daemon=True)
+        self._refresher.start()
+
+    def stop(self):
+        self._refresher = None
+
+    def run(self, sleep_time):
+        thread = self._refresher
+        while self._refresher is thread:
+            try:
+                self.update_lists()
+            except (KeyError, Exception) as e:
+                logger.error(f"Error updating purgatory list: {str(e)}.")
+
+            time.sleep(sleep_time)
+
     def is_account_banned(self, ref_account_id):
         """
         :return: True if `ref_account_id` is in the Purgatory list.
         """
-        for acc_id, reason in self.reference_account_list:
-            if acc_id.lower() == ref_account_id.lower():
-                return True
+        return ref_account_id.lower() in self._accounts
 
-        return False
+    def is_asset_banned(self, did):
+        """
+        :return: True if `did` is in the Purgatory list.
+        """
+        return did in self._assets
@@ -0,0 +1,117 @@
+#
+# Copyright 2021 Ocean Protocol Foundation
+# SPDX-License-Identifier: Apache-2.0
+#
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import lru
+import requests
+from requests.adapters import HTTPAdapter
+
+from aquarius.app.util import get_int_env_value
+from aquarius.events.constants import EVENT_METADATA_CREATED
+
+logger = logging.getLogger(__name__)
+
+_RBAC_CLIENTS = {}
+
+
+def get_rbac_client():
+    """:return: `RBACClient` of `RBAC_SERVER_URL`, shared by the monitors and
+    their processors. None if `RBAC_SERVER_URL` is not set."""
+    url = os.getenv("RBAC_SERVER_URL")
+    if not url:
+        return None
+
+    if url not in _RBAC_CLIENTS:
+        ttl = get_int_env_value("RBAC_CACHE_TTL", 60)
+        _RBAC_CLIENTS[url] = RBACClient(
+            url,
+            ttl=ttl,
+            negative_ttl=get_int_env_value("RBAC_NEGATIVE_CACHE_TTL", ttl),
+            timeout=get_int_env_value("RBAC_TIMEOUT", 5),
+            workers=max(1, get_int_env_value("RBAC_WORKERS", 8)),
+        )
+
+    return _RBAC_CLIENTS[url]
+
+
+def get_event_type(event_name):
+    return "publish" if event_name == EVENT_METADATA_CREATED else "update"
+
+
+class RBACClient:
+    """Permission checks against the RBAC server, over a keep-alive session.
+
+    Decisions are cached by (eventType, address), for `ttl` seconds when
+    granted and `negative_ttl` seconds when denied. Failed requests are
+    denied, but not cached. `prefetch` resolves the decisions missing from
+    the cache concurrently, with `workers` requests at a time.
+    """
+
+    def __init__(self, url, ttl=60, negative_ttl=60, timeout=5, workers=8, size=10000):
+        self.url = url
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+        self.workers = workers
+        self._session = requests.Session()
+        self._session.mount(url, HTTPAdapter(pool_connections=1, pool_maxsize=workers))
+        self._decisions = lru.LRU(size)
+
+    def _get_cached(self, key):
+        cached = self._decisions.get(key)
+        if not cached:
+            return None
+
+        expires_at, decision = cached
+        if expires_at < time.time():
+            del self._decisions[key]
+            return None
+
+        return cached
+
+    def request_permission(self, event_type, address):
+        """:return: decision of the RBAC server, cached. False if the request
+        failed."""
+        payload = {
+            "eventType": event_type,
+            "component": "metadatacache",
+            "credentials": {"type": "address", "value": address},
+        }
+        try:
+            response = self._session.post(self.url, json=payload, timeout=self.timeout)
+            decision = response.json()
+        except Exception as e:
+            logger.warning(f"RBAC request for {event_type} by {address} failed: {e}")
+            return False
+
+        ttl = self.ttl if decision else self.negative_ttl
+        if ttl > 0:
+            self._decisions[(event_type, address)] = (time.time() + ttl, decision)
+        return decision
+
+    def check_permission(self, event_type, address):
+        """:return: decision of the RBAC server, from the cache if possible"""
+        cached = self._get_cached((event_type, address))
+        if cached:
+            return cached[1]
+
+        return self.request_permission(event_type, address)
+
+    def prefetch(self, permissions):
+        """Resolve the (event_type, address) `permissions` missing from the
+        cache concurrently."""
+        missing = [
+            permission
+            for permission in sorted(set(permissions))
+            if not self._get_cached(permission)
+        ]
+        if not missing:
+            return
+
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(missing))) as pool:
+            list(pool.map(lambda args: self.request_permission(*args), missing))
@@ -0,0 +1,230 @@
+#
+# Copyright 2021 Ocean Protocol Foundation
+# SPDX-License-Identifier: Apache-2.0
+#
+import json
+import logging
+
+import elasticsearch
+from eth_utils import remove_0x_prefix
+from hexbytes import HexBytes
+
+logger = logging.getLogger(__name__)
+
+
+class ReorgJournal:
+    """Provisional indexing of the blocks that are not confirmed yet.
+
+    The durable checkpoint only moves up to `confirmations` blocks below the
+    head. The blocks above it are processed one by one, and journaled with
+    their hash and the DIDs they touched, along with the DDOs stored before
+    the block (None if there was none). The journal is saved in the
+    `<index>_plus` index, so it survives restarts.
+
+    A reorg is detected when the hash of the latest journaled block, or the
+    parent hash of the next block, does not match the chain anymore. The
+    DIDs touched since the fork are then restored, and the blocks of the new
+    chain are applied again. Journaled blocks are dropped once confirmed.
+
+    The restored DDOs have the external version of the reorged events, so the
+    DIDs rolled back are written without version until the reorged blocks are
+    confirmed, see `unversioned_dids`. They are saved with the journal.
+    """
+
+    def __init__(self, monitor, confirmations):
+        self._monitor = monitor
+        self.confirmations = confirmations
+        self._doc_id = f"events_journal_{monitor._chain_id}"
+        self.entries = []
+        self.unversioned_dids = set()
+        self._unversioned_until = None
+        self.load()
+
+    @property
+    def _es(self):
+        return self._monitor._es_instance.es
+
+    @property
+    def last_block(self):
+        return self.entries[-1]["block"] if self.entries else None
+
+    def load(self):
+        try:
+            journal = json.loads(
+                self._es.get(
+                    index=self._monitor._other_db_index,
+                    id=self._doc_id,
+                    doc_type="_doc",
+                )["_source"]["journal"]
+            )
+        except elasticsearch.exceptions.NotFoundError:
+            journal = {}
+        except Exception as e:
+            logger.error(f"Cannot load the reorg journal: {e}")
+            journal = {}
+
+        self.entries = journal.get("entries", [])
+        self.unversioned_dids = set(journal.get("unversioned_dids", []))
+        self._unversioned_until = journal.get("unversioned_until")
+
+    def save(self):
+        # a single string field, DDOs must not add fields to the index mapping
+        self._es.index(
+            index=self._monitor._other_db_index,
+            id=self._doc_id,
+            body={
+                "journal": json.dumps(
+                    {
+                        "entries": self.entries,
+                        "unversioned_dids": sorted(self.unversioned_dids),
+                        "unversioned_until": self._unversioned_until,
+                    }
+                )
+            },
+            doc_type="_doc",
+        )
+
+    def get_block_hash(self, block_number):
+        return HexBytes(self._monitor._web3.eth.get_block(block_number)["hash"]).hex()
+
+    def find_fork_block(self):
+        """:return: first journaled block that is not on the chain anymore,
+        None if there was no reorg"""
+        if not self.entries:
+            return None
+
+        if self.get_block_hash(self.last_block) == self.entries[-1]["hash"]:
+            return None
+
+        for entry in reversed(self.entries[:-1]):
+            if self.get_block_hash(entry["block"]) == entry["hash"]:
+                return entry["block"] + 1
+
+        logger.error(
+            f"Reorg deeper than the {len(self.entries)} journaled blocks, "
+            f"blocks before {self.entries[0]['block']} may be wrong. "
+            f"Consider increasing EVENTS_CONFIRMATIONS."
+        )
+        return self.entries[0]["block"]
+
+    def rollback(self, fork_block):
+        """Restore the DIDs touched since `fork_block`, and drop their blocks."""
+        rolled_back = [entry for entry in self.entries if entry["block"] >= fork_block]
+        self.entries = [entry for entry in self.entries if entry["block"] < fork_block]
+
+        pre_images = {}
+        for entry in rolled_back:
+            for did, pre_image in entry["dids"].items():
+                pre_images.setdefault(did, pre_image)
+
+        es_instance = self._monitor._es_instance
+        for did, pre_image in pre_images.items():
+            try:
+                if pre_image is None:
+                    self._es.delete(
+                        index=es_instance.db_index, id=did, doc_type="_doc", ignore=404
+                    )
+                else:
+                    self._es.index(
+                        index=es_instance.db_index,
+                        id=did,
+                        body=pre_image,
+                        doc_type="_doc",
+                    )
+            except elasticsearch.exceptions.TransportError as e:
+                logger.error(f"Cannot roll back {did}: {e}")
+
+        es_instance.refresh()
+        if rolled_back:
+            self.unversioned_dids.update(pre_images)
+            self._unversioned_until = max(
+                self._unversioned_until or 0, rolled_back[-1]["block"]
+            )
+        self.save()
+        logger.warning(
+            f"Reorg from block {fork_block}: rolled back {len(rolled_back)} blocks "
+            f"and {len(pre_images)} DIDs."
+        )
+
+    def confirm_blocks(self, current_block):
+        """Roll back reorged blocks, then drop the confirmed ones and move the
+        checkpoint to them.
+
+        :return: highest confirmed block, `confirmations` blocks below the head
+        """
+        fork_block = self.find_fork_block()
+        if fork_block is not None:
+            self.rollback(fork_block)
+
+        safe_block = current_block - self.confirmations
+        unversioned_confirmed = (
+            self.unversioned_dids and safe_block >= self._unversioned_until
+        )
+        if unversioned_confirmed:
+            self.unversioned_dids.clear()
+            self._unversioned_until = None
+
+        confirmed = [entry for entry in self.entries if entry["block"] <= safe_block]
+        self.entries = self.entries[len(confirmed) :]
+        if confirmed or unversioned_confirmed:
+            self.save()
+        if confirmed:
+            self._monitor.store_last_processed_block(confirmed[-1]["block"])
+
+        return safe_block
+
+    def get_pre_images(self, dids):
+        """:return: dict of the stored DDOs, as json strings, by DID"""
+        if not dids:
+            return {}
+
+        docs = self._es.mget(
+            index=self._monitor._es_instance.db_index,
+            body={"ids": dids},
+            realtime=True,
+        )["docs"]
+        return {
+            doc["_id"]: json.dumps(doc["_source"]) if doc.get("found") else None
+            for doc in docs
+        }
+
+    def process_provisional_blocks(self, safe_block, current_block):
+        """Process and journal the unconfirmed blocks, up to `current_block`."""
+        monitor = self._monitor
+        from_block = max(safe_block, self.last_block or safe_block) + 1
+        for block_number in range(from_block, current_block + 1):
+            block = monitor._web3.eth.get_block(block_number)
+            if (
+                self.entries
+                and self.entries[-1]["hash"] != HexBytes(block["parentHash"]).hex()
+            ):
+                # reorged since the journal was checked, roll back next time
+                logger.warning(
+                    f"Block {block_number} is not a child of the journaled block "
+                    f"{self.last_block}."
+                )
+                return
+
+            logs = monitor._web3.eth.get_logs(
+                {
+                    "address": monitor._contract_address,
+                    "blockHash": block["hash"],
+                    "topics": [list(monitor._event_topics)],
+                }
+            )
+            events = monitor.decode_event_logs(logs)
+            monitor.prefetch_event_data(events)
+            dids = {
+                f"did:op:{remove_0x_prefix(event.args.dataToken)}" for event in events
+            }
+            pre_images = self.get_pre_images(sorted(dids))
+            monitor.process_events(events)
+
+            self.entries.append(
+                {
+                    "block": block_number,
+                    "hash": HexBytes(block["hash"]).hex(),
+                    "dids": pre_images,
+                }
+            )
+            self.save()
@@ -6,6 +6,7 @@ import json
 import os
 import time
 import logging
+from functools import lru_cache
 from pathlib import Path
 import pkg_resources
 
@@ -117,9 +118,9 @@ def get_address_file():
     )
 
 
-def get_metadata_contract(web3):
+def get_metadata_contract(web3, address=None):
     """Returns a Contract built from the Metadata contract address (or ENV) and ABI"""
-    address = os.getenv("METADATA_CONTRACT_ADDRESS", None)
+    address = address or os.getenv("METADATA_CONTRACT_ADDRESS", None)
     if not address:
         address_file = get_address_file()
         with open(address_file) as f:
@@ -145,6 +146,16 @@ def get_metadata_start_block():
     return block_number
 
 
+def get_event_version(block_number, log_index):
+    """External ES version of the DDO written by an event, increasing with
+    the position of the event in the chain. It leaves room for 999 internal
+    updates (e.g. purgatory) between two events.
+
+    :return: (block_number * 100000 + log_index) * 1000
+    """
+    return (block_number * 100000 + log_index) * 1000
+
+
 def get_datatoken_info(web3, token_address):
     """
     :param token_address: Datatoken address
@@ -163,25 +174,37 @@ def get_datatoken_info(web3, token_address):
         ```
     """
     token_address = Web3.toChecksumAddress(token_address)
-    dt_abi_path = Path(
-        pkg_resources.resource_filename("aquarius", "events/datatoken_abi.json")
-    ).resolve()
-    with open(dt_abi_path) as f:
-        datatoken_abi = json.load(f)
+    dt = web3.eth.contract(address=token_address, abi=get_datatoken_abi())
+
+    return make_datatoken_info(
+        token_address,
+        dt.functions.name().call(),
+        dt.functions.symbol().call(),
+        dt.functions.decimals().call(),
+        dt.functions.cap().call(),
+    )
 
-    dt = web3.eth.contract(address=token_address, abi=datatoken_abi)
-    decimals = dt.functions.decimals().call()
-    cap_orig = dt.functions.cap().call()
 
+def make_datatoken_info(token_address, name, symbol, decimals, cap_orig):
     return {
         "address": token_address,
-        "name": dt.functions.name().call(),
-        "symbol": dt.functions.symbol().call(),
+        "name": name,
+        "symbol": symbol,
         "decimals": decimals,
         "cap": float(cap_orig / (10 ** decimals)),
     }
 
 
+@lru_cache(maxsize=1)
+def get_datatoken_abi():
+    """Returns the datatoken ABI, read from disk only once"""
+    dt_abi_path = Path(
+        pkg_resources.resource_filename("aquarius", "events/datatoken_abi.json")
+    ).resolve()
+    with open(dt_abi_path) as f:
+        return json.load(f)
+
+
 def setup_web3(config_file, _logger=None):
     """
     :param config_file: Web3 object instance
@@ -0,0 +1,61 @@
+#
+# Copyright 2021 Ocean Protocol Foundation
+# SPDX-License-Identifier: Apache-2.0
+#
+"""Microbenchmark of `Decryptor.decode_ddo` over the sample payloads of
+`tests/ddos`, with a decryptor per DDO (as before) and a shared one.
+
+Run from the repository root:
+
+    EVENTS_ECIES_PRIVATE_KEY=<key of the samples> python benchmarks/decryptor.py
+"""
+import json
+import os
+import sys
+import timeit
+
+from eth_account import Account
+
+sys.path.insert(0, os.getcwd())
+
+from aquarius.events.decryptor import Decryptor  # noqa: E402
+from tests.ddos.ddo_sample1 import json_dict  # noqa: E402
+from tests.ddos.rawddos import (  # noqa: E402
+    ecies_encrypted_sample,
+    lzma_compressed_sample,
+)
+
+NUMBER = 200
+
+
+def main():
+    ecies_private_key = os.getenv("EVENTS_ECIES_PRIVATE_KEY")
+    ecies_account = Account.from_key(ecies_private_key) if ecies_private_key else None
+    payloads = {
+        "plain": (json.dumps(json_dict).encode("utf-8"), b"\x00"),
+        "lzma": (lzma_compressed_sample, b"\x01"),
+        "lzma memoryview": (memoryview(lzma_compressed_sample), b"\x01"),
+    }
+    if ecies_account:
+        payloads["ecies+lzma"] = (ecies_encrypted_sample, b"\x03")
+    else:
+        print("EVENTS_ECIES_PRIVATE_KEY is not set, skipping the encrypted sample.")
+
+    decryptor = Decryptor(ecies_account)
+    for name, (rawddo, flags) in payloads.items():
+        assert decryptor.decode_ddo(rawddo, flags) is not None, name
+
+        per_ddo = timeit.timeit(
+            lambda: Decryptor(ecies_account).decode_ddo(rawddo, flags), number=NUMBER
+        )
+        shared = timeit.timeit(
+            lambda: decryptor.decode_ddo(rawddo, flags), number=NUMBER
+        )
+        print(
+            f"{name:>16}: {1e6 * per_ddo / NUMBER:8.1f} us/ddo with a decryptor "
+            f"per ddo, {1e6 * shared / NUMBER:8.1f} us/ddo shared"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#
+# Copyright 2021 Ocean Protocol Foundation
+# SPDX-License-Identifier: Apache-2.0
+#
+"""Microbenchmark of the `json_util` backends, on DDOs of increasing size
+built from `tests/ddos/ddo_sample1.py` (more files and additional
+information, as on larger assets).
+
+Run from the repository root, with orjson installed:
+
+    python benchmarks/json_backend.py
+"""
+import copy
+import os
+import sys
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.getcwd())
+
+from aquarius.app import json_util  # noqa: E402
+from aquarius.app.util import datetime_converter  # noqa: E402
+from tests.ddos.ddo_sample1 import json_dict  # noqa: E402
+
+
+def get_ddo(files):
+    ddo = copy.deepcopy(json_dict)
+    attributes = ddo["service"][1]["attributes"]
+    attributes["main"]["files"] = [
+        dict(attributes["main"]["files"][0], index=i) for i in range(files)
+    ]
+    attributes.setdefault("additionalInformation", {})["tags"] = [
+        f"tag{i}" for i in range(files)
+    ]
+    ddo["updated"] = datetime.utcnow()
+    return ddo
+
+
+def main():
+    if not json_util.orjson:
+        print("orjson is not installed, only the json backend is measured.")
+
+    backends = ["json"] + (["orjson"] if json_util.orjson else [])
+    for files in (1, 50, 500):
+        ddo = get_ddo(files)
+        size = len(json_util.dumps(ddo, default=datetime_converter))
+        number = max(10, 20000 // files)
+        results = []
+        for backend in backends:
+            json_util.BACKEND = backend
+            data = json_util.dumps(ddo, default=datetime_converter)
+            dumps = timeit.timeit(
+                lambda: json_util.dumps(ddo, default=datetime_converter), number=number
+            )
+            loads = timeit.timeit(lambda: json_util.loads(data), number=number)
+            results.append(
+                f"{backend} dumps {1e6 * dumps / number:8.1f} us, "
+                f"loads {1e6 * loads / number:8.1f} us"
+            )
+        print(f"{size:>8} bytes: " + " | ".join(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#
+# Copyright 2021 Ocean Protocol Foundation
+# SPDX-License-Identifier: Apache-2.0
+#
+"""Purgatory index build, diff and lookup times, and memory, for lists of
+1k to 1M accounts, against the linear scan of the former set of tuples
+(measured up to 100k entries).
+
+Run from the repository root:
+
+    python benchmarks/purgatory.py
+"""
+import os
+import sys
+import time
+import timeit
+import tracemalloc
+from unittest.mock import Mock
+
+sys.path.insert(0, os.getcwd())
+
+from aquarius.events.purgatory import Purgatory, get_index  # noqa: E402
+
+REASONS = ["spam", "scam", "copyright", "malware"]
+LOOKUPS = 1000
+
+
+def get_entries(size, offset=0):
+    return {(f"0x{i + offset:040X}", REASONS[i % len(REASONS)]) for i in range(size)}
+
+
+def is_account_banned_linear(entries, ref_account_id):
+    for acc_id, reason in entries:
+        if acc_id.lower() == ref_account_id.lower():
+            return True
+
+    return False
+
+
+def main():
+    for size in (1000, 10000, 100000, 1000000):
+        entries = get_entries(size)
+        # 1% of the list replaced by new entries
+        new_entries = get_entries(size, offset=size // 100)
+        addresses = [f"0x{i:040x}" for i in range(size - LOOKUPS // 2, size)] + [
+            f"0x{i:040x}" for i in range(2 * size, 2 * size + LOOKUPS // 2)
+        ]
+
+        tracemalloc.start()
+        start_time = time.time()
+        purgatory = Purgatory(Mock())
+        purgatory.reference_account_list = entries
+        build = time.time() - start_time
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        start_time = time.time()
+        added, removed = purgatory.get_diff(
+            dict(purgatory._accounts), get_index(new_entries, normalize=True)
+        )
+        diff = time.time() - start_time
+
+        lookup = timeit.timeit(
+            lambda: [purgatory.is_account_banned(a) for a in addresses], number=1
+        )
+        result = (
+            f"{size:>8} accounts: build {build:6.2f}s, "
+            f"{memory / size:5.0f} bytes/entry, diff {diff:6.3f}s "
+            f"(+{len(added)}/-{len(removed)}), lookup {1e6 * lookup / LOOKUPS:6.2f} us"
+        )
+        if size <= 100000:
+            number = max(1, 10000000 // (size * LOOKUPS))
+            linear = timeit.timeit(
+                lambda: [
+                    is_account_banned_linear(entries, a)
+                    for a in addresses[: LOOKUPS // 10]
+                ],
+                number=number,
+            )
+            result += f", linear scan {1e6 * linear * 10 / number / LOOKUPS:10.2f} us"
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#
+# Copyright 2021 Ocean Protocol Foundation
+# SPDX-License-Identifier: Apache-2.0
+#
+"""Ingestion throughput of the `ES_REFRESH_POLICY` modes, with a write per
+DDO and with a `BulkWriter` per chunk, into a scratch index.
+
+Run from the repository root, against a running Elasticsearch (configured
+with the usual `DB_*` env vars):
+
+    python benchmarks/refresh_policy.py [number of DDOs]
+"""
+import copy
+import os
+import sys
+import time
+
+sys.path.insert(0, os.getcwd())
+
+from aquarius.app import json_util  # noqa: E402
+from aquarius.app.es_instance import (  # noqa: E402
+    REFRESH_POLICIES,
+    ElasticsearchInstance,
+)
+from aquarius.events.bulk_writer import BulkWriter  # noqa: E402
+from tests.ddos.ddo_sample1 import json_dict  # noqa: E402
+
+CHUNK_SIZE = 100
+
+
+def get_ddos(number, prefix):
+    ddos = []
+    for i in range(number):
+        ddo = copy.deepcopy(json_dict)
+        ddo["id"] = f"did:op:{prefix}{i}"
+        ddos.append((ddo["id"], json_util.dumps(ddo)))
+    return ddos
+
+
+def run(es_instance, ddos, bulk):
+    start_time = time.time()
+    if bulk:
+        for i in range(0, len(ddos), CHUNK_SIZE):
+            writer = BulkWriter(es_instance)
+            for did, ddo in ddos[i : i + CHUNK_SIZE]:
+                writer.write(ddo, did)
+            writer.flush()
+    else:
+        for i in range(0, len(ddos), CHUNK_SIZE):
+            for did, ddo in ddos[i : i + CHUNK_SIZE]:
+                es_instance.write(ddo, did)
+            es_instance.refresh()
+
+    return len(ddos) / (time.time() - start_time)
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    os.environ["DB_INDEX"] = "aquarius_refresh_benchmark"
+    es_instance = ElasticsearchInstance()
+    try:
+        for policy in REFRESH_POLICIES:
+            es_instance.refresh_policy = policy
+            single = run(es_instance, get_ddos(number, f"{policy}-single-"), False)
+            bulk = run(es_instance, get_ddos(number, f"{policy}-bulk-"), True)
+            print(
+                f"{policy:>9}: {single:8.1f} DDOs/s with a write per DDO, "
+                f"{bulk:8.1f} DDOs/s with bulk writes"
+            )
+    finally:
+        es_instance.es.indices.delete(index=es_instance.db_index, ignore=404)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,11 +4,15 @@
 #
 import logging
 import os
+import signal
+import sys
 import time
 import http.server
 import socketserver
 
+from aquarius.events.async_monitor import AsyncEventsMonitor
 from aquarius.events.events_monitor import EventsMonitor
+from aquarius.events.multi_chain import MultiChainMonitor, get_chains_config
 from aquarius.events.util import setup_web3
 from aquarius.log import setup_logging
 
@@ -26,7 +30,8 @@ class Handler(http.server.SimpleHTTPRequestHandler):
 def run_events_monitor():
     setup_logging()
     logger.info("EventsMonitor: preparing")
-    required_env_vars = ["EVENTS_RPC", "AQUARIUS_CONFIG_FILE"]
+    chains = get_chains_config()
+    required_env_vars = ["AQUARIUS_CONFIG_FILE"] + ([] if chains else ["EVENTS_RPC"])
     for envvar in required_env_vars:
         if not os.getenv(envvar):
             raise AssertionError(
@@ -34,9 +39,18 @@ def run_events_monitor():
                 f"environment variables before starting the events monitor: {required_env_vars}"
             )
 
+    # exit cleanly on SIGTERM, so that the checkpoint is flushed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
     config_file = os.getenv("AQUARIUS_CONFIG_FILE", "config.ini")
-    monitor = EventsMonitor(setup_web3(config_file, logger), config_file)
-    monitor.start_events_monitor()
+    if chains:
+        MultiChainMonitor(chains, config_file).start()
+    elif os.getenv("EVENTS_MONITOR_ENGINE", "threads") == "asyncio":
+        monitor = EventsMonitor(setup_web3(config_file, logger), config_file)
+        AsyncEventsMonitor(monitor).start()
+    else:
+        monitor = EventsMonitor(setup_web3(config_file, logger), config_file)
+        monitor.start_events_monitor()
 
     logger.info("EventsMonitor: started")
     if os.getenv("EVENTS_HTTP", None):
@@ -27,6 +27,8 @@ install_requirements = [
     "requests>=2.21.0",
     "gunicorn==20.1.0",
     "elasticsearch==7.16.3",
+    "aiohttp",
+    "websockets",
     "PyYAML==6.0",
     "pytz==2021.3",
     "ocean-contracts==0.6.9",
@@ -80,6 +82,7 @@ setup(
     extras_require={
         "test": test_requirements,
         "dev": dev_requirements + test_requirements,
+        "orjson": ["orjson"],
     },
     include_package_data=True,
     install_requires=install_requirements,
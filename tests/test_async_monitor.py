@@ -0,0 +1,143 @@
+#
+# Copyright 2021 Ocean Protocol Foundation
+# SPDX-License-Identifier: Apache-2.0
+#
+import asyncio
+import threading
+import time
+from unittest.mock import Mock
+
+import pytest
+
+from aquarius.block_utils import ChunkSizeController
+from aquarius.events.async_monitor import AsyncEventsMonitor, AsyncJsonRpcBatch
+
+
+class FakeRpc:
+    def __init__(self, max_range=None, head=0):
+        self.max_range = max_range
+        self.head = head
+        self.ranges = []
+
+    async def request(self, method, params):
+        if method == "eth_blockNumber":
+            return hex(self.head)
+
+        assert method == "eth_getLogs"
+        from_block = int(params[0]["fromBlock"], 16)
+        to_block = int(params[0]["toBlock"], 16)
+        if self.max_range and to_block - from_block + 1 > self.max_range:
+            raise ValueError("query returned more than 10000 results")
+        self.ranges.append((from_block, to_block))
+        return []
+
+    async def batch(self, calls):
+        return [{"result": method} for method, _ in calls]
+
+
+def get_engine(rpc=None):
+    monitor = Mock()
+    monitor._web3.provider.endpoint_uri = "http://localhost:8545"
+    monitor._event_topics = {"0x01": "MetadataCreated"}
+    monitor.chunk_size_controller = ChunkSizeController(100, min_size=1)
+    monitor.decode_event_logs.side_effect = lambda logs: list(logs)
+    monitor.get_event_dids.side_effect = lambda events: {
+        event.args.dataToken for event in events
+    }
+    monitor.decode_events.side_effect = lambda events: [None] * len(events)
+    monitor.events_processed = 0
+    engine = AsyncEventsMonitor(monitor)
+    engine._rpc = rpc or FakeRpc()
+    return engine
+
+
+def run_in_loop(engine, coroutine):
+    async def run():
+        engine._setup()
+        try:
+            return await coroutine
+        finally:
+            engine._executor.shutdown(wait=True)
+
+    return asyncio.run(run())
+
+
+def test_async_batch_dispatches_responses_in_order():
+    batch = AsyncJsonRpcBatch(FakeRpc())
+    results = []
+    batch.add("a", [], results.append)
+    batch.add("b", [], results.append)
+    assert len(batch) == 2
+
+    asyncio.run(batch.execute())
+
+    assert results == [{"result": "a"}, {"result": "b"}]
+    assert len(batch) == 0
+
+
+def test_fetch_chunk_splits_rejected_ranges():
+    rpc = FakeRpc(max_range=25)
+    engine = get_engine(rpc)
+
+    run_in_loop(engine, engine.fetch_chunk(0, 99))
+
+    assert sorted(rpc.ranges) == [(0, 24), (25, 49), (50, 74), (75, 99)]
+
+
+def test_fetch_chunk_raises_other_errors():
+    rpc = FakeRpc()
+    rpc.request = Mock(side_effect=ValueError("Boom!"))
+    engine = get_engine(rpc)
+
+    with pytest.raises(ValueError):
+        run_in_loop(engine, engine.fetch_chunk(0, 99))
+
+
+def test_process_current_blocks_with_confirmations():
+    engine = get_engine(FakeRpc(head=250))
+    monitor = engine._monitor
+    monitor.blockchain_chunk_size = 100
+    monitor.get_last_processed_block.return_value = 0
+    monitor._reorg_journal.confirm_blocks.return_value = 247
+
+    run_in_loop(engine, engine.process_current_blocks())
+
+    monitor._reorg_journal.confirm_blocks.assert_called_once_with(250)
+    assert sorted(engine._rpc.ranges) == [(0, 99), (100, 199), (200, 247)]
+    monitor._reorg_journal.process_provisional_blocks.assert_called_once_with(247, 250)
+
+
+def test_process_events_keeps_order_per_did():
+    engine = get_engine()
+    monitor = engine._monitor
+    processed = []
+    lock = threading.Lock()
+
+    def apply_events(events, bulk_writer, decoded):
+        assert len(decoded) == len(events)
+        for event in events:
+            time.sleep(0.01)
+            with lock:
+                processed.append((event.args.dataToken, event.logIndex))
+
+    monitor.apply_events.side_effect = apply_events
+    events = [
+        Mock(args=Mock(dataToken=dt), logIndex=i)
+        for i, dt in enumerate(["a", "b", "a", "c", "b", "a"])
+    ]
+
+    run_in_loop(engine, engine.process_events(events))
+
+    assert monitor.apply_events.call_count == 3
+    for dt in "abc":
+        indexes = [index for token, index in processed if token == dt]
+        assert indexes == sorted(indexes)
+    assert len(processed) == len(events)
+    assert monitor.events_processed == len(events)
+
+    # a single writer for the chunk, read and flushed once
+    monitor.get_bulk_writer.assert_called_once()
+    bulk_writer = monitor.get_bulk_writer.return_value
+    bulk_writer.prefetch.assert_called_once_with(["a", "b", "c"])
+    bulk_writer.flush.assert_called_once()
+    assert {c.args[1] for c in monitor.apply_events.call_args_list} == {bulk_writer}
@@ -0,0 +1,70 @@
+#
+# Copyright 2021 Ocean Protocol Foundation
+# SPDX-License-Identifier: Apache-2.0
+#
+import json
+from unittest.mock import patch
+
+from web3 import Web3
+
+from aquarius.events.backfill import BackfillEngine
+from tests.helpers import (
+    get_ddo,
+    get_web3,
+    new_ddo,
+    send_create_update_tx,
+    test_account1,
+)
+
+
+def test_get_shards():
+    assert BackfillEngine.get_shards(0, 9, 5) == [(0, 4), (5, 9)]
+    assert BackfillEngine.get_shards(3, 11, 5) == [(3, 7), (8, 11)]
+    assert BackfillEngine.get_shards(7, 7, 5) == [(7, 7)]
+
+
+def test_backfill_applies_shards_in_order(client, base_ddo_url, events_object):
+    web3 = get_web3()
+    from_block = web3.eth.block_number
+    _ddo = new_ddo(test_account1, web3, "dt.0")
+    did = _ddo.id
+    data = Web3.toBytes(text=json.dumps(dict(_ddo)))
+    send_create_update_tx("create", did, bytes([0]), data, test_account1)
+    _ddo["service"][0]["attributes"]["main"]["name"] = "Updated ddo by backfill"
+    data = Web3.toBytes(text=json.dumps(dict(_ddo)))
+    send_create_update_tx("update", did, bytes([0]), data, test_account1)
+    to_block = web3.eth.block_number
+
+    engine = BackfillEngine(events_object, workers=4, shard_size=1)
+    applied = []
+    apply_shard = engine.apply_shard
+
+    def apply_shard_spy(shard, events):
+        applied.append(shard)
+        apply_shard(shard, events)
+
+    with patch.object(engine, "apply_shard", side_effect=apply_shard_spy):
+        engine.run(from_block, to_block)
+
+    assert applied == BackfillEngine.get_shards(from_block, to_block, 1)
+    assert events_object.get_last_processed_block() == to_block
+
+    published_ddo = get_ddo(client, base_ddo_url, did)
+    assert published_ddo["id"] == did
+    assert (
+        published_ddo["service"][0]["attributes"]["main"]["name"]
+        == "Updated ddo by backfill"
+    )
+
+
+def test_process_current_blocks_uses_backfill(events_object, monkeypatch):
+    monkeypatch.setattr(events_object, "_backfill_workers", 2)
+    monkeypatch.setattr(events_object, "_backfill_shard_size", 1)
+    monkeypatch.setattr(
+        events_object,
+        "get_last_processed_block",
+        lambda: get_web3().eth.block_number - 10,
+    )
+    with patch("aquarius.events.events_monitor.BackfillEngine.run") as mock:
+        events_object.process_current_blocks()
+        mock.assert_called_once()
@@ -0,0 +1,85 @@
+#
+# Copyright 2021 Ocean Protocol Foundation
+# SPDX-License-Identifier: Apache-2.0
+#
+from unittest.mock import Mock
+
+from aquarius.events.block_timestamps import BlockTimestampService
+from aquarius.events.http_provider import JsonRpcBatch
+
+
+def get_web3(batch=True):
+    web3 = Mock()
+    web3.eth.get_block.side_effect = lambda number: {"timestamp": 1000 + number}
+    if batch:
+        web3.provider.make_batch_request.side_effect = lambda calls: [
+            {"id": i, "result": {"timestamp": hex(1000 + int(params[0], 16))}}
+            for i, (_, params) in enumerate(calls)
+        ]
+    else:
+        web3.provider = Mock(spec=["make_request"])
+    web3.provider.make_request.side_effect = lambda method, params: {
+        "result": {"timestamp": hex(1000 + int(params[0], 16))}
+    }
+    return web3
+
+
+def test_prefetch_uses_one_batch():
+    web3 = get_web3()
+    service = BlockTimestampService(web3)
+    service.prefetch([5, 3, 5, 8])
+
+    web3.provider.make_batch_request.assert_called_once_with(
+        [
+            ("eth_getBlockByNumber", ["0x3", False]),
+            ("eth_getBlockByNumber", ["0x5", False]),
+            ("eth_getBlockByNumber", ["0x8", False]),
+        ]
+    )
+    assert service.get_timestamp(5) == 1005
+    assert service.get_timestamp(8) == 1008
+    web3.eth.get_block.assert_not_called()
+
+    # cached blocks are not fetched again
+    service.prefetch([3, 5])
+    web3.provider.make_batch_request.assert_called_once()
+
+
+def test_prefetch_without_batch_support():
+    web3 = get_web3(batch=False)
+    service = BlockTimestampService(web3)
+    service.prefetch([1, 2])
+    assert web3.provider.make_request.call_count == 2
+    assert service.get_timestamp(2) == 1002
+    web3.eth.get_block.assert_not_called()
+
+
+def test_prefetch_in_shared_batch():
+    web3 = get_web3()
+    service = BlockTimestampService(web3)
+    batch = JsonRpcBatch(web3)
+    service.prefetch([1, 2], batch)
+    assert len(batch) == 2
+    web3.provider.make_batch_request.assert_not_called()
+
+    batch.execute()
+    web3.provider.make_batch_request.assert_called_once()
+    assert service.get_timestamp(1) == 1001
+
+
+def test_cache_is_bounded():
+    web3 = get_web3(batch=False)
+    service = BlockTimestampService(web3, size=2)
+    for number in [1, 2, 3]:
+        service.get_timestamp(number)
+    service.get_timestamp(1)
+    assert web3.eth.get_block.call_count == 4
+
+
+def test_failed_batch_falls_back_on_single_lookups():
+    web3 = get_web3()
+    web3.provider.make_batch_request.side_effect = ValueError("Boom!")
+    service = BlockTimestampService(web3)
+    service.prefetch([1, 2])
+    assert service.get_timestamp(1) == 1001
+    web3.eth.get_block.assert_called_once_with(1)
@@ -0,0 +1,70 @@
+#
+# Copyright 2021 Ocean Protocol Foundation
+# SPDX-License-Identifier: Apache-2.0
+#
+from aquarius.block_utils import ChunkSizeController
+
+
+def test_chunk_size_grows_on_fast_sparse_queries():
+    controller = ChunkSizeController(100, min_size=10, max_size=1000, target_time=2)
+    assert controller.on_success(0.1, 0) == 200
+    assert controller.on_success(0.1, 5) == 400
+    assert controller.on_success(0.1, 500) == 400  # dense, no growth
+    assert controller.on_success(1.5, 0) == 400  # within target, no growth
+
+    for _ in range(10):
+        controller.on_success(0.1, 0)
+    assert controller.size == 1000
+
+
+def test_chunk_size_shrinks_on_slow_queries():
+    controller = ChunkSizeController(100, min_size=10, max_size=1000, target_time=2)
+    assert controller.on_success(5, 0) == 50
+
+    for _ in range(10):
+        controller.on_success(5, 0)
+    assert controller.size == 10
+
+
+def test_chunk_size_on_limit_errors():
+    controller = ChunkSizeController(1000, min_size=10, max_size=10000)
+    assert controller.on_error(ValueError("connection reset")) is False
+    assert controller.size == 1000
+
+    error = ValueError(
+        {"code": -32005, "message": "query returned more than 10000 results"}
+    )
+    assert controller.on_error(error) is True
+    assert controller.size == 500
+    assert controller.max_size == 10000
+
+    error = ValueError({"code": -32000, "message": "block range is too wide"})
+    assert controller.on_error(error) is True
+    assert controller.size == 250
+    assert controller.max_size == 250
+    controller.on_success(0.1, 0)
+    assert controller.size == 250
+
+    controller = ChunkSizeController(10, min_size=10)
+    assert controller.on_error(error) is False
+
+
+def test_chunk_size_on_repeated_errors():
+    controller = ChunkSizeController(1000, min_size=10)
+    assert controller.max_size == 1000
+
+    # an unknown error once, then a success
+    assert controller.on_error(ValueError("Unknown provider error")) is False
+    controller.on_success(0.1, 0)
+    assert controller.on_error(ValueError("Unknown provider error")) is False
+    assert controller.size == 1000
+
+    # the same range keeps failing
+    assert controller.on_error(ValueError("Unknown provider error")) is True
+    assert controller.size == 500
+    assert controller.on_error(ValueError("Unknown provider error")) is False
+
+    # grows back up to the initial size only
+    for _ in range(10):
+        controller.on_success(0.1, 0)
+    assert controller.size == 1000
@@ -0,0 +1,170 @@
+#
+# Copyright 2021 Ocean Protocol Foundation
+# SPDX-License-Identifier: Apache-2.0
+#
+import json
+from unittest.mock import Mock
+
+import elasticsearch
+import pytest
+from elasticsearch.serializer import JSONSerializer
+
+from aquarius.events.bulk_writer import BulkWriter
+
+
+class FakeES:
+    def __init__(self, statuses=None):
+        self.statuses = statuses or {}
+        self.bulk_requests = []
+        self.transport = Mock(serializer=JSONSerializer())
+        self.indices = Mock()
+        self.index = Mock()
+
+    def bulk(self, body, **kwargs):
+        lines = body if isinstance(body, list) else body.splitlines()
+        actions = [json.loads(line) for line in lines[::2]]
+        self.bulk_requests.append([list(action)[0] for action in actions])
+        items = []
+        for action in actions:
+            op_type, meta = action.popitem()
+            status = self.statuses.get(meta["_id"], 201)
+            result = {"_id": meta["_id"], "_index": meta["_index"], "status": status}
+            if status >= 300:
+                result["error"] = {"type": "error"}
+            items.append({op_type: result})
+        return {"errors": True, "items": items}
+
+
+def get_writer(es, **kwargs):
+    es_instance = Mock()
+    es_instance.es = es
+    es_instance.db_index = "aquarius"
+    es_instance.read.side_effect = lambda did: {"id": did, "stored": True}
+    return BulkWriter(es_instance, **kwargs)
+
+
+def test_buffer_serves_reads():
+    writer = get_writer(FakeES())
+    writer.write(json.dumps({"id": "did:op:1", "v": 1}), "did:op:1")
+    assert writer.read("did:op:1") == {"id": "did:op:1", "v": 1}
+    assert writer.read("did:op:2") == {"id": "did:op:2", "stored": True}
+
+    with pytest.raises(ValueError):
+        writer.write(json.dumps({}), "did:op:1")
+
+    writer.update(json.dumps({"id": "did:op:1", "v": 2}), "did:op:1")
+    assert writer.read("did:op:1")["v"] == 2
+    assert len(writer) == 1
+    # other attributes are those of the wrapped instance
+    assert writer.db_index == "aquarius"
+
+
+def test_flush_sends_bulk_requests_and_refreshes_once():
+    es = FakeES()
+    writer = get_writer(es, max_docs=2)
+    writer.write(json.dumps({"v": 1}), "did:op:1")
+    writer.update(json.dumps({"v": 1}), "did:op:1")  # still created
+    writer.update(json.dumps({"v": 1}), "did:op:2")
+    writer.write(json.dumps({"v": 1}), "did:op:3")
+
+    assert writer.flush() == []
+    assert es.bulk_requests == [
+        ["create", "index"],
+        ["create"],
+    ]
+    writer._es_instance.refresh.assert_called_once_with()
+    es.index.assert_not_called()
+    assert len(writer) == 0
+    assert writer.flush() == []
+    assert len(es.bulk_requests) == 2
+
+
+def test_flush_retries_failed_items():
+    es = FakeES(statuses={"did:op:1": 409, "did:op:2": 400, "did:op:3": 400})
+
+    def index(index, id, **kwargs):
+        if id == "did:op:3":
+            raise elasticsearch.exceptions.RequestError(400, "Boom!")
+
+    es.index.side_effect = index
+    writer = get_writer(es)
+    for i in range(1, 5):
+        writer.write(json.dumps({"v": i}), f"did:op:{i}")
+
+    # did:op:1 already exists, it is stale
+    assert writer.flush() == ["did:op:3"]
+    assert [c.kwargs["id"] for c in es.index.call_args_list] == [
+        "did:op:2",
+        "did:op:3",
+    ]
+    assert es.index.call_args_list[0].kwargs["op_type"] == "create"
+
+
+def test_reads_are_cached():
+    es = FakeES()
+    es.mget = Mock(
+        return_value={
+            "docs": [
+                {"_id": "did:op:1", "found": True, "_source": {"id": "did:op:1"}},
+                {"_id": "did:op:2", "found": False},
+            ]
+        }
+    )
+    writer = get_writer(es)
+    writer._es_instance.read.side_effect = elasticsearch.exceptions.NotFoundError(
+        404, "not found"
+    )
+
+    writer.prefetch(["did:op:1", "did:op:2"])
+    es.mget.assert_called_once_with(
+        index="aquarius", body={"ids": ["did:op:1", "did:op:2"]}, realtime=True
+    )
+    assert writer.read("did:op:1") == {"id": "did:op:1"}
+    with pytest.raises(elasticsearch.exceptions.NotFoundError):
+        writer.read("did:op:2")
+
+    # missing DDOs are read once
+    for _ in range(2):
+        with pytest.raises(elasticsearch.exceptions.NotFoundError):
+            writer.read("did:op:3")
+    writer._es_instance.read.assert_called_once_with("did:op:3")
+
+    # buffered records take precedence, and are not prefetched
+    writer.write(json.dumps({"id": "did:op:2", "v": 1}), "did:op:2")
+    assert writer.read("did:op:2")["v"] == 1
+    writer.prefetch(["did:op:1", "did:op:2", "did:op:3"])
+    assert es.mget.call_count == 1
+
+
+def test_versioned_updates():
+    es = FakeES(statuses={"did:op:2": 409})
+    writer = get_writer(es, unversioned={"did:op:3"})
+    writer.write(json.dumps({"v": 1}), "did:op:1")
+    writer.update(json.dumps({"v": 2}), "did:op:1", version=2000)
+    writer.update(json.dumps({"v": 1}), "did:op:2", version=1000)
+    writer.update(json.dumps({"v": 2}), "did:op:2", version=3000)
+    writer.update(json.dumps({"v": 1}), "did:op:3", version=1000)
+    writer.write(json.dumps({"v": 1}), "did:op:4", version=1000)
+    writer.update(json.dumps({"v": 2}), "did:op:4", version=2000)
+    writer.write(json.dumps({"v": 1}), "did:op:5", version=1000)
+    writer.unversioned.add("did:op:6")
+    writer.write(json.dumps({"v": 1}), "did:op:6", version=1000)
+
+    actions = {action["_id"]: action for action in writer.get_actions()}
+    # created in the chunk, stored once with its final state
+    assert actions["did:op:1"]["_op_type"] == "create"
+    assert "version" not in actions["did:op:1"]
+    assert actions["did:op:2"]["version"] == 3000
+    assert actions["did:op:2"]["version_type"] == "external"
+    assert "version" not in actions["did:op:3"]
+    # versioned creations are indexed, with the version of their last event
+    assert actions["did:op:4"]["_op_type"] == "index"
+    assert actions["did:op:4"]["version"] == 2000
+    assert actions["did:op:5"]["_op_type"] == "index"
+    assert actions["did:op:5"]["version"] == 1000
+    assert actions["did:op:6"]["_op_type"] == "create"
+    assert "version" not in actions["did:op:6"]
+
+    # the stored version of did:op:2 is newer
+    assert writer.flush() == []
+    es.index.assert_not_called()
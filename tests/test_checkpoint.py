@@ -0,0 +1,144 @@
+#
+# Copyright 2021 Ocean Protocol Foundation
+# SPDX-License-Identifier: Apache-2.0
+#
+from unittest.mock import patch
+
+import elasticsearch
+
+from aquarius.events.checkpoint import CheckpointCursor
+
+
+class FakeES:
+    """Single document store with ES sequence numbers."""
+
+    def __init__(self, block=None):
+        self.seq_no = 0 if block is not None else None
+        self.block = block
+        self.gets = 0
+        self.writes = []
+
+    def get(self, index, id, doc_type):
+        self.gets += 1
+        if self.seq_no is None:
+            raise elasticsearch.exceptions.NotFoundError(404, "not found")
+        return {
+            "_seq_no": self.seq_no,
+            "_primary_term": 1,
+            "_source": {"last_block": self.block},
+        }
+
+    def index(self, index, id, body, doc_type, **kwargs):
+        exists = self.seq_no is not None
+        if (kwargs.get("op_type") == "create" and exists) or (
+            "if_seq_no" in kwargs and kwargs["if_seq_no"] != self.seq_no
+        ):
+            raise elasticsearch.exceptions.ConflictError(409, "conflict")
+
+        self.seq_no = self.seq_no + 1 if exists else 0
+        self.block = body["last_block"]
+        self.writes.append(self.block)
+        return {"_seq_no": self.seq_no, "_primary_term": 1}
+
+
+def get_cursor(es, flush_every=3):
+    return CheckpointCursor(es, "index", "doc", flush_every, flush_interval=3600)
+
+
+def test_get_reads_once():
+    es = FakeES(block=10)
+    cursor = get_cursor(es)
+    assert cursor.get() == 10
+    assert cursor.get() == 10
+    assert es.gets == 1
+
+    assert get_cursor(FakeES()).get() == 0
+
+
+def test_advance_flushes_in_batches():
+    es = FakeES(block=10)
+    cursor = get_cursor(es)
+    cursor.get()
+
+    for block in range(11, 16):
+        cursor.advance(block)
+    assert es.writes == [13]
+
+    cursor.advance(12)  # never backwards
+    assert cursor.get() == 15
+
+    cursor.flush()
+    cursor.flush()
+    assert es.writes == [13, 15]
+    assert es.gets == 1
+
+
+def test_first_advance_is_flushed():
+    es = FakeES()
+    cursor = get_cursor(es)
+    cursor.get()
+    cursor.advance(5)
+    assert es.writes == [5]
+
+
+def test_flush_after_interval():
+    es = FakeES(block=10)
+    cursor = get_cursor(es)
+    cursor.get()
+    cursor.advance(11)
+    with patch("aquarius.events.checkpoint.time.time", return_value=10 ** 10):
+        cursor.advance(12)
+    assert es.writes == [12]
+
+
+def test_flush_conflicts():
+    es = FakeES(block=10)
+    cursor = get_cursor(es, flush_every=1)
+    cursor.get()
+
+    # another process moved the checkpoint backwards, it is overwritten
+    es.seq_no, es.block = 5, 8
+    cursor.advance(11)
+    assert es.block == 11
+
+    # another process moved the checkpoint ahead, it is kept
+    es.seq_no, es.block = 10, 20
+    cursor.advance(12)
+    assert es.block == 20
+    assert cursor.get() == 12
+
+
+def test_rewind():
+    es = FakeES(block=10)
+    cursor = get_cursor(es)
+    cursor.get()
+    cursor.advance(11)
+    cursor.advance(12)
+    assert es.writes == []
+
+    # not behind the cursor
+    cursor.rewind(12)
+    assert es.writes == []
+
+    # written right away, even over a checkpoint moved by another process
+    es.seq_no, es.block = 5, 20
+    cursor.rewind(9)
+    assert es.writes == [9]
+    assert cursor.get() == 9
+
+    cursor.advance(10)
+    assert es.writes == [9]
+
+
+def test_flush_errors_are_logged():
+    es = FakeES(block=10)
+    cursor = get_cursor(es, flush_every=1)
+    cursor.get()
+    with patch.object(
+        es, "index", side_effect=elasticsearch.exceptions.RequestError(400, "Boom!")
+    ):
+        cursor.advance(11)
+    assert cursor.get() == 11
+
+    cursor.flush()
+    assert es.writes == [11]
@@ -0,0 +1,86 @@
+#
+# Copyright 2021 Ocean Protocol Foundation
+# SPDX-License-Identifier: Apache-2.0
+#
+from unittest.mock import Mock, patch
+
+from eth_abi import encode_abi
+from freezegun import freeze_time
+from web3 import Web3
+
+from aquarius.events.datatoken_cache import DatatokenInfoCache
+
+TOKEN = "0xe2DD09d719Da89e5a3D0F2549c7E24566e947260"
+TOKEN_INFO = {
+    "address": TOKEN,
+    "name": "DataToken1",
+    "symbol": "DT1",
+    "decimals": 18,
+    "cap": 1000.0,
+}
+
+
+def get_batch_response(calls):
+    values = {
+        "name": encode_abi(["string"], ["DataToken1"]),
+        "symbol": encode_abi(["string"], ["DT1"]),
+        "decimals": encode_abi(["uint8"], [18]),
+        "cap": encode_abi(["uint256"], [1000 * 10 ** 18]),
+    }
+    selectors = {
+        Web3.keccak(text=f"{fn}()")[:4].hex(): fn
+        for fn in ("name", "symbol", "decimals", "cap")
+    }
+    return [
+        {"id": i, "result": "0x" + values[selectors[params[0]["data"][:10]]].hex()}
+        for i, (_, params) in enumerate(calls)
+    ]
+
+
+def get_web3():
+    web3 = Web3()
+    web3.provider = Mock()
+    web3.provider.make_batch_request.side_effect = get_batch_response
+    return web3
+
+
+def test_prefetch_uses_one_batch():
+    web3 = get_web3()
+    cache = DatatokenInfoCache(web3)
+    other_token = "0xBE5449a6A97aD46c8558A3356267Ee5D2731ab5e"
+    cache.prefetch([TOKEN.lower(), TOKEN, other_token])
+
+    web3.provider.make_batch_request.assert_called_once()
+    assert len(web3.provider.make_batch_request.call_args[0][0]) == 8
+
+    with patch("aquarius.events.datatoken_cache.get_datatoken_info") as mock:
+        assert cache.get(TOKEN.lower()) == TOKEN_INFO
+        assert cache.get(other_token)["address"] == other_token
+        mock.assert_not_called()
+
+    cache.prefetch([TOKEN])
+    web3.provider.make_batch_request.assert_called_once()
+
+
+def test_entries_expire():
+    cache = DatatokenInfoCache(get_web3(), ttl=60)
+    with patch("aquarius.events.datatoken_cache.get_datatoken_info") as mock:
+        mock.return_value = TOKEN_INFO
+        with freeze_time("2021-01-01 00:00:00"):
+            cache.get(TOKEN)
+            cache.get(TOKEN)
+        assert mock.call_count == 1
+
+        with freeze_time("2021-01-01 00:02:00"):
+            cache.get(TOKEN)
+        assert mock.call_count == 2
+
+
+def test_entries_are_evicted():
+    cache = DatatokenInfoCache(get_web3(), size=1)
+    with patch("aquarius.events.datatoken_cache.get_datatoken_info") as mock:
+        mock.return_value = TOKEN_INFO
+        cache.get(TOKEN)
+        cache.get("0xBE5449a6A97aD46c8558A3356267Ee5D2731ab5e")
+        cache.get(TOKEN)
+        assert mock.call_count == 3
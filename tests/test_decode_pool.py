@@ -0,0 +1,60 @@
+#
+# Copyright 2021 Ocean Protocol Foundation
+# SPDX-License-Identifier: Apache-2.0
+#
+import json
+import lzma
+
+from web3.datastructures import AttributeDict
+
+from aquarius.events.decode_pool import DecodePool, decode_payload, init_worker
+from tests.ddos.ddo_sample1 import json_dict
+
+
+def test_decode_payload():
+    init_worker(None)
+    rawddo = json.dumps(json_dict).encode("utf-8")
+
+    result = decode_payload((rawddo, b"\x00"))
+    assert result["data"] == json_dict
+    assert result["record"]["id"] == json_dict["id"]
+    assert result["errors"] == []
+
+    result = decode_payload((lzma.compress(rawddo), b"\x01"))
+    assert result["data"] == json_dict
+
+    result = decode_payload((b"not a ddo", b"\x00"))
+    assert result == {"data": None, "record": None, "errors": None}
+
+    # unexpected errors are left to the processor
+    assert decode_payload((rawddo, None)) is None
+
+
+def test_decode_pool():
+    events = [
+        AttributeDict(
+            {
+                "args": AttributeDict(
+                    {
+                        "data": json.dumps(dict(json_dict, id=f"did:op:{i}")).encode(
+                            "utf-8"
+                        ),
+                        "flags": b"\x00",
+                    }
+                )
+            }
+        )
+        for i in range(5)
+    ]
+
+    pool = DecodePool(2)
+    # workers do not inherit the threads and locks of the monitor
+    assert pool._executor._mp_context.get_start_method() == "spawn"
+    try:
+        decoded = pool.decode(events)
+    finally:
+        pool.shutdown()
+
+    assert [result["data"]["id"] for result in decoded] == [
+        f"did:op:{i}" for i in range(5)
+    ]
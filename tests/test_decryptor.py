@@ -2,7 +2,13 @@
 # Copyright 2021 Ocean Protocol Foundation
 # SPDX-License-Identifier: Apache-2.0
 #
+import lzma
 import os
+
+import ecies
+import eth_keys
+
+import pytest
 from eth_account import Account
 from aquarius.events.decryptor import Decryptor
 from tests.ddos.rawddos import lzma_compressed_sample, ecies_encrypted_sample
@@ -12,12 +18,12 @@ from unittest.mock import patch
 def test_decode_ddo(events_object, monkeypatch):
     ecies_private_key = os.environ.get("EVENTS_ECIES_PRIVATE_KEY", None)
     ecies_account = Account.from_key(ecies_private_key)
-    decryptor = Decryptor(ecies_account)
 
     monkeypatch.setenv("ONLY_ENCRYPTED_DDO", "1")
     # flags set to 0 by default, can not decrypt if only encrypted DDOs work
-    assert decryptor.decode_ddo("some_encrypted_ddo", "") is None
+    assert Decryptor(ecies_account).decode_ddo("some_encrypted_ddo", "") is None
     monkeypatch.setenv("ONLY_ENCRYPTED_DDO", "0")
+    decryptor = Decryptor(ecies_account)
 
     # empty ddo
     assert decryptor.decode_ddo(None, "") is None
@@ -29,12 +35,40 @@ def test_decode_ddo(events_object, monkeypatch):
     result = decryptor.decode_ddo(ecies_encrypted_sample, b"\x03")
     assert "@context" in result
 
+    # the key is derived once
+    key = decryptor.get_ecies_key()
+    with patch("aquarius.events.decryptor.eth_keys") as mock:
+        result = decryptor.decode_ddo(memoryview(ecies_encrypted_sample), b"\x03")
+        mock.KeyAPI.PrivateKey.assert_not_called()
+    assert "@context" in result
+    assert decryptor.get_ecies_key() is key
+    public_key = eth_keys.KeyAPI.PrivateKey(key).public_key.to_hex()
+    assert decryptor.ecies_decrypt(ecies.encrypt(public_key, b"[1]")) == b"[1]"
+
     # various errors
-    with patch("json.loads") as mock:
+    with patch("aquarius.app.json_util.loads") as mock:
         mock.side_effect = Exception("Boom!")
         assert decryptor.decode_ddo(ecies_encrypted_sample, b"\x03") is None
-    decryptor._ecies_account = "mess up the account to get an error"
+    decryptor = Decryptor("mess up the account to get an error")
     assert decryptor.decode_ddo(ecies_encrypted_sample, b"\x03") is None
     assert (
         decryptor.decode_ddo("some sort of string instead of binary", b"\x03") is None
     )
+
+
+def test_decompress():
+    decryptor = Decryptor(None, max_ddo_size=100)
+    assert decryptor.decode_ddo(lzma.compress(b'{"a": 1}'), b"\x01") == {"a": 1}
+    assert decryptor.decode_ddo(memoryview(lzma.compress(b"[]")), b"\x01") == []
+    assert decryptor.decode_ddo(memoryview(b"[1]"), b"\x00") == [1]
+
+    # exactly the maximum size
+    data = b"[" + b" " * 98 + b"]"
+    assert decryptor.decompress(lzma.compress(data)) == data
+
+    with pytest.raises(ValueError):
+        decryptor.decompress(lzma.compress(b"[" + b" " * 10 ** 6 + b"]"))
+    assert decryptor.decode_ddo(lzma.compress(b" " * 10 ** 6), b"\x01") is None
+
+    with pytest.raises(lzma.LZMAError):
+        decryptor.decompress(lzma.compress(b"[1]")[:-10])
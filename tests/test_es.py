@@ -4,7 +4,12 @@
 #
 import pytest
 from unittest.mock import patch
-from aquarius.app.es_instance import ElasticsearchInstance, get_value
+from elasticsearch.exceptions import ConflictError, NotFoundError
+from aquarius.app.es_instance import (
+    ElasticsearchInstance,
+    get_refresh_policy,
+    get_value,
+)
 from aquarius.myapp import app
 
 
@@ -25,9 +30,74 @@ def test_str_to_bool():
 
 def test_write_duplicate():
     with pytest.raises(ValueError):
-        with patch("elasticsearch.Elasticsearch.exists") as mock:
-            mock.return_value = True
+        with patch("elasticsearch.Elasticsearch.index") as mock:
+            mock.side_effect = ConflictError(409, "version_conflict_engine_exception")
             es_instance.write({}, "not_none")
+    assert mock.call_args.kwargs["op_type"] == "create"
+
+    with patch("elasticsearch.Elasticsearch.index") as mock:
+        es_instance.write({}, "not_none", version=1000)
+    assert mock.call_args.kwargs["version_type"] == "external"
+    assert "op_type" not in mock.call_args.kwargs
+
+
+def test_refresh_policy(monkeypatch):
+    assert get_refresh_policy() == "immediate"
+    monkeypatch.setenv("ES_REFRESH_POLICY", "deferred")
+    assert get_refresh_policy() == "deferred"
+    monkeypatch.setenv("ES_REFRESH_POLICY", "sometimes")
+    assert get_refresh_policy() == "immediate"
+
+    with patch("elasticsearch.Elasticsearch.index") as mock:
+        es_instance.update({}, "did", version=1000)
+    assert mock.call_args.kwargs["refresh"] == "wait_for"
+    assert mock.call_args.kwargs["version_type"] == "external"
+
+    monkeypatch.setattr(es_instance, "refresh_policy", "deferred")
+    with patch("elasticsearch.Elasticsearch.index") as mock:
+        es_instance.write({}, "did")
+    assert mock.call_args.kwargs["refresh"] == "false"
+    with patch("elasticsearch.client.IndicesClient.refresh") as mock:
+        es_instance.refresh()
+    mock.assert_called_once_with(index=es_instance.db_index)
+
+    monkeypatch.setattr(es_instance, "refresh_policy", "async")
+    with patch("elasticsearch.client.IndicesClient.refresh") as mock:
+        es_instance.refresh()
+    mock.assert_not_called()
+
+
+def test_scan():
+    pages = [
+        {"pit_id": "pit2", "hits": {"hits": [{"_source": {"id": i}, "sort": [i]}]}}
+        for i in range(3)
+    ] + [{"pit_id": "pit2", "hits": {"hits": []}}]
+    with patch("elasticsearch.Elasticsearch.open_point_in_time") as open_pit, patch(
+        "elasticsearch.Elasticsearch.search"
+    ) as search, patch("elasticsearch.Elasticsearch.close_point_in_time") as close_pit:
+        open_pit.return_value = {"id": "pit1"}
+        search.side_effect = pages
+        query = {"match_all": {}}
+        assert list(es_instance.scan(query, source=["id"], size=1)) == [
+            {"id": 0},
+            {"id": 1},
+            {"id": 2},
+        ]
+        body = search.call_args.kwargs["body"]
+        assert body["_source"] == ["id"]
+        assert body["pit"]["id"] == "pit2"
+        assert body["search_after"] == [2]
+        assert search.call_count == 4
+        close_pit.assert_called_once_with(body={"id": "pit2"})
+
+    # scroll on versions without point in time
+    with patch("elasticsearch.Elasticsearch.open_point_in_time") as open_pit, patch(
+        "aquarius.app.es_instance.scan"
+    ) as scan:
+        open_pit.side_effect = NotFoundError(404, "no handler found")
+        scan.return_value = iter([{"_source": {"id": 0}}])
+        assert list(es_instance.scan(query)) == [{"id": 0}]
+        assert scan.call_args.kwargs["query"] == {"query": query}
 
 
 def test_delete():
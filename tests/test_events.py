@@ -7,6 +7,7 @@ import lzma
 
 import ecies
 import elasticsearch
+import pytest
 from web3 import Web3
 from unittest.mock import patch
 
@@ -142,6 +143,57 @@ def test_get_assets_in_chain(client, events_object):
     assert set([item["chainId"] for item in res]) == {chain_id}
 
 
+def test_reset_chain(events_object):
+    es = "elasticsearch.Elasticsearch"
+    with patch(f"{es}.get") as get, patch(f"{es}.index") as index, patch(
+        f"{es}.delete"
+    ) as delete, patch(f"{es}.delete_by_query") as delete_by_query, patch(
+        "elasticsearch.client.TasksClient.get"
+    ) as get_task, patch(
+        "aquarius.events.events_monitor.time.sleep"
+    ):
+        get.side_effect = elasticsearch.exceptions.NotFoundError(404, "not found")
+        delete_by_query.return_value = {"task": "node:1"}
+        running = {"completed": False, "task": {"status": {"total": 2, "deleted": 1}}}
+        completed = {
+            "completed": True,
+            "task": {"status": {"total": 2, "deleted": 2}},
+            "response": {"deleted": 2, "failures": []},
+        }
+        get_task.side_effect = [running, completed]
+        events_object.reset_chain()
+        assert delete_by_query.call_args.kwargs["wait_for_completion"] is False
+        assert delete_by_query.call_args.kwargs["slices"] == "auto"
+        assert index.call_args.kwargs["body"] == {"task": "node:1"}
+        assert delete.call_args.kwargs["id"] == events_object.reset_task_doc_id
+
+        # an unfinished task is resumed
+        get.side_effect = None
+        get.return_value = {"_source": {"task": "node:1"}}
+        delete_by_query.reset_mock()
+        get_task.side_effect = [running, running, completed]
+        events_object.reset_chain()
+        delete_by_query.assert_not_called()
+        assert get_task.call_count == 5
+
+        # a lost task is started again
+        get.side_effect = elasticsearch.exceptions.ConnectionError("N/A", "down", None)
+        get_task.side_effect = [
+            elasticsearch.exceptions.NotFoundError(404, "task not found"),
+            completed,
+        ]
+        events_object.reset_chain()
+        assert delete_by_query.call_count == 2
+        assert get_task.call_count == 7
+
+        # and given up after max_restarts
+        get_task.side_effect = elasticsearch.exceptions.NotFoundError(404, "not found")
+        delete.reset_mock()
+        events_object.reset_chain(max_restarts=1)
+        assert delete_by_query.call_count == 4
+        delete.assert_not_called()
+
+
 def test_events_monitor_object(monkeypatch):
     config_file = app.config["AQUARIUS_CONFIG_FILE"]
     monkeypatch.setenv("ALLOWED_PUBLISHERS", "can not be converted to a set")
@@ -216,13 +268,17 @@ def test_run_monitor_purgatory(monkeypatch):
     )
     monitor = EventsMonitor(setup_web3(config_file), config_file)
     monitor._monitor_is_on = True
+    # the purgatory is updated in its own thread
     with patch("aquarius.events.purgatory.Purgatory.update_lists") as mock:
         monitor.do_run_monitor()
-        mock.assert_called_once()
+        mock.assert_not_called()
 
-    with patch("aquarius.events.purgatory.Purgatory.update_lists") as mock:
-        mock.side_effect = Exception("Boom!")
-        monitor.do_run_monitor()
+    monitor._monitor_is_on = False
+    with patch("aquarius.events.purgatory.Purgatory.start") as mock:
+        monitor.start_events_monitor()
+        mock.assert_called_once_with(monitor._monitor_sleep_time)
+
+    monitor.stop_monitor()
 
 
 def test_process_block_range(client, base_ddo_url, events_object):
@@ -250,7 +306,9 @@ def test_process_block_range(client, base_ddo_url, events_object):
         assert events_object.process_current_blocks() is None
 
 
-def test_get_last_processed_block(events_object):
+def test_get_last_processed_block(events_object, monkeypatch):
+    # the checkpoint is only read from ES until it is known
+    monkeypatch.setattr(events_object._checkpoint, "block", None)
     with patch("elasticsearch.Elasticsearch.get") as mock:
         mock.side_effect = Exception("Boom!")
         assert events_object.get_last_processed_block() == 0
@@ -281,16 +339,45 @@ def test_add_chain_id_to_chains_list(events_object):
 
 
 def test_get_event_logs(events_object):
-    def get_logs_exception(event, from_block, to_block):
+    def get_logs_exception(topics, from_block, to_block):
         raise ValueError("Boom!")
 
-    def get_logs_mock(event, from_block, to_block):
-        return {"Hello There": "General Kenobi!"}
+    def get_logs_mock(topics, from_block, to_block):
+        assert len(topics) == 1
+        return []
+
+    with pytest.raises(ValueError):
+        events_object.get_event_logs(
+            [EVENT_METADATA_CREATED], 0, 10, get_logs_exception
+        )
 
     assert (
-        events_object.get_event_logs(EVENT_METADATA_CREATED, 0, 10, get_logs_exception)
-        is None
+        events_object.get_event_logs([EVENT_METADATA_CREATED], 0, 10, get_logs_mock)
+        == []
     )
-    result = events_object.get_event_logs(EVENT_METADATA_CREATED, 0, 10, get_logs_mock)
 
-    assert result["Hello There"] == "General Kenobi!"
+
+def test_get_event_logs_single_call_in_chain_order(events_object):
+    web3 = get_web3()
+    block = web3.eth.block_number
+    _ddo = new_ddo(test_account1, web3, "dt.0")
+    did = _ddo.id
+    data = Web3.toBytes(text=json.dumps(dict(_ddo)))
+    send_create_update_tx("create", did, bytes([0]), data, test_account1)
+    send_create_update_tx("update", did, bytes([0]), data, test_account1)
+    head = web3.eth.block_number
+
+    with patch.object(
+        events_object._web3.eth, "get_logs", wraps=events_object._web3.eth.get_logs
+    ) as mock:
+        events = events_object.get_event_logs(
+            [EVENT_METADATA_CREATED, EVENT_METADATA_UPDATED], block, head
+        )
+        mock.assert_called_once()
+
+    assert [event.event for event in events] == [
+        EVENT_METADATA_CREATED,
+        EVENT_METADATA_UPDATED,
+    ]
+    positions = [(event.blockNumber, event.logIndex) for event in events]
+    assert positions == sorted(positions)
@@ -0,0 +1,77 @@
+#
+# Copyright 2021 Ocean Protocol Foundation
+# SPDX-License-Identifier: Apache-2.0
+#
+import json
+from unittest.mock import Mock, patch
+
+from aquarius.events.http_provider import CustomHTTPProvider, JsonRpcBatch
+
+
+def reversed_batch_response(endpoint_uri, data, **kwargs):
+    requests = json.loads(data)
+    return json.dumps(
+        [
+            {"jsonrpc": "2.0", "id": request["id"], "result": request["method"]}
+            for request in reversed(requests)
+        ]
+    ).encode()
+
+
+def test_make_batch_request_maps_responses_by_id():
+    provider = CustomHTTPProvider("http://localhost:8545")
+    with patch(
+        "aquarius.events.http_provider.make_post_request",
+        side_effect=reversed_batch_response,
+    ) as mock:
+        responses = provider.make_batch_request([("a", []), ("b", [1]), ("c", None)])
+        mock.assert_called_once()
+
+    assert [response["result"] for response in responses] == ["a", "b", "c"]
+    assert provider.batch_stats.batches == 1
+    assert provider.batch_stats.calls == 3
+
+
+def test_make_batch_request_splits_large_batches(monkeypatch):
+    monkeypatch.setenv("RPC_BATCH_MAX_SIZE", "2")
+    provider = CustomHTTPProvider("http://localhost:8545")
+    calls = [(str(i), []) for i in range(5)]
+    with patch(
+        "aquarius.events.http_provider.make_post_request",
+        side_effect=reversed_batch_response,
+    ) as mock:
+        responses = provider.make_batch_request(calls)
+        assert mock.call_count == 3
+
+    assert [response["result"] for response in responses] == [str(i) for i in range(5)]
+
+
+def test_make_batch_request_splits_rejected_batches():
+    provider = CustomHTTPProvider("http://localhost:8545")
+
+    def reject_large_batches(endpoint_uri, data, **kwargs):
+        if len(json.loads(data)) > 2:
+            return json.dumps({"error": "batch too large"}).encode()
+        return reversed_batch_response(endpoint_uri, data)
+
+    with patch(
+        "aquarius.events.http_provider.make_post_request",
+        side_effect=reject_large_batches,
+    ):
+        responses = provider.make_batch_request([(str(i), []) for i in range(4)])
+
+    assert [response["result"] for response in responses] == ["0", "1", "2", "3"]
+
+
+def test_json_rpc_batch_without_batch_support():
+    web3 = Mock()
+    web3.provider = Mock(spec=["make_request"])
+    web3.provider.make_request.side_effect = lambda method, params: {"result": method}
+    results = []
+    batch = JsonRpcBatch(web3)
+    batch.add("a", [], results.append)
+    batch.add("b", [], results.append)
+    batch.execute()
+
+    assert results == [{"result": "a"}, {"result": "b"}]
+    assert len(batch) == 0
@@ -0,0 +1,76 @@
+#
+# Copyright 2021 Ocean Protocol Foundation
+# SPDX-License-Identifier: Apache-2.0
+#
+import json
+import math
+from datetime import datetime
+
+import pytest
+
+from aquarius.app import json_util
+from aquarius.app.util import datetime_converter, sanitize_record
+from tests.ddos.ddo_sample1 import json_dict
+
+backends = ["json"] + (["orjson"] if json_util.orjson else [])
+
+
+@pytest.mark.parametrize("backend", backends)
+def test_dumps_and_loads(backend, monkeypatch):
+    monkeypatch.setattr(json_util, "BACKEND", backend)
+    assert json_util.loads(json_util.dumps(json_dict)) == json_dict
+
+    record = {
+        "created": datetime(2021, 1, 2, 3, 4, 5),
+        1: "non str key",
+        "big": 2 ** 70,
+    }
+    assert json.loads(json_util.dumps(record, default=datetime_converter)) == {
+        "created": "2021-01-02T03:04:05Z",
+        "1": "non str key",
+        "big": 2 ** 70,
+    }
+    assert json.loads(sanitize_record({"_id": "id", "a": 1})) == {"a": 1}
+
+    data = json.dumps(json_dict).encode("utf-8")
+    assert json_util.loads(data) == json_dict
+    assert json_util.loads(memoryview(data)) == json_dict
+    assert json_util.loads(data.decode("utf-8")) == json_dict
+
+    with pytest.raises(json.JSONDecodeError):
+        json_util.loads(b"not json")
+
+
+@pytest.mark.parametrize("backend", backends)
+def test_loads(backend, monkeypatch):
+    monkeypatch.setattr(json_util, "BACKEND", backend)
+    data = json.dumps({"big": 2 ** 70, "small": -(2 ** 70), "nan": float("nan")})
+    for value in (data, data.encode("utf-8"), memoryview(data.encode("utf-8"))):
+        loaded = json_util.loads(value)
+        assert loaded["big"] == 2 ** 70 and isinstance(loaded["big"], int)
+        assert loaded["small"] == -(2 ** 70) and isinstance(loaded["small"], int)
+        assert math.isnan(loaded["nan"])
+
+    assert json_util.loads('{"id": "12345678901234567890123"}') == {
+        "id": "12345678901234567890123"
+    }
+
+
+@pytest.mark.parametrize("backend", backends)
+def test_dumps_non_finite_floats(backend, monkeypatch):
+    monkeypatch.setattr(json_util, "BACKEND", backend)
+    dumped = json.loads(json_util.dumps({"nan": float("nan"), "inf": float("inf")}))
+    if backend == "orjson":
+        assert dumped == {"nan": None, "inf": None}
+    else:
+        assert math.isnan(dumped["nan"]) and dumped["inf"] == float("inf")
+
+
+def test_get_backend(monkeypatch):
+    monkeypatch.setenv("JSON_BACKEND", "json")
+    assert json_util.get_backend() == "json"
+
+    monkeypatch.setenv("JSON_BACKEND", "orjson")
+    assert json_util.get_backend() == ("orjson" if json_util.orjson else "json")
+    monkeypatch.setattr(json_util, "orjson", None)
+    assert json_util.get_backend() == "json"
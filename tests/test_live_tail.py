@@ -0,0 +1,98 @@
+#
+# Copyright 2021 Ocean Protocol Foundation
+# SPDX-License-Identifier: Apache-2.0
+#
+import threading
+from unittest.mock import Mock, patch
+
+from aquarius.block_utils import ChunkSizeController
+from aquarius.events.live_tail import LiveTail, get_live_tail_url
+
+
+def get_log(block, log_index=0, removed=False):
+    return {
+        "address": "0x0000000000000000000000000000000000000001",
+        "blockHash": "0x" + "11" * 32,
+        "blockNumber": hex(block),
+        "data": "0x",
+        "logIndex": hex(log_index),
+        "removed": removed,
+        "topics": ["0x" + "22" * 32],
+        "transactionHash": "0x" + "33" * 32,
+        "transactionIndex": "0x0",
+    }
+
+
+def get_notification(log):
+    return {"method": "eth_subscription", "params": {"result": log}}
+
+
+def get_live_tail():
+    monitor = Mock()
+    monitor.processing_lock = threading.Lock()
+    monitor._reorg_journal = None
+    monitor.chunk_size_controller = ChunkSizeController(100)
+    monitor.blockchain_chunk_size = 100
+    monitor.decode_event_logs.side_effect = lambda logs: list(logs)
+    return LiveTail(monitor, "ws://localhost:8546")
+
+
+def test_get_live_tail_url(monkeypatch):
+    web3 = Mock()
+    web3.provider.endpoint_uri = "http://localhost:8545"
+    monkeypatch.delenv("EVENTS_WS_RPC", raising=False)
+    assert get_live_tail_url(web3) is None
+
+    web3.provider.endpoint_uri = "ws://localhost:8546"
+    assert get_live_tail_url(web3) == "ws://localhost:8546"
+
+    monkeypatch.setenv("EVENTS_WS_RPC", "wss://example.com")
+    assert get_live_tail_url(web3) == "wss://example.com"
+
+
+def test_fill_gap():
+    live_tail = get_live_tail()
+    monitor = live_tail._monitor
+    monitor.get_last_processed_block.return_value = 50
+    monitor._web3.eth.block_number = 260
+
+    assert live_tail.fill_gap() == 260
+    monitor.process_blocks.assert_called_once_with(50, 260)
+
+
+def test_handle_notification():
+    live_tail = get_live_tail()
+    monitor = live_tail._monitor
+
+    # covered by the gap fill
+    assert not live_tail.handle_notification(get_notification(get_log(10)), 10)
+    # subscription confirmation, or any other message
+    assert not live_tail.handle_notification({"id": 1, "result": "0x1"}, 10)
+    monitor.process_events.assert_not_called()
+
+    with patch("aquarius.events.live_tail.log_entry_formatter", lambda log: log):
+        assert live_tail.handle_notification(get_notification(get_log(11)), 10)
+        assert live_tail.handle_notification(get_notification(get_log(11, 1)), 10)
+        assert live_tail.handle_notification(get_notification(get_log(12)), 10)
+
+    assert monitor.process_events.call_count == 3
+    # the checkpoint is stored once per block
+    assert [c.args[0] for c in monitor.store_last_processed_block.call_args_list] == [
+        11,
+        12,
+    ]
+
+
+def test_handle_removed_notification():
+    live_tail = get_live_tail()
+    monitor = live_tail._monitor
+    monitor.get_last_processed_block.return_value = 9
+    monitor._web3.eth.block_number = 12
+
+    # the checkpoint goes back below the reorged block, which is processed again
+    assert not live_tail.handle_notification(
+        get_notification(get_log(10, removed=True)), 11
+    )
+    monitor.rewind_last_processed_block.assert_called_once_with(9)
+    monitor.process_blocks.assert_called_once_with(9, 12)
+    monitor.process_events.assert_not_called()
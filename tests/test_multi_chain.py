@@ -0,0 +1,108 @@
+#
+# Copyright 2021 Ocean Protocol Foundation
+# SPDX-License-Identifier: Apache-2.0
+#
+import json
+from unittest.mock import DEFAULT, Mock, patch
+
+import pytest
+
+from aquarius.events.multi_chain import (
+    ChainStats,
+    MultiChainMonitor,
+    get_chains_config,
+)
+
+
+def test_get_chains_config(monkeypatch):
+    monkeypatch.delenv("EVENTS_CHAINS", raising=False)
+    assert get_chains_config() == []
+
+    chains = [
+        {"rpc": "http://localhost:8545", "contract": "0x01", "start_block": 10},
+        {
+            "rpc": "wss://example.com",
+            "contract": "0x02",
+            "start_block": 0,
+            "chunk_size": 100,
+        },
+    ]
+    monkeypatch.setenv("EVENTS_CHAINS", json.dumps(chains))
+    assert get_chains_config() == chains
+
+    monkeypatch.setenv("EVENTS_CHAINS", "not json")
+    with pytest.raises(AssertionError):
+        get_chains_config()
+
+    monkeypatch.setenv("EVENTS_CHAINS", json.dumps([{"rpc": "http://localhost"}]))
+    with pytest.raises(AssertionError):
+        get_chains_config()
+
+    # the start block of a single chain does not apply to the others
+    chains = [{"rpc": "http://localhost:8545", "contract": "0x01"}]
+    monkeypatch.setenv("EVENTS_CHAINS", json.dumps(chains))
+    with pytest.raises(AssertionError):
+        get_chains_config()
+
+
+def test_chain_stats():
+    stats = ChainStats(1)
+    stats.record(100, 5, 20)
+    stats.record(50, 0, 3)
+    assert stats.blocks == 150 and stats.events == 5 and stats.lag == 3
+
+    assert stats.report().startswith("Chain 1: lag 3 blocks, ")
+    assert stats.blocks == 0 and stats.events == 0
+
+
+def test_run_cycle_records_stats():
+    monitor = Mock(events_processed=0, _chain_id=1, _monitor_sleep_time=10)
+    blocks = iter([100, 150])
+    monitor.get_last_processed_block.side_effect = lambda: next(blocks)
+    monitor._web3.eth.block_number = 160
+
+    def do_run_monitor():
+        monitor.events_processed = 7
+
+    monitor.do_run_monitor.side_effect = do_run_monitor
+
+    multi_chain = MultiChainMonitor.__new__(MultiChainMonitor)
+    multi_chain.stats = {monitor: ChainStats(1)}
+    multi_chain._next_run = {monitor: 0}
+    multi_chain.run_cycle(monitor)
+
+    stats = multi_chain.stats[monitor]
+    assert (stats.blocks, stats.events, stats.lag) == (50, 7, 10)
+    assert multi_chain._next_run[monitor] > 0
+
+    # errors of a chain do not stop the others
+    monitor.do_run_monitor.side_effect = Exception("Boom!")
+    monitor.get_last_processed_block.side_effect = None
+    multi_chain.run_cycle(monitor)
+
+
+def test_monitors_share_purgatory_and_decode_pool():
+    chains = [
+        {"rpc": "http://localhost:8545", "contract": "0x01", "start_block": 10},
+        {"rpc": "http://localhost:8546", "contract": "0x02", "start_block": 0},
+    ]
+    with patch.multiple(
+        "aquarius.events.multi_chain",
+        ElasticsearchInstance=DEFAULT,
+        Web3=DEFAULT,
+        get_web3_connection_provider=DEFAULT,
+        get_metadata_contract=DEFAULT,
+        get_purgatory=DEFAULT,
+        get_decode_pool=DEFAULT,
+        EventsMonitor=DEFAULT,
+    ) as mocks:
+        MultiChainMonitor(chains, "config.ini")
+
+    purgatory = mocks["get_purgatory"].return_value
+    decode_pool = mocks["get_decode_pool"].return_value
+    mocks["get_purgatory"].assert_called_once()
+    mocks["get_decode_pool"].assert_called_once()
+    kwargs = [c.kwargs for c in mocks["EventsMonitor"].call_args_list]
+    assert [k["purgatory"] for k in kwargs] == [purgatory, purgatory]
+    assert [k["decode_pool"] for k in kwargs] == [decode_pool, decode_pool]
+    assert [k["start_block"] for k in kwargs] == [10, 0]
@@ -0,0 +1,59 @@
+#
+# Copyright 2021 Ocean Protocol Foundation
+# SPDX-License-Identifier: Apache-2.0
+#
+from unittest.mock import Mock
+
+import pytest
+
+from aquarius.events.pipeline import EventsPipeline, StageStats
+
+
+def get_monitor(chunks):
+    monitor = Mock()
+    monitor.iter_event_chunks.side_effect = lambda from_block, to_block: iter(chunks)
+    return monitor
+
+
+def test_pipeline_processes_and_checkpoints_in_order():
+    chunks = [(0, 9, ["a"]), (10, 19, []), (20, 25, ["b", "c"])]
+    monitor = get_monitor(chunks)
+    checkpoints = []
+    monitor.store_last_processed_block.side_effect = checkpoints.append
+
+    pipeline = EventsPipeline(monitor, depth=1)
+    pipeline.run(0, 25)
+
+    assert [c.args[0] for c in monitor.process_events.call_args_list] == [
+        ["a"],
+        [],
+        ["b", "c"],
+    ]
+    assert checkpoints == [9, 19, 25]
+    assert pipeline.fetch_stats.items == 4  # the last call finds no more chunks
+    assert pipeline.process_stats.items == 3
+
+
+def test_pipeline_fetch_error_keeps_last_checkpoint():
+    def failing_chunks(from_block, to_block):
+        yield 0, 9, []
+        raise ValueError("Boom!")
+
+    monitor = Mock()
+    monitor.iter_event_chunks.side_effect = failing_chunks
+    checkpoints = []
+    monitor.store_last_processed_block.side_effect = checkpoints.append
+
+    with pytest.raises(ValueError):
+        EventsPipeline(monitor, depth=2).run(0, 19)
+
+    assert checkpoints == [9]
+
+
+def test_stage_stats():
+    stats = StageStats("stage")
+    with stats.busy():
+        pass
+    assert stats.items == 1
+    assert 0 <= stats.utilization <= 1
+    assert str(stats).startswith("stage: 1 chunks")
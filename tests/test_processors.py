@@ -1,3 +1,4 @@
+import elasticsearch
 import pytest
 from hexbytes import HexBytes
 from unittest.mock import patch, Mock
@@ -8,6 +9,7 @@ from aquarius.events.processors import (
     MetadataCreatedProcessor,
     MetadataUpdatedProcessor,
 )
+from aquarius.events.purgatory import Purgatory
 from aquarius.events.util import setup_web3
 from aquarius.myapp import app
 
@@ -66,7 +68,7 @@ def test_check_permission(monkeypatch):
     processor = MetadataCreatedProcessor(
         event_sample, None, None, None, None, None, None
     )
-    with patch("requests.post") as mock:
+    with patch("requests.Session.post") as mock:
         mock.side_effect = Exception("Boom!")
         assert processor.check_permission("some_address") is False
 
@@ -75,7 +77,7 @@ def test_check_permission(monkeypatch):
     decryptor.decode_ddo.return_value = "not none"
     processor.decryptor = decryptor
     with pytest.raises(Exception):
-        with patch("requests.post") as mock:
+        with patch("requests.Session.post") as mock:
             mock.side_effect = Exception("Boom!")
             processor.process()
 
@@ -85,7 +87,7 @@ def test_check_permission(monkeypatch):
     processor.decryptor = decryptor
     # will affect the process() function too
     with pytest.raises(Exception):
-        with patch("requests.post") as mock:
+        with patch("requests.Session.post") as mock:
             mock.side_effect = Exception("Boom!")
             processor.process()
 
@@ -118,6 +120,21 @@ def test_make_record(sample_metadata_dict_remote):
     )
 
 
+def test_is_in_purgatory():
+    purgatory = Purgatory(Mock())
+    processor = MetadataUpdatedProcessor(
+        event_updated_sample, None, None, None, None, purgatory, None
+    )
+    assert processor.is_in_purgatory() == "false"
+
+    purgatory.reference_asset_list = {(processor.did, "spam")}
+    assert processor.is_in_purgatory() == "true"
+
+    purgatory.reference_asset_list = set()
+    purgatory.reference_account_list = {(processor.sender_address.lower(), "spam")}
+    assert processor.is_in_purgatory() == "true"
+
+
 def test_process(monkeypatch):
     config_file = app.config["AQUARIUS_CONFIG_FILE"]
     web3 = setup_web3(config_file)
@@ -136,6 +153,33 @@ def test_process(monkeypatch):
         mock.assert_called_once()
 
 
+def test_process_registered_did():
+    es_instance = Mock()
+    es_instance.read.return_value = {"id": "did:op:e22570", "chainId": 1}
+    processor = MetadataCreatedProcessor(
+        event_sample, es_instance, None, None, None, None, 8996
+    )
+    processor.decryptor = Mock(spec=Decryptor)
+
+    # registered on another chain, it is not replaced
+    assert processor.process() is None
+    processor.decryptor.decode_ddo.assert_not_called()
+    es_instance.write.assert_not_called()
+
+    # unknown, it is only created if it does not exist
+    es_instance.read.side_effect = elasticsearch.exceptions.ConnectionError(
+        "N/A", "Boom!", None
+    )
+    record = {"service": [{"attributes": {"main": {"name": "x"}}}], "created": "x"}
+    with patch.object(processor, "decode_ddo", return_value={}), patch(
+        "aquarius.events.processors.validate_data", return_value=(None, None)
+    ), patch.object(processor, "check_permission", return_value=True), patch.object(
+        processor, "make_record", return_value=record
+    ):
+        assert processor.process() is True
+    assert es_instance.write.call_args.kwargs["version"] is None
+
+
 def test_do_decode_update():
     config_file = app.config["AQUARIUS_CONFIG_FILE"]
     web3 = setup_web3(config_file)
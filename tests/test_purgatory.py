@@ -133,27 +133,35 @@ def test_purgatory_with_accounts(client, base_ddo_url, events_object, monkeypatc
     assert published_ddo["isInPurgatory"] == "false"
 
 
-def test_purgatory_retrieve_new_list(events_object):
+def test_purgatory_retrieve_new_list(events_object, monkeypatch):
+    monkeypatch.setenv("ASSET_PURGATORY_URL", "https://purgatory/list-assets.json")
     purgatory = Purgatory(events_object._es_instance)
-    with patch("requests.get") as mock:
+    with patch("requests.Session.get") as mock:
         the_response = Mock(spec=Response)
         the_response.status_code = 200
-        the_response.json.return_value = [{"did": "some_did", "reason": "some_reason"}]
+        the_response.content = b'[{"did": "some_did", "reason": "some_reason"}]'
+        the_response.headers = {"ETag": '"v1"'}
         mock.return_value = the_response
-        assert purgatory.retrieve_new_list("env") == {("some_did", "some_reason")}
+        assert purgatory.retrieve_new_list("ASSET_PURGATORY_URL") == {
+            ("some_did", "some_reason")
+        }
+        assert mock.call_args.kwargs["headers"] == {}
 
-    with patch("requests.get") as mock:
+        # same content, once the list is applied
+        purgatory._list_states.update(purgatory._new_list_states)
+        assert purgatory.retrieve_new_list("ASSET_PURGATORY_URL") is None
+        assert mock.call_args.kwargs["headers"] == {"If-None-Match": '"v1"'}
+
+        the_response.status_code = 304
+        assert purgatory.retrieve_new_list("ASSET_PURGATORY_URL") is None
+
+    with patch("requests.Session.get") as mock:
         the_response = Mock(spec=Response)
         the_response.status_code = 400
         mock.return_value = the_response
-        assert purgatory.retrieve_new_list("env") == set()
+        assert purgatory.retrieve_new_list("ASSET_PURGATORY_URL") is None
 
-
-def test_failures(events_object):
-    purgatory = Purgatory(events_object._es_instance)
-    with patch("aquarius.app.es_instance.ElasticsearchInstance.update") as mock:
-        mock.side_effect = Exception("Boom!")
-        purgatory.update_asset_purgatory_status({"id": "id"})
+    assert purgatory.retrieve_new_list("ACCOUNT_PURGATORY_URL") is None
 
 
 def test_is_account_banned(events_object):
@@ -161,3 +169,120 @@ def test_is_account_banned(events_object):
     purgatory.reference_account_list = {("0x123AbC", "bad juju")}
     assert purgatory.is_account_banned("0x123abc")  # capitalization doesn't matter
     assert not purgatory.is_account_banned("some_other_value")
+
+
+def test_purgatory_index():
+    es_instance = Mock(db_index="index")
+    purgatory = PurgatoryForTesting(es_instance)
+    purgatory.current_test_asset_list = {
+        ("did:op:1", "spam"),
+        ("did:op:2", "spam"),
+        ("did:op:missing", "spam"),
+    }
+    purgatory.current_test_account_list = {("0xAbC", "bad juju")}
+    updates = []
+    banned_during_updates = []
+
+    def streaming_bulk(es, actions, **kwargs):
+        for action in actions:
+            updates.append((action["_id"], action["doc"]["isInPurgatory"]))
+            # events processed meanwhile see the new lists
+            banned_during_updates.append(purgatory.is_asset_banned(action["_id"]))
+            if action["_id"] == "did:op:missing":
+                yield False, {"update": {"_id": action["_id"], "status": 404}}
+
+    with patch.object(purgatory, "get_assets_authored_by") as authored_by, patch(
+        "aquarius.events.purgatory.streaming_bulk", side_effect=streaming_bulk
+    ):
+        authored_by.return_value = [{"id": "did:op:3"}]
+        purgatory.update_lists()
+        authored_by.assert_called_once_with("0xabc", source=["id"])
+        assert sorted(updates) == [
+            ("did:op:1", "true"),
+            ("did:op:2", "true"),
+            ("did:op:3", "true"),
+            ("did:op:missing", "true"),
+        ]
+        es_instance.refresh.assert_called_once()
+        assert sorted(zip(updates, banned_during_updates)) == [
+            (("did:op:1", "true"), True),
+            (("did:op:2", "true"), True),
+            (("did:op:3", "true"), False),
+            (("did:op:missing", "true"), True),
+        ]
+        assert purgatory.is_asset_banned("did:op:1")
+        assert not purgatory.is_asset_banned("did:op:3")
+        assert not purgatory.is_asset_banned("did:op:missing")
+        assert purgatory.is_account_banned("0xABC")
+        assert purgatory.reference_account_list == {("0xabc", "bad juju")}
+
+        # a new reason does not flip the status, a removal does
+        purgatory.update_time = None
+        purgatory.current_test_asset_list = {("did:op:1", "scam")}
+        updates.clear()
+        banned_during_updates.clear()
+        purgatory.update_lists()
+        assert updates == [("did:op:2", "false")]
+        assert banned_during_updates == [False]
+        assert purgatory.reference_asset_list == {("did:op:1", "scam")}
+        assert purgatory.is_account_banned("0xabc")
+
+
+def test_purgatory_refresher():
+    purgatory = Purgatory(Mock())
+    purgatory._refresher = Mock()
+
+    def sleep(seconds):
+        if update_lists.call_count == 2:
+            purgatory.stop()
+
+    with patch.object(purgatory, "update_lists") as update_lists, patch(
+        "aquarius.events.purgatory.time.sleep", side_effect=sleep
+    ):
+        update_lists.side_effect = [Exception("Boom!"), None]
+        purgatory.run(1)
+        assert update_lists.call_count == 2
+
+
+def test_purgatory_retries_missing_assets(monkeypatch):
+    monkeypatch.setenv("ASSET_PURGATORY_URL", "https://purgatory/list-assets.json")
+    monkeypatch.delenv("ACCOUNT_PURGATORY_URL", raising=False)
+    purgatory = Purgatory(Mock(db_index="index"))
+    indexed = set()
+    updates = []
+
+    def streaming_bulk(es, actions, **kwargs):
+        for action in actions:
+            updates.append(action["_id"])
+            if action["_id"] not in indexed:
+                yield False, {"update": {"_id": action["_id"], "status": 404}}
+
+    response = Mock(spec=Response)
+    response.status_code = 200
+    response.content = b'[{"did": "did:op:1", "reason": "spam"}]'
+    response.headers = {"ETag": '"v1"'}
+    with patch("requests.Session.get", return_value=response) as get, patch(
+        "aquarius.events.purgatory.streaming_bulk", side_effect=streaming_bulk
+    ):
+        purgatory.update_lists()
+        assert updates == ["did:op:1"]
+        assert not purgatory.is_asset_banned("did:op:1")
+
+        # not indexed yet, the list is downloaded again and the DID retried
+        purgatory.update_time = None
+        purgatory.update_lists()
+        assert get.call_args.kwargs["headers"] == {}
+        assert updates == ["did:op:1", "did:op:1"]
+
+        indexed.add("did:op:1")
+        purgatory.update_time = None
+        purgatory.update_lists()
+        assert updates == ["did:op:1"] * 3
+        assert purgatory.is_asset_banned("did:op:1")
+
+        # unchanged from now on
+        purgatory.update_time = None
+        response.status_code = 304
+        purgatory.update_lists()
+        assert get.call_args.kwargs["headers"] == {"If-None-Match": '"v1"'}
+        assert updates == ["did:op:1"] * 3
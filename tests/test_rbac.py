@@ -0,0 +1,77 @@
+#
+# Copyright 2021 Ocean Protocol Foundation
+# SPDX-License-Identifier: Apache-2.0
+#
+from unittest.mock import Mock, patch
+
+from freezegun import freeze_time
+
+from aquarius.events.rbac import RBACClient, get_event_type, get_rbac_client
+
+ADDRESS = "0xe2DD09d719Da89e5a3D0F2549c7E24566e947260"
+
+
+def get_response(decision):
+    return Mock(json=Mock(return_value=decision))
+
+
+def test_get_rbac_client(monkeypatch):
+    monkeypatch.delenv("RBAC_SERVER_URL", raising=False)
+    assert get_rbac_client() is None
+
+    monkeypatch.setenv("RBAC_SERVER_URL", "http://rbac-client")
+    monkeypatch.setenv("RBAC_TIMEOUT", "2")
+    client = get_rbac_client()
+    assert client.url == "http://rbac-client"
+    assert client.timeout == 2
+    assert get_rbac_client() is client
+
+    assert get_event_type("MetadataCreated") == "publish"
+    assert get_event_type("MetadataUpdated") == "update"
+
+
+def test_decisions_are_cached():
+    client = RBACClient("http://rbac", ttl=60, negative_ttl=10)
+    with freeze_time("2021-10-01 00:00:00") as frozen, patch(
+        "requests.Session.post"
+    ) as mock:
+        mock.return_value = get_response(True)
+        assert client.check_permission("publish", ADDRESS) is True
+        assert client.check_permission("publish", ADDRESS) is True
+        assert mock.call_count == 1
+        assert mock.call_args.kwargs["timeout"] == 5
+        assert mock.call_args.kwargs["json"]["eventType"] == "publish"
+
+        # denials are cached too, for negative_ttl
+        mock.return_value = get_response(False)
+        assert client.check_permission("update", ADDRESS) is False
+        assert client.check_permission("update", ADDRESS) is False
+        assert mock.call_count == 2
+
+        frozen.tick(30)
+        assert client.check_permission("update", ADDRESS) is False
+        assert client.check_permission("publish", ADDRESS) is True
+        assert mock.call_count == 3
+
+        # failures are denied, and not cached
+        frozen.tick(60)
+        mock.side_effect = Exception("Boom!")
+        assert client.check_permission("publish", ADDRESS) is False
+        mock.side_effect = None
+        mock.return_value = get_response(True)
+        assert client.check_permission("publish", ADDRESS) is True
+        assert mock.call_count == 5
+
+
+def test_prefetch():
+    client = RBACClient("http://rbac", workers=4)
+    addresses = [f"0x{i}" for i in range(10)]
+    with patch("requests.Session.post") as mock:
+        mock.return_value = get_response(True)
+        client.prefetch([("publish", address) for address in addresses * 2])
+        assert mock.call_count == 10
+
+        for address in addresses:
+            assert client.check_permission("publish", address) is True
+        client.prefetch([("publish", address) for address in addresses])
+        assert mock.call_count == 10
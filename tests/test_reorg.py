@@ -0,0 +1,137 @@
+#
+# Copyright 2021 Ocean Protocol Foundation
+# SPDX-License-Identifier: Apache-2.0
+#
+import json
+from unittest.mock import Mock
+
+import elasticsearch
+from hexbytes import HexBytes
+
+from aquarius.events.reorg import ReorgJournal
+
+
+def block_hash(number, fork=""):
+    return HexBytes(f"{fork}{number}".encode().rjust(32, b"\0"))
+
+
+class FakeChain:
+    def __init__(self):
+        self.forks = {}
+
+    def get_block(self, number):
+        return {
+            "number": number,
+            "hash": block_hash(number, self.forks.get(number, "")),
+            "parentHash": block_hash(number - 1, self.forks.get(number - 1, "")),
+        }
+
+
+def get_journal(confirmations=3):
+    monitor = Mock()
+    monitor._chain_id = 8996
+    monitor._other_db_index = "aquarius_plus"
+    monitor._event_topics = {"0x01": "MetadataCreated"}
+    monitor._es_instance.db_index = "aquarius"
+    es = monitor._es_instance.es
+    es.get.side_effect = elasticsearch.exceptions.NotFoundError(404, "not found")
+    stored = {"did:op:a": {"v": 0}}
+    es.mget.side_effect = lambda index, body, realtime: {
+        "docs": [
+            {"_id": did, "found": did in stored, "_source": stored.get(did)}
+            for did in body["ids"]
+        ]
+    }
+    monitor._web3.eth = FakeChain()
+    monitor._web3.eth.get_logs = Mock(return_value=[])
+    events_by_block = {5: ["0xa"], 6: ["0xb"], 7: ["0xa"]}
+    monitor.decode_event_logs.side_effect = lambda logs: [
+        Mock(args=Mock(dataToken=dt))
+        for dt in events_by_block.get(monitor._web3.eth.current, [])
+    ]
+
+    def get_block(number):
+        monitor._web3.eth.current = number
+        return FakeChain.get_block(monitor._web3.eth, number)
+
+    monitor._web3.eth.get_block = get_block
+    return ReorgJournal(monitor, confirmations)
+
+
+def test_provisional_blocks_are_journaled():
+    journal = get_journal()
+    journal.process_provisional_blocks(4, 7)
+
+    assert [entry["block"] for entry in journal.entries] == [5, 6, 7]
+    assert journal.entries[0]["dids"] == {"did:op:a": json.dumps({"v": 0})}
+    assert journal.entries[1]["dids"] == {"did:op:b": None}
+    assert journal._monitor.process_events.call_count == 3
+
+    # already journaled blocks are not processed again
+    journal.process_provisional_blocks(4, 7)
+    assert journal._monitor.process_events.call_count == 3
+
+
+def test_confirm_blocks():
+    journal = get_journal(confirmations=3)
+    journal.process_provisional_blocks(4, 7)
+
+    assert journal.confirm_blocks(9) == 6
+    assert [entry["block"] for entry in journal.entries] == [7]
+    journal._monitor.store_last_processed_block.assert_called_once_with(6)
+
+
+def test_reorg_rolls_back_touched_dids():
+    journal = get_journal()
+    journal.process_provisional_blocks(4, 7)
+    es = journal._monitor._es_instance.es
+
+    journal._monitor._web3.eth.forks = {6: "x", 7: "x"}
+    assert journal.find_fork_block() == 6
+    journal.confirm_blocks(7)
+
+    assert [entry["block"] for entry in journal.entries] == [5]
+    # did:op:b did not exist before block 6, did:op:a is restored as of block 6
+    es.delete.assert_called_once()
+    assert es.delete.call_args.kwargs["id"] == "did:op:b"
+    restored = [
+        c.kwargs["id"]
+        for c in es.index.call_args_list
+        if c.kwargs["index"] == "aquarius"
+    ]
+    assert restored == ["did:op:a"]
+    journal._monitor.store_last_processed_block.assert_not_called()
+    # restored DDOs have the version of the reorged events
+    assert journal.unversioned_dids == {"did:op:a", "did:op:b"}
+
+    # the blocks of the new chain are applied again
+    journal.process_provisional_blocks(4, 7)
+    assert [entry["block"] for entry in journal.entries] == [5, 6, 7]
+    assert journal.entries[-1]["hash"] == block_hash(7, "x").hex()
+
+    journal.confirm_blocks(9)
+    assert journal.unversioned_dids == {"did:op:a", "did:op:b"}
+    journal.confirm_blocks(10)
+    assert journal.unversioned_dids == set()
+
+
+def test_journal_survives_restarts():
+    journal = get_journal()
+    journal.process_provisional_blocks(4, 5)
+    saved = journal._monitor._es_instance.es.index.call_args.kwargs["body"]
+
+    es = journal._monitor._es_instance.es
+    es.get.side_effect = None
+    es.get.return_value = {"_source": saved}
+    journal.load()
+    assert [entry["block"] for entry in journal.entries] == [5]
+
+    # DIDs rolled back are still written without version after a restart
+    journal._monitor._web3.eth.forks = {5: "x"}
+    journal.confirm_blocks(5)
+    saved = es.index.call_args.kwargs["body"]
+    es.get.return_value = {"_source": saved}
+    journal.load()
+    assert journal.entries == []
+    assert journal.unversioned_dids == {"did:op:a"}
+    assert journal._unversioned_until == 5
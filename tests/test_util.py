@@ -19,7 +19,7 @@ from aquarius.app.util import (
 )
 from aquarius.app.auth_util import compare_eth_addresses
 from aquarius.events.http_provider import get_web3_connection_provider
-from aquarius.events.util import get_network_name, setup_web3
+from aquarius.events.util import get_event_version, get_network_name, setup_web3
 from aquarius.block_utils import BlockProcessingClass
 from aquarius.myapp import app
 from aquarius.log import setup_logging
@@ -202,6 +202,13 @@ def test_get_network_name(monkeypatch):
         get_network_name()
 
 
+def test_get_event_version():
+    assert get_event_version(10, 2) == 1000002000
+    # later events have higher versions, with room for internal updates
+    assert get_event_version(10, 2) + 999 < get_event_version(10, 3)
+    assert get_event_version(10, 99999) < get_event_version(11, 0)
+
+
 def test_setup_web3(monkeypatch):
     config_file = app.config["AQUARIUS_CONFIG_FILE"]
     monkeypatch.setenv("NETWORK_NAME", "rinkeby")